@@ -46,6 +46,12 @@ app = Flask(__name__)
 # 데이터베이스 초기화
 init_db()
 
+# 벡터 DB 연결 (프로세스당 1회, 이후 요청에서는 캐시된 컬렉션 재사용)
+try:
+    database.collection_manager.get_collection()
+except Exception as vector_db_error:
+    print(f"벡터 DB 초기 연결 실패 (첫 요청 시 재시도): {str(vector_db_error)}")
+
 # 데이터베이스 연결 종료
 @app.teardown_appcontext
 def close_connection(exception):
@@ -81,6 +87,13 @@ def get_clean_filename(filename):
     s = s.replace('..', '')  # 상위 디렉토리 참조 방지
     return s.strip()
 
+def add_source_metadata(chunks, filename):
+    """청크 메타데이터에 소스 문서 정보 추가 (업로드/편집 경로 공통)"""
+    for chunk in chunks:
+        if 'metadata' in chunk:
+            chunk['metadata']['source'] = filename
+            chunk['metadata']['doc_id'] = chunk['doc_id']
+
 @app.route('/')
 def index():
     # 방문자 IP 기록
@@ -483,14 +496,17 @@ def upload_file():
                 print(f"문서 분할 완료: {len(chunks)}개 청크")
                 
                 # 각 청크에 필요한 메타데이터 추가 (소스 문서 정보)
-                for chunk in chunks:
-                    if 'metadata' in chunk:
-                        chunk['metadata']['source'] = filename
-                        chunk['metadata']['doc_id'] = chunk['doc_id']
+                add_source_metadata(chunks, filename)
                 
                 # 청크를 벡터 DB에 저장 (요구사항에 맞게 컬렉션 "uploaded_docs" 사용)
                 try:
-                    database.add_document_embeddings(chunks)
+                    ingest_report = database.ingest_document_chunks(chunks) if chunks else None
+                    if ingest_report and ingest_report['added_chunks'] < ingest_report['total_chunks']:
+                        failed_batches = [batch for batch in ingest_report['batches'] if not batch['success']]
+                        raise Exception(
+                            f"{len(failed_batches)}개 배치 저장 실패 "
+                            f"({ingest_report['added_chunks']}/{ingest_report['total_chunks']} 청크 저장됨)"
+                        )
                     print(f"벡터 DB에 {len(chunks)}개 청크 저장 완료: {filename}")
                 except Exception as db_error:
                     print(f"ERROR: RAG pipeline failed during vector DB storage: {str(db_error)}")
@@ -615,12 +631,63 @@ def get_documents():
         return jsonify({
             'document_count': document_status.get('document_count', 0),
             'chunk_count': document_status.get('chunk_count', 0),
+            'file_types': document_status.get('file_types', {}),
+            'content_types': document_status.get('content_types', {}),
             'files': files
         })
     except Exception as e:
         print(f"Error getting documents: {str(e)}")
         return jsonify({'error': str(e)}), 500
         
+@app.route('/api/cache_stats', methods=['GET'])
+def get_cache_stats():
+    """검색 결과 캐시 / 질문 임베딩 캐시 적중률 조회"""
+    try:
+        return jsonify({
+            'retrieval_cache': chatbot.retrieval_cache.stats(),
+            'query_embedding_cache': database.query_embedding_cache.stats(),
+            'corpus_generation': database.get_corpus_generation()
+        })
+    except Exception as e:
+        print(f"Error getting cache stats: {str(e)}")
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/embedding/reembed', methods=['GET', 'POST'])
+def reembed_corpus():
+    """임베딩 모델 재임베딩 상태 조회(GET) / 백그라운드 재임베딩 시작(POST, {"backend": "openai:text-embedding-3-small"})"""
+    try:
+        if request.method == 'GET':
+            return jsonify(database.get_reembedding_status())
+        data = request.get_json(silent=True) or {}
+        return jsonify(database.start_reembedding(data.get('backend')))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        print(f"Error starting re-embedding: {str(e)}")
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/maintenance', methods=['GET', 'POST'])
+def vector_db_maintenance():
+    """벡터 DB 유지보수 보고서 조회(GET) / 실행(POST, {"rebuild": bool, "dry_run": bool})"""
+    try:
+        if request.method == 'GET':
+            return jsonify({
+                'success': True,
+                'current': database.storage_report(),
+                'last_run': database.get_last_maintenance_report()
+            })
+        data = request.get_json(silent=True) or {}
+        report = database.run_maintenance(
+            force_rebuild=bool(data.get('rebuild', False)),
+            dry_run=bool(data.get('dry_run', False))
+        )
+        return jsonify({'success': True, 'report': report})
+    except RuntimeError as e:
+        return jsonify({'success': False, 'error': str(e)}), 409
+    except Exception as e:
+        print(f"Error running vector DB maintenance: {str(e)}")
+        return jsonify({'success': False, 'error': str(e)}), 500
+
 # CSV 파일 편집 API 엔드포인트 
 @app.route('/api/documents/edit/<path:system_filename>', methods=['POST'])
 def edit_document(system_filename):
@@ -689,6 +756,21 @@ def edit_document(system_filename):
                     'message': f'CSV 파일을 읽는 중 오류가 발생했습니다: {str(e)}'
                 }), 500
         
+        # 벡터 DB 반영 (내용이 바뀐 행의 청크만 재임베딩)
+        embedding_message = ""
+        try:
+            chunks = document_processor.process_document(file_path)
+            # 업로드 시와 같은 메타데이터로 구성해야 내용이 같은 청크가 메타데이터 변경으로 보이지 않음
+            add_source_metadata(chunks, original_filename)
+            file_uuid = decoded_filename.split('_')[0]
+            if chunks and database.update_document_embeddings(file_uuid, chunks):
+                embedding_message = " 검색 데이터베이스에 변경 내용이 반영되었습니다."
+            else:
+                embedding_message = " (검색 데이터베이스 반영 실패)"
+        except Exception as embed_error:
+            embedding_message = f" (검색 데이터베이스 반영 실패: {str(embed_error)})"
+            print(f"문서 편집 후 벡터 DB 갱신 오류: {str(embed_error)}")
+
         # 메타데이터 파일 경로
         metadata_filename = f"{os.path.splitext(decoded_filename)[0]}_metadata.json"
         metadata_path = os.path.join(app.config['UPLOAD_FOLDER'], metadata_filename)
@@ -711,7 +793,7 @@ def edit_document(system_filename):
         # 성공 응답
         return jsonify({
             'status': 'success',
-            'message': 'CSV 파일이 성공적으로 업데이트되었습니다.' + guide_reload_message,
+            'message': 'CSV 파일이 성공적으로 업데이트되었습니다.' + embedding_message + guide_reload_message,
             'content': table_html,
             'file_type': 'csv'
         })
@@ -1197,8 +1279,16 @@ def upload_chunk():
                 # 벡터 DB에 청크 추가
                 if chunks:
                     print(f"벡터 DB에 {len(chunks)}개 청크 저장 중...")
-                    database.add_document_embeddings(chunks)
-                    print(f"벡터 DB에 {len(chunks)}개 청크 저장 완료: {safe_filename}")
+                    ingest_report = database.ingest_document_chunks(chunks)
+                    print(f"벡터 DB에 {ingest_report['added_chunks']}/{len(chunks)}개 청크 저장 완료: {safe_filename}")
+                    if ingest_report['added_chunks'] < ingest_report['total_chunks']:
+                        response_data['processingError'] = (
+                            f"{ingest_report['total_chunks'] - ingest_report['added_chunks']}개 청크 저장 실패"
+                        )
+                        response_data['failedBatches'] = [
+                            {'index': batch['index'], 'error': batch['error']}
+                            for batch in ingest_report['batches'] if not batch['success']
+                        ]
                 
                 # 파일 완성 정보 추가
                 response_data['fileComplete'] = True
@@ -1581,6 +1671,49 @@ def report_delete(post_id):
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
 
+# 벡터 DB 스냅샷 API
+@app.route('/api/snapshots', methods=['GET'])
+def list_snapshots():
+    """저장된 벡터 DB 스냅샷 목록"""
+    try:
+        return jsonify({'success': True, 'snapshots': database.list_database_snapshots()})
+    except Exception as e:
+        print(f"스냅샷 목록 조회 오류: {str(e)}")
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+@app.route('/api/snapshots', methods=['POST'])
+def create_snapshot():
+    """현재 벡터 DB를 임베딩 포함 스냅샷으로 저장"""
+    try:
+        manifest = database.export_snapshot()
+        manifest.pop('path', None)
+        return jsonify({'success': True, 'snapshot': manifest})
+    except Exception as e:
+        print(f"스냅샷 생성 오류: {str(e)}")
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+@app.route('/api/snapshots/restore', methods=['POST'])
+def restore_snapshot():
+    """스냅샷으로 벡터 DB 교체 (임베딩 API 호출 없음)"""
+    try:
+        data = request.get_json() or {}
+        name = data.get('name')
+        if not name:
+            return jsonify({'success': False, 'error': '스냅샷 이름이 제공되지 않았습니다.'}), 400
+
+        # 스냅샷 디렉토리 밖의 파일은 복원하지 않음
+        snapshot_path = database.resolve_snapshot_path(name)
+        if not os.path.exists(snapshot_path):
+            return jsonify({'success': False, 'error': '스냅샷을 찾을 수 없습니다.'}), 404
+
+        result = database.restore_snapshot(snapshot_path)
+        return jsonify({'success': True, **result})
+    except database.EmbeddingModelMismatchError as e:
+        return jsonify({'success': False, 'error': str(e)}), 409
+    except Exception as e:
+        print(f"스냅샷 복원 오류: {str(e)}")
+        return jsonify({'success': False, 'error': str(e)}), 500
+
 # 문서 동기화 API
 @app.route('/api/sync-documents', methods=['POST'])
 def sync_documents():
@@ -1672,11 +1805,9 @@ def sync_documents():
                     'message': f'🔍 파일 시스템에 더 이상 존재하지 않는 {orphaned_count}개의 문서 데이터 정리 중...'
                 }) + '\n'
                 
-                # 각 고아 문서 제거
-                removed_count = 0
-                for doc_id in orphaned_doc_ids:
-                    if database.delete_document(doc_id):
-                        removed_count += 1
+                # 고아 문서 일괄 제거 (한 번의 패스로 처리)
+                deleted_counts = database.delete_documents(list(orphaned_doc_ids))
+                removed_count = sum(1 for count in deleted_counts.values() if count > 0)
                 
                 yield global_json.dumps({
                     'progress': 10,
@@ -2150,6 +2281,15 @@ if __name__ == '__main__':
     # 데이터베이스 초기화
     init_db()
     
+    # 벡터 DB 주기 유지보수 (HNSW 재구축, 레지스트리/캐시 VACUUM)
+    database.start_maintenance_scheduler()
+    
+    # 오프라인 검색용 로컬 임베딩 인덱스 (빠진 청크가 있으면 백그라운드 구축)
+    try:
+        database.start_local_index_build()
+    except Exception as e:
+        print(f"로컬 임베딩 인덱스 확인 중 오류: {str(e)}")
+    
     # Replit에서는 포트가 환경변수로 제공됩니다
     port = int(os.environ.get("PORT", 5000))
     app.run(host='0.0.0.0', port=port, debug=False)
\ No newline at end of file
@@ -0,0 +1,122 @@
+"""
+int8 양자화 벡터 인덱스 벤치마크
+- 같은 임베딩으로 float32 / int8 메모리 매핑 인덱스를 각각 만들고
+  recall@k(float32 전수 검색 결과 기준), 질문당 검색 시간, 검색 시 상주하는 행렬 크기를 비교합니다
+- 질문 벡터는 저장된 청크 임베딩에 잡음을 더해 만들므로 임베딩 API를 호출하지 않습니다
+
+사용법:
+    python benchmark_quantization.py                      # 현재 벡터 DB 사용
+    python benchmark_quantization.py --synthetic 20000    # 벡터 DB 없이 임의 벡터로 측정
+"""
+
+import time
+import argparse
+import tempfile
+
+import numpy as np
+
+from mmap_index import MmapVectorIndex
+
+
+class ArrayCollection:
+    """임의 벡터를 collection.get 페이지 형식으로 제공 (--synthetic 용)"""
+
+    def __init__(self, embeddings):
+        self.embeddings = embeddings
+
+    def count(self):
+        return len(self.embeddings)
+
+    def get(self, include=None, limit=None, offset=0, **kwargs):
+        page = self.embeddings[offset:offset + limit]
+        return {
+            "ids": [f"chunk-{offset + i}" for i in range(len(page))],
+            "documents": [""] * len(page),
+            "metadatas": [{}] * len(page),
+            "embeddings": page
+        }
+
+
+def synthetic_embeddings(rows, dimension=1536, clusters=64, seed=0):
+    """문서 임베딩처럼 몇 개의 주제 주변에 모인 정규화 벡터"""
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(clusters, dimension)).astype(np.float32)
+    vectors = centers[rng.integers(0, clusters, rows)] + 0.6 * rng.normal(size=(rows, dimension)).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def sample_queries(collection, count, noise=0.3, seed=1):
+    """저장된 임베딩 중 일부에 잡음을 더한 질문 벡터"""
+    rng = np.random.default_rng(seed)
+    total = collection.count()
+    offsets = rng.choice(total, size=min(count, total), replace=False)
+    vectors = []
+    for offset in offsets:
+        page = collection.get(include=["embeddings"], limit=1, offset=int(offset))
+        vectors.append(np.asarray(page["embeddings"][0], dtype=np.float32))
+    vectors = np.asarray(vectors)
+    vectors += noise * rng.normal(size=vectors.shape).astype(np.float32) / np.sqrt(vectors.shape[1])
+    return vectors
+
+
+def timed_query(index, queries, k):
+    start = time.perf_counter()
+    results = [index.query([query], k)[0] for query in queries]
+    elapsed = (time.perf_counter() - start) / len(queries) * 1000
+    return [[hit[0] for hit in hits] for hits in results], elapsed
+
+
+def recall_at_k(expected, actual, k):
+    return float(np.mean([len(set(e[:k]) & set(a[:k])) / max(1, len(e[:k])) for e, a in zip(expected, actual)]))
+
+
+def benchmark_quantization(collection, query_count=200, k=5, rescore_multipliers=(1, 2, 4, 8)):
+    print("=" * 60)
+    print("int8 양자화 벡터 인덱스 벤치마크")
+    print("=" * 60)
+
+    with tempfile.TemporaryDirectory() as directory:
+        float_index = MmapVectorIndex(f"{directory}/float32")
+        rows = float_index.export(collection, "benchmark", 0)
+        quantized_index = MmapVectorIndex(f"{directory}/int8", quantized=True)
+        quantized_index.export(collection, "benchmark", 0)
+        dimension = float_index.read_manifest()["dimension"]
+
+        queries = sample_queries(collection, query_count)
+        print(f"\n청크 {rows}개, 차원 {dimension}, 질문 {len(queries)}개, k={k}")
+
+        # 기준: float32 전수 검색
+        expected, float_ms = timed_query(float_index, queries, k)
+        float_bytes = rows * dimension * 4
+        quantized_bytes = rows * dimension + rows * 8
+        print(f"\nfloat32      상주 행렬 {float_bytes / 1048576:8.1f}MB   검색 {float_ms:7.2f}ms/질문   recall@{k} 1.0000")
+
+        for multiplier in rescore_multipliers:
+            quantized_index.rescore_multiplier = multiplier
+            actual, quantized_ms = timed_query(quantized_index, queries, k)
+            print(f"int8 x{multiplier:<2}      상주 행렬 {quantized_bytes / 1048576:8.1f}MB   "
+                  f"검색 {quantized_ms:7.2f}ms/질문   recall@{k} {recall_at_k(expected, actual, k):.4f}")
+
+        print(f"\n메모리 절감: {float_bytes / quantized_bytes:.2f}배 (xN: float32로 재채점한 후보 수 = k의 N배)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="int8 양자화 벡터 인덱스 recall@k 벤치마크")
+    parser.add_argument('--queries', type=int, default=200, help='질문 수')
+    parser.add_argument('--k', type=int, default=5, help='recall@k의 k')
+    parser.add_argument('--synthetic', type=int, default=0, help='벡터 DB 대신 사용할 임의 벡터 수')
+    args = parser.parse_args()
+
+    if args.synthetic:
+        collection = ArrayCollection(synthetic_embeddings(args.synthetic))
+    else:
+        import database
+        collection = database.initialize_database()
+        if collection.count() == 0:
+            print("벡터 DB가 비어 있습니다. --synthetic 옵션으로 임의 벡터를 사용하세요.")
+            return
+    benchmark_quantization(collection, query_count=args.queries, k=args.k)
+
+
+if __name__ == "__main__":
+    main()
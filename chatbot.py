@@ -8,10 +8,19 @@ from pathlib import Path
 from openai import OpenAI
 import logging
 
-from database import search_similar_docs
+from database import search_similar_docs, hybrid_search_docs, get_corpus_generation, adaptive_top_k, nearest_documents
 
 # Import configuration
-from config import FAQ_KEYWORDS, FINE_TUNED_MODEL, RAG_SYSTEM
+from config import FAQ_KEYWORDS, FINE_TUNED_MODEL, RAG_SYSTEM, RETRIEVAL_CACHE, RERANKER, ADAPTIVE_TOP_K
+
+# 검색 결과 캐시 (코퍼스 세대가 바뀌면 무효화)
+from retrieval_cache import RetrievalCache
+
+# 검색 후보 재순위화 (로컬 점수 + MMR + 중복 제거)
+from reranker import rerank
+
+# 토큰 예산 기반 컨텍스트 구성 (인접 청크 이어 붙이기, 중복 가이드 필드 제거)
+from context_builder import build_context, token_budget
 
 # CSV 변환 모듈 임포트
 from csv_to_narrative import CsvNarrativeConverter, search_csv_data, process_csv_files
@@ -27,6 +36,9 @@ OFFLINE_FALLBACK_MESSAGE = "[🔴 오프라인 모드] 현재 인터넷 연결
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
+# retrieve_relevant_documents 결과 캐시
+retrieval_cache = RetrievalCache(max_entries=RETRIEVAL_CACHE.get("max_entries", 512))
+
 # CSV 변환기 초기화
 csv_converter = CsvNarrativeConverter()
 
@@ -192,19 +204,20 @@ def get_ip_request_form_response() -> str:
 def retrieve_relevant_documents(query: str, top_k: int = 5) -> Tuple[List[Any], str]:
     """
     질문과 관련된 문서를 검색하고 컨텍스트 문자열로 포맷팅합니다.
+    같은 질문/필터의 결과는 코퍼스 세대(업로드, 삭제, 편집, 동기화 시 증가)가 바뀔 때까지 캐시합니다.
+    재순위화가 켜져 있으면 top_k의 여러 배를 후보로 검색한 뒤 관련 있고 겹치지 않는 문서만 남기므로
+    top_k보다 적은 문서가 반환될 수 있습니다.
+    적응형 top_k가 켜져 있으면 후보의 벡터 거리 분포로 남길 문서 수를 정하므로, 1위가 확실한 질문은
+    1~2개, 애매한 질문은 top_k개까지 사용합니다.
     
     Args:
         query: 사용자 질문
-        top_k: 검색할 상위 문서 수
+        top_k: 검색할 최대 문서 수
         
     Returns:
         (문서 리스트, 컨텍스트 문자열) 튜플
     """
     try:
-        # 키워드 추출 (간단한 방식으로 구현)
-        keywords = extract_keywords_from_query(query)
-        print(f"추출된 키워드: {keywords}")
-        
         # 절차 가이드 전용 검색을 위한 필터링
         procedure_guide_filter = None
         
@@ -237,48 +250,72 @@ def retrieve_relevant_documents(query: str, top_k: int = 5) -> Tuple[List[Any],
             
             print(f"절차 가이드 우선 검색 활성화됨 - 필터: {procedure_guide_filter}")
         
-        # 관련 문서 검색
-        docs = search_similar_docs(query, top_k=top_k, filter=procedure_guide_filter)
+        # 검색 결과 캐시 확인 (정규화된 질문 + 필터 + top_k)
+        cache_key = None
+        generation = get_corpus_generation() if RETRIEVAL_CACHE.get("enabled", True) else None
+        if generation is not None:
+            cache_key = RetrievalCache.make_key(query, procedure_guide_filter, top_k=top_k,
+                                                adaptive=ADAPTIVE_TOP_K.get("enabled", True))
+            cached = retrieval_cache.get(cache_key, generation)
+            if cached is not None:
+                logger.info(f"검색 결과 캐시 적중: {query}")
+                docs, context_str = cached
+                return list(docs), context_str
+        
+        # 키워드 추출 (간단한 방식으로 구현)
+        keywords = extract_keywords_from_query(query)
+        print(f"추출된 키워드: {keywords}")
+        
+        # 재순위화할 후보 수
+        candidate_count = top_k * RERANKER.get("candidate_multiplier", 3) if RERANKER.get("enabled", True) else top_k
+        
+        # 관련 문서 검색 (BM25 어휘 검색 + 벡터 검색 순위 결합)
+        docs = hybrid_search_docs(query, top_k=candidate_count, filter=procedure_guide_filter)
         
         # 가이드 문서가 없고 필터가 적용된 경우 다시 필터 없이 검색
         if (not docs or len(docs) == 0) and procedure_guide_filter:
             print("절차 가이드에서 결과를 찾지 못해 전체 문서에서 검색합니다")
-            docs = search_similar_docs(query, top_k=top_k)
+            docs = hybrid_search_docs(query, top_k=candidate_count)
         
         # 문서가 없으면 빈 컨텍스트 반환
         if not docs or len(docs) == 0:
             return [], ""
         
-        # 검색된 문서를 컨텍스트 문자열로 포맷팅
-        context_str = "Context:\n"
+        # 후보의 벡터 거리 분포(가장 큰 간격)로 남길 문서 수 결정
+        selected_k = top_k
+        if ADAPTIVE_TOP_K.get("enabled", True):
+            selected_k = adaptive_top_k(docs, top_k)
+            if selected_k < top_k:
+                # 간격 뒤의 벡터 검색 문서만 제외 (어휘 검색으로만 찾은 문서는 유지)
+                docs = nearest_documents(docs, selected_k)
+                print(f"적응형 top_k: 거리 간격 기준 {selected_k}개 사용 (최대 {top_k}개)")
+        
+        # 로컬 점수로 재순위화 후 MMR 선택 (거의 같은 청크 제거)
+        if RERANKER.get("enabled", True):
+            candidate_total = len(docs)
+            docs = rerank(
+                query, docs, selected_k,
+                lexical_weight=RERANKER.get("lexical_weight", 0.4),
+                semantic_weight=RERANKER.get("semantic_weight", 0.3),
+                rank_weight=RERANKER.get("rank_weight", 0.3),
+                mmr_lambda=RERANKER.get("mmr_lambda", 0.7),
+                duplicate_threshold=RERANKER.get("duplicate_threshold", 0.9),
+                min_relevance_ratio=RERANKER.get("min_relevance_ratio", 0.35)
+            )
+            print(f"재순위화: 후보 {candidate_total}개 -> {len(docs)}개 선택")
+        else:
+            docs = docs[:selected_k]
+        
+        # 모델별 토큰 예산 안에서 컨텍스트 구성
+        model = RAG_SYSTEM["model"]
+        built = build_context(docs, model, token_budget(RAG_SYSTEM.get("context_token_budget", {}), model))
+        context_str = built["context"]
+        logger.info(f"컨텍스트 토큰: {built['tokens']}/{built['budget']} ({built['documents']}/{len(docs)}개 청크"
+                    f"{', 예산 초과로 일부 제외' if built['truncated'] else ''})")
         
-        # 업무 안내 가이드 문서는 특별한 포맷으로 표시
-        for i, doc in enumerate(docs):
-            # 메타데이터에서 업무 가이드 정보 확인
-            metadata = getattr(doc, 'metadata', {})
-            content_type = metadata.get('content_type', '')
-            
-            if content_type == 'procedure_guide':
-                # 업무 가이드 형식으로 포맷 (버전 정보 포함)
-                guide_version = metadata.get('guide_version', 'latest')
-                version_text = f" (버전: {guide_version})" if guide_version != 'latest' else ""
-                context_str += f"- ({i+1}) 업무 안내{version_text}: "
-                
-                # 질문 예시와 상세 안내 부분 강조
-                if '질문 예시' in metadata:
-                    context_str += f"[질문: {metadata['질문 예시']}] "
-                
-                if '요약 응답' in metadata:
-                    context_str += f"[요약: {metadata['요약 응답']}] "
-                    
-                if '상세 안내' in metadata:
-                    context_str += f"[안내: {metadata['상세 안내']}] "
-                
-                # 일반 내용도 포함
-                context_str += f"\n  원본내용: \"{doc.page_content}\"\n\n"
-            else:
-                # 일반 문서 형식으로 포맷
-                context_str += f"- ({i+1}) \"{doc.page_content}\"\n\n"
+        # 결과가 있는 경우만 캐시 (검색 오류로 인한 빈 결과가 고정되지 않도록)
+        if cache_key is not None:
+            retrieval_cache.put(cache_key, generation, (list(docs), context_str))
         
         return docs, context_str
     except Exception as e:
@@ -1448,7 +1485,23 @@ def get_local_response(query: str) -> str:
                 response += f"### 결과 {idx + 1}\n{narrative['text']}\n\n"
             
             return response
-    
+
+    # 로컬 임베딩 인덱스 기반 의미 검색 (네트워크 호출 없음)
+    try:
+        local_docs = search_similar_docs(query, top_k=3, offline=True, adaptive=True)
+        if local_docs:
+            logger.info(f"로컬 벡터 검색 결과: {len(local_docs)}개 문서")
+
+            response = "## 검색 결과\n\n"
+            for idx, doc in enumerate(local_docs):
+                source = doc.metadata.get('source') or doc.metadata.get('filename', '')
+                source_text = f" ({source})" if source else ""
+                response += f"### 결과 {idx + 1}{source_text}\n{doc.page_content}\n\n"
+
+            return response
+    except Exception as e:
+        logger.error(f"로컬 벡터 검색 중 오류 발생: {str(e)}")
+
     # 매칭되는 결과가 없는 경우
     logger.info("매칭 결과 없음")
     return "질문과 관련된 정보를 로컬 데이터베이스에서 찾지 못했습니다. 질문을 더 자세히 작성하거나 IP 주소와 같은 구체적인 정보를 포함해 보세요."
@@ -0,0 +1,510 @@
+"""
+청크 레지스트리 모듈
+- 문서 ID / 시스템 파일명 / 출처(source) → 청크 ID 매핑을 SQLite로 관리
+- 문서 삭제 시 벡터 DB 전체를 스캔하지 않고 삭제 대상 청크 ID를 인덱스로 조회
+- 청크/문서 수, 파일 형식별·콘텐츠 유형별 통계를 추가/삭제 시 증분 갱신
+- 코퍼스 세대(generation) 카운터: 청크가 추가/삭제될 때마다 증가 (캐시/인덱스 무효화용)
+- 업무 안내 가이드 버전 카탈로그: 가이드 계열(파일명)별로 존재하는 버전과 최신 버전
+- 벡터 DB 상태 값(사용 중인 임베딩 백엔드 등): 스키마 변경으로 재구축되어도 유지
+- 부모 섹션 본문(부모-자식 청크): 자식 청크마다 복사하지 않고 parent_id별로 한 번만 저장,
+  자식이 모두 삭제되면 함께 삭제 (벡터 DB에 없는 데이터이므로 스키마 변경으로 재구축되어도 유지)
+"""
+
+import os
+import re
+import sqlite3
+import threading
+import time
+from typing import List, Dict, Any, Iterable, Set, Optional
+
+# 레지스트리 스키마 버전 (변경 시 기존 벡터 DB로부터 재구축)
+REGISTRY_SCHEMA_VERSION = 4
+
+# 레지스트리 자체가 사용하는 메타 키 (그 외 키는 이전 버전이 저장한 벡터 DB 상태 값)
+REGISTRY_META_KEYS = ('schema_version', 'generation', 'built')
+
+# 가이드 파일명의 날짜 버전 (예: 업무 안내 가이드_2025.05.19.xlsx)
+GUIDE_VERSION_PATTERN = re.compile(r'(\d{4})[.년\-_]\s?(\d{1,2})[.월\-_]\s?(\d{1,2})')
+UUID_PREFIX_PATTERN = re.compile(r'^[0-9a-fA-F]{8}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{12}_')
+
+
+def canonical_guide_version(version: Optional[str]) -> Optional[str]:
+    """
+    가이드 버전을 비교 가능한 형식(YYYY.MM.DD)으로 변환합니다
+
+    "2025.5.19", "2025-05-19", "2025년5월19" 등은 모두 "2025.05.19"가 되며,
+    날짜가 아닌 값("latest" 등)은 None을 반환합니다.
+    """
+    match = GUIDE_VERSION_PATTERN.search(version or '')
+    if not match:
+        return None
+    year, month, day = match.groups()
+    return f"{year}.{int(month):02d}.{int(day):02d}"
+
+
+def guide_family(filename: Optional[str]) -> Optional[str]:
+    """가이드 계열 이름 (업로드 UUID 접두사, 확장자, 날짜 버전을 제거한 파일명)"""
+    if not filename:
+        return None
+    name = UUID_PREFIX_PATTERN.sub('', os.path.basename(filename))
+    name = os.path.splitext(name)[0]
+    name = GUIDE_VERSION_PATTERN.sub('', name)
+    return name.strip(' _-.') or None
+
+
+class ChunkRegistry:
+    """벡터 DB 청크의 문서 단위 인덱스 (추가/삭제 경로에서 함께 갱신)"""
+
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        self._lock = threading.RLock()
+        self._conn = None
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            os.makedirs(os.path.dirname(self.db_path) or '.', exist_ok=True)
+            self._conn = sqlite3.connect(self.db_path, check_same_thread=False)
+            self._conn.execute('''
+            CREATE TABLE IF NOT EXISTS registry_meta (
+                key TEXT PRIMARY KEY,
+                value TEXT
+            )
+            ''')
+            # 벡터 DB 상태 값은 스키마 변경 시 지우지 않는 별도 테이블에 저장
+            has_state = self._conn.execute(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'vector_state'"
+            ).fetchone()
+            self._conn.execute('''
+            CREATE TABLE IF NOT EXISTS vector_state (
+                key TEXT PRIMARY KEY,
+                value TEXT
+            )
+            ''')
+            # 부모 섹션 본문도 벡터 DB로부터 재구축할 수 없으므로 스키마 변경 시 지우지 않음
+            self._conn.execute('''
+            CREATE TABLE IF NOT EXISTS parent_sections (
+                parent_id TEXT PRIMARY KEY,
+                text TEXT NOT NULL
+            )
+            ''')
+            if not has_state:
+                # 이전 버전이 registry_meta에 저장한 상태 값 이전
+                placeholders = ','.join('?' * len(REGISTRY_META_KEYS))
+                self._conn.execute(
+                    f"INSERT OR IGNORE INTO vector_state (key, value) "
+                    f"SELECT key, value FROM registry_meta WHERE key NOT IN ({placeholders})",
+                    REGISTRY_META_KEYS
+                )
+            row = self._conn.execute("SELECT value FROM registry_meta WHERE key = 'schema_version'").fetchone()
+            if not row or row[0] != str(REGISTRY_SCHEMA_VERSION):
+                # 스키마가 다르면 테이블을 새로 만들고 재구축 대상으로 표시
+                self._conn.execute('DROP TABLE IF EXISTS chunks')
+                self._conn.execute('DROP TABLE IF EXISTS source_counts')
+                self._conn.execute('DROP TABLE IF EXISTS corpus_stats')
+                self._conn.execute('DELETE FROM registry_meta')
+                self._conn.execute(
+                    "INSERT INTO registry_meta (key, value) VALUES ('schema_version', ?)",
+                    (str(REGISTRY_SCHEMA_VERSION),)
+                )
+            # 세대는 밀리초 시각에서 시작 (벡터 DB 초기화 후에도 이전 세대 값으로 되돌아가지 않도록)
+            self._conn.execute(
+                "INSERT OR IGNORE INTO registry_meta (key, value) VALUES ('generation', ?)",
+                (str(int(time.time() * 1000)),)
+            )
+            self._conn.execute('''
+            CREATE TABLE IF NOT EXISTS chunks (
+                chunk_id TEXT PRIMARY KEY,
+                doc_id TEXT,
+                id_prefix TEXT,
+                filename TEXT,
+                source TEXT,
+                file_type TEXT,
+                content_type TEXT,
+                guide_family TEXT,
+                guide_version TEXT,
+                parent_id TEXT
+            )
+            ''')
+            self._conn.execute('CREATE INDEX IF NOT EXISTS idx_chunks_doc_id ON chunks (doc_id)')
+            self._conn.execute('CREATE INDEX IF NOT EXISTS idx_chunks_id_prefix ON chunks (id_prefix)')
+            self._conn.execute('CREATE INDEX IF NOT EXISTS idx_chunks_filename ON chunks (filename)')
+            self._conn.execute('CREATE INDEX IF NOT EXISTS idx_chunks_source ON chunks (source)')
+            self._conn.execute('CREATE INDEX IF NOT EXISTS idx_chunks_guide ON chunks (guide_family, guide_version)')
+            self._conn.execute('CREATE INDEX IF NOT EXISTS idx_chunks_parent_id ON chunks (parent_id)')
+            # source별 청크 수 (문서 수 = source 개수)
+            self._conn.execute('''
+            CREATE TABLE IF NOT EXISTS source_counts (
+                source TEXT PRIMARY KEY,
+                chunk_count INTEGER NOT NULL
+            )
+            ''')
+            # 증분 통계 카운터 (chunks, documents, file_type:*, content_type:*)
+            self._conn.execute('''
+            CREATE TABLE IF NOT EXISTS corpus_stats (
+                key TEXT PRIMARY KEY,
+                value INTEGER NOT NULL
+            )
+            ''')
+            self._conn.commit()
+        return self._conn
+
+    def close(self):
+        """연결 종료 (벡터 DB 디렉토리 삭제 전 호출)"""
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+    @staticmethod
+    def _row(chunk_id: str, metadata: Dict[str, Any], doc_id: str = None) -> tuple:
+        metadata = metadata or {}
+        doc_id = doc_id or metadata.get('doc_id')
+        # 이전 버전 호환: 청크 ID가 "doc_id-번호" 형식
+        id_prefix = chunk_id.split('-')[0] if '-' in chunk_id else None
+        content_type = metadata.get('content_type') or 'general'
+        family, version = None, None
+        if content_type == 'procedure_guide':
+            family = guide_family(metadata.get('source') or metadata.get('filename'))
+            version = metadata.get('guide_version') or 'latest'
+        return (chunk_id, doc_id, id_prefix, metadata.get('filename'), metadata.get('source'),
+                metadata.get('file_type') or 'unknown', content_type, family, version, metadata.get('parent_id'))
+
+    @staticmethod
+    def _bump(conn: sqlite3.Connection, key: str, delta: int):
+        conn.execute(
+            'INSERT INTO corpus_stats (key, value) VALUES (?, ?) '
+            'ON CONFLICT(key) DO UPDATE SET value = value + excluded.value',
+            (key, delta)
+        )
+
+    def _apply_stats(self, conn: sqlite3.Connection, row: tuple, sign: int):
+        """청크 1개 추가(sign=1) 또는 삭제(sign=-1)에 따른 통계 갱신"""
+        source, file_type, content_type = row[4], row[5], row[6]
+        self._bump(conn, 'chunks', sign)
+        self._bump(conn, f'file_type:{file_type}', sign)
+        self._bump(conn, f'content_type:{content_type}', sign)
+        if source:
+            current = conn.execute('SELECT chunk_count FROM source_counts WHERE source = ?', (source,)).fetchone()
+            current_count = current[0] if current else 0
+            new_count = current_count + sign
+            if new_count <= 0:
+                conn.execute('DELETE FROM source_counts WHERE source = ?', (source,))
+                if current_count > 0:
+                    self._bump(conn, 'documents', -1)
+            else:
+                conn.execute('INSERT OR REPLACE INTO source_counts (source, chunk_count) VALUES (?, ?)', (source, new_count))
+                if current_count == 0:
+                    self._bump(conn, 'documents', 1)
+
+    def _existing_rows(self, conn: sqlite3.Connection, chunk_ids: List[str]) -> Dict[str, tuple]:
+        existing = {}
+        for i in range(0, len(chunk_ids), 500):
+            batch = chunk_ids[i:i + 500]
+            placeholders = ','.join('?' * len(batch))
+            for row in conn.execute(
+                f'SELECT chunk_id, doc_id, id_prefix, filename, source, file_type, content_type, '
+                f'guide_family, guide_version, parent_id FROM chunks WHERE chunk_id IN ({placeholders})',
+                batch
+            ):
+                existing[row[0]] = row
+        return existing
+
+    def _insert_rows(self, conn: sqlite3.Connection, rows: List[tuple]) -> Set[str]:
+        """청크 행 기록 (교체된 행이 가리키던 부모 ID 반환)"""
+        # 한 번에 같은 청크 ID가 여러 번 오면 마지막 행만 사용 (INSERT OR REPLACE 결과와 통계를 일치)
+        rows = list({row[0]: row for row in rows}.values())
+        # 같은 청크 ID가 다시 등록되면 이전 통계를 먼저 차감
+        existing = self._existing_rows(conn, [row[0] for row in rows])
+        replaced_parents = set()
+        for row in rows:
+            previous = existing.pop(row[0], None)
+            if previous:
+                self._apply_stats(conn, previous, -1)
+                if previous[9]:
+                    replaced_parents.add(previous[9])
+            self._apply_stats(conn, row, 1)
+        conn.executemany(
+            'INSERT OR REPLACE INTO chunks (chunk_id, doc_id, id_prefix, filename, source, file_type, content_type, '
+            'guide_family, guide_version, parent_id) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+            rows
+        )
+        return replaced_parents
+
+    @staticmethod
+    def _prune_parents(conn: sqlite3.Connection, parent_ids: Iterable[str]):
+        """가리키는 자식 청크가 없는 부모 섹션 삭제"""
+        parent_ids = list(parent_ids)
+        for i in range(0, len(parent_ids), 500):
+            batch = parent_ids[i:i + 500]
+            placeholders = ','.join('?' * len(batch))
+            conn.execute(
+                f'DELETE FROM parent_sections WHERE parent_id IN ({placeholders}) '
+                f'AND NOT EXISTS (SELECT 1 FROM chunks WHERE chunks.parent_id = parent_sections.parent_id)',
+                batch
+            )
+
+    def register(self, chunks: Iterable[Dict[str, Any]]):
+        """
+        청크 등록
+
+        Args:
+            chunks: {"chunk_id": str, "doc_id": str, "metadata": dict} 형식의 청크 목록
+                    (자식 청크는 "parent_text"에 부모 섹션 본문을 담으면 parent_id별로 한 번만 저장)
+        """
+        chunks = list(chunks)
+        rows = [self._row(chunk['chunk_id'], chunk.get('metadata'), chunk.get('doc_id')) for chunk in chunks]
+        if not rows:
+            return
+        parents = {
+            chunk['metadata']['parent_id']: chunk['parent_text'] for chunk in chunks
+            if chunk.get('parent_text') is not None and (chunk.get('metadata') or {}).get('parent_id')
+        }
+        with self._lock:
+            conn = self._connect()
+            conn.executemany('INSERT OR REPLACE INTO parent_sections (parent_id, text) VALUES (?, ?)',
+                             list(parents.items()))
+            replaced_parents = self._insert_rows(conn, rows)
+            self._prune_parents(conn, replaced_parents - set(parents))
+            self._bump_generation(conn)
+            conn.commit()
+
+    def unregister(self, chunk_ids: Iterable[str]):
+        """청크 등록 해제"""
+        chunk_ids = list(chunk_ids)
+        if not chunk_ids:
+            return
+        with self._lock:
+            conn = self._connect()
+            existing = self._existing_rows(conn, chunk_ids)
+            for row in existing.values():
+                self._apply_stats(conn, row, -1)
+            conn.executemany('DELETE FROM chunks WHERE chunk_id = ?', [(chunk_id,) for chunk_id in existing])
+            self._prune_parents(conn, {row[9] for row in existing.values() if row[9]})
+            if existing:
+                self._bump_generation(conn)
+            conn.commit()
+
+    def chunk_ids_for(self, doc_id: str) -> List[str]:
+        """
+        문서 ID에 해당하는 청크 ID 목록
+
+        다음 중 하나라도 일치하면 해당 문서의 청크로 봅니다:
+        - doc_id 일치
+        - 청크 ID가 "doc_id-" 또는 "doc_id_"로 시작
+        - 시스템 파일명이 "doc_id_"로 시작 (업로드 파일 UUID)
+        - source가 doc_id와 일치
+        """
+        with self._lock:
+            conn = self._connect()
+            rows = conn.execute(
+                '''
+                SELECT chunk_id FROM chunks WHERE doc_id = ? OR id_prefix = ? OR source = ?
+                UNION
+                SELECT chunk_id FROM chunks WHERE chunk_id >= ? AND chunk_id < ?
+                UNION
+                SELECT chunk_id FROM chunks WHERE chunk_id >= ? AND chunk_id < ?
+                UNION
+                SELECT chunk_id FROM chunks WHERE filename >= ? AND filename < ?
+                ''',
+                # 접두사 범위 검색: '-' 다음 문자는 '.', '_' 다음 문자는 '`'
+                (doc_id, doc_id, doc_id,
+                 f"{doc_id}-", f"{doc_id}.",
+                 f"{doc_id}_", f"{doc_id}`",
+                 f"{doc_id}_", f"{doc_id}`")
+            ).fetchall()
+        return [row[0] for row in rows]
+
+    def parent_texts(self, parent_ids: Iterable[str]) -> Dict[str, str]:
+        """부모 ID → 부모 섹션 본문 (저장되지 않은 ID는 제외)"""
+        parent_ids = list(dict.fromkeys(parent_ids))
+        texts = {}
+        with self._lock:
+            conn = self._connect()
+            for i in range(0, len(parent_ids), 500):
+                batch = parent_ids[i:i + 500]
+                placeholders = ','.join('?' * len(batch))
+                texts.update(conn.execute(
+                    f'SELECT parent_id, text FROM parent_sections WHERE parent_id IN ({placeholders})', batch
+                ).fetchall())
+        return texts
+
+    def all_parent_sections(self) -> Dict[str, str]:
+        """저장된 모든 부모 섹션 {부모 ID: 본문} (스냅샷 내보내기용)"""
+        with self._lock:
+            conn = self._connect()
+            return dict(conn.execute('SELECT parent_id, text FROM parent_sections').fetchall())
+
+    def put_parent_sections(self, parents: Dict[str, str]):
+        """부모 섹션 본문 저장 (스냅샷 복원용, 자식이 없는 부모는 다음 재구축 시 정리)"""
+        if not parents:
+            return
+        with self._lock:
+            conn = self._connect()
+            conn.executemany('INSERT OR REPLACE INTO parent_sections (parent_id, text) VALUES (?, ?)',
+                             list(parents.items()))
+            conn.commit()
+
+    def all_document_ids(self) -> Set[str]:
+        """등록된 모든 문서 ID (메타데이터 doc_id + 청크 ID 접두사)"""
+        with self._lock:
+            conn = self._connect()
+            rows = conn.execute(
+                '''
+                SELECT DISTINCT doc_id FROM chunks WHERE doc_id IS NOT NULL
+                UNION
+                SELECT DISTINCT id_prefix FROM chunks WHERE id_prefix IS NOT NULL
+                '''
+            ).fetchall()
+        return {row[0] for row in rows}
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        증분 관리되는 코퍼스 통계 (컬렉션 크기와 무관하게 카운터만 조회)
+
+        Returns:
+            {"chunk_count", "document_count", "file_types", "content_types"}
+        """
+        with self._lock:
+            conn = self._connect()
+            counters = dict(conn.execute('SELECT key, value FROM corpus_stats WHERE value != 0').fetchall())
+        return {
+            "chunk_count": counters.get('chunks', 0),
+            "document_count": counters.get('documents', 0),
+            "file_types": {key.split(':', 1)[1]: value for key, value in counters.items() if key.startswith('file_type:')},
+            "content_types": {key.split(':', 1)[1]: value for key, value in counters.items() if key.startswith('content_type:')}
+        }
+
+    def guide_versions(self) -> Dict[str, Dict[str, Any]]:
+        """
+        업무 안내 가이드 버전 카탈로그
+
+        Returns:
+            {가이드 계열: {"versions": [저장된 버전 값, 오래된 순], "latest": 최신 버전 값}}
+            날짜가 없는 파일의 버전("latest")은 해당 계열의 최신으로 봅니다.
+        """
+        with self._lock:
+            conn = self._connect()
+            rows = conn.execute(
+                "SELECT DISTINCT guide_family, guide_version FROM chunks WHERE content_type = 'procedure_guide'"
+            ).fetchall()
+        catalog = {}
+        for family, version in rows:
+            catalog.setdefault(family or '', {"versions": []})["versions"].append(version)
+        for entry in catalog.values():
+            # 날짜 없는 버전 > 날짜 최신순
+            entry["versions"].sort(key=lambda value: (canonical_guide_version(value) is None,
+                                                      canonical_guide_version(value) or ''))
+            entry["latest"] = entry["versions"][-1]
+        return catalog
+
+    def resolve_guide_versions(self, requested: Optional[str], family: Optional[str] = None) -> List[str]:
+        """
+        요청된 가이드 버전에 해당하는 저장된 버전 값 목록
+
+        날짜를 요청하면 그 날짜의 버전 값(표기가 달라도 같은 날짜면 포함)을 반환합니다.
+        그런 버전이 없거나 날짜가 아니거나 "latest"이면 가이드 계열의 최신 버전 값을 반환합니다
+        (계열이 주어지면 그 계열의 최신 버전만, 없으면 각 계열의 최신 버전).
+
+        Args:
+            requested: 요청된 버전 (날짜 또는 "latest")
+            family: 가이드 계열 이름 (주어지면 그 계열 안에서만 찾음)
+        """
+        catalog = self.guide_versions()
+        if family is not None:
+            catalog = {name: entry for name, entry in catalog.items() if name == family}
+        requested_key = canonical_guide_version(requested)
+        if requested_key:
+            matches = sorted({version for entry in catalog.values() for version in entry["versions"]
+                              if canonical_guide_version(version) == requested_key})
+            if matches:
+                return matches
+        return sorted({entry["latest"] for entry in catalog.values()})
+
+    def get_meta(self, key: str, default: str = None) -> str:
+        """레지스트리 메타 값 조회"""
+        with self._lock:
+            conn = self._connect()
+            row = conn.execute("SELECT value FROM registry_meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else default
+
+    def set_meta(self, key: str, value: str):
+        """레지스트리 메타 값 저장"""
+        with self._lock:
+            conn = self._connect()
+            conn.execute("INSERT OR REPLACE INTO registry_meta (key, value) VALUES (?, ?)", (key, value))
+            conn.commit()
+
+    def get_state(self, key: str, default: str = None) -> str:
+        """벡터 DB 상태 값 조회 (레지스트리 스키마가 바뀌어도 유지)"""
+        with self._lock:
+            conn = self._connect()
+            row = conn.execute("SELECT value FROM vector_state WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else default
+
+    def set_state(self, key: str, value: str):
+        """벡터 DB 상태 값 저장"""
+        with self._lock:
+            conn = self._connect()
+            conn.execute("INSERT OR REPLACE INTO vector_state (key, value) VALUES (?, ?)", (key, value))
+            conn.commit()
+
+    def vacuum(self):
+        """SQLite 파일 VACUUM (삭제된 청크 행이 차지하던 공간 반환)"""
+        with self._lock:
+            conn = self._connect()
+            conn.commit()
+            conn.execute("VACUUM")
+
+    def bump_generation(self):
+        """청크 변경 없이 코퍼스 세대만 증가 (임베딩 모델 전환 등 검색 결과가 달라지는 경우)"""
+        with self._lock:
+            conn = self._connect()
+            self._bump_generation(conn)
+            conn.commit()
+
+    @staticmethod
+    def _bump_generation(conn: sqlite3.Connection):
+        conn.execute(
+            "INSERT INTO registry_meta (key, value) VALUES ('generation', '1') "
+            "ON CONFLICT(key) DO UPDATE SET value = CAST(CAST(value AS INTEGER) + 1 AS TEXT)"
+        )
+
+    def generation(self) -> int:
+        """현재 코퍼스 세대 (청크 추가/삭제 시 증가, 프로세스 간 공유)"""
+        return int(self.get_meta('generation', '0'))
+
+    def is_built(self) -> bool:
+        """기존 벡터 DB로부터 레지스트리가 구축되었는지 여부"""
+        return self.get_meta('built') == '1'
+
+    def rebuild(self, collection, page_size: int = 1000):
+        """
+        벡터 DB 컬렉션을 페이지 단위로 읽어 레지스트리를 재구축합니다
+
+        Args:
+            collection: ChromaDB 컬렉션
+            page_size: 한 번에 읽을 청크 수
+        """
+        with self._lock:
+            conn = self._connect()
+            conn.execute('DELETE FROM chunks')
+            conn.execute('DELETE FROM source_counts')
+            conn.execute('DELETE FROM corpus_stats')
+            offset = 0
+            total = 0
+            while True:
+                page = collection.get(include=["metadatas"], limit=page_size, offset=offset)
+                ids = page.get('ids') or []
+                if not ids:
+                    break
+                metadatas = page.get('metadatas') or [None] * len(ids)
+                self._insert_rows(conn, [self._row(chunk_id, metadata) for chunk_id, metadata in zip(ids, metadatas)])
+                total += len(ids)
+                offset += len(ids)
+            # 자식 청크가 남아 있지 않은 부모 섹션 정리
+            conn.execute('DELETE FROM parent_sections WHERE parent_id NOT IN '
+                         '(SELECT parent_id FROM chunks WHERE parent_id IS NOT NULL)')
+            conn.execute("INSERT OR REPLACE INTO registry_meta (key, value) VALUES ('built', '1')")
+            self._bump_generation(conn)
+            conn.commit()
+        print(f"청크 레지스트리 재구축 완료: {total}개 청크")
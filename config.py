@@ -13,7 +13,127 @@ RAG_SYSTEM = {
     "enabled": True,
     "model": "gpt-3.5-turbo",
     "temperature": 0.7,
-    "max_tokens": 800
+    "max_tokens": 800,
+    # 검색 문서 컨텍스트의 모델별 최대 토큰 수 (모델이 없으면 default)
+    "context_token_budget": {
+        "gpt-3.5-turbo": 2500,
+        "gpt-4o-mini": 6000,
+        "gpt-4o": 6000,
+        "default": 2000
+    }
+}
+
+# 벡터 검색 임베딩 백엔드 설정
+EMBEDDING_BACKEND = {
+    "primary": "openai",  # 기본 임베딩 백엔드: openai, openai:<모델명> 또는 local (네트워크 불필요)
+    "local_index": True,  # 오프라인 모드 검색용 로컬 임베딩 컬렉션을 함께 유지
+    # primary를 바꾸면 기존 모델 컬렉션으로 계속 검색하면서 백그라운드에서 새 모델로 재임베딩 후 전환
+    "auto_reembed": True,       # 시작 시 사용 중인 모델과 primary가 다르면 재임베딩 자동 시작
+    "reembed_batch_size": 100,  # 재임베딩 배치당 청크 수
+    "reembed_interval": 1.0     # 배치 사이 대기 시간(초) - 검색/업로드와 API 한도를 나눠 쓰기 위한 스로틀
+}
+
+# 하이브리드(BM25 + 벡터) 검색 설정
+HYBRID_RETRIEVAL = {
+    "enabled": True,
+    "candidates": 20,           # 각 검색에서 가져올 후보 수
+    "rrf_k": 60,                # Reciprocal Rank Fusion 상수
+    "lexical_confidence": 0.8,  # 어휘 검색만으로 응답할 최소 질문 토큰 커버리지
+    "lexical_margin": 1.5       # 1위 점수가 2위 점수의 몇 배 이상이어야 확실하다고 볼지
+}
+
+# 메타데이터 사전 필터 인덱스 (필터 조건에 맞는 청크 ID를 메모리에서 계산해 벡터 검색 허용 목록으로 사용)
+METADATA_INDEX = {
+    "enabled": True,
+    "fields": ["content_type", "guide_version", "file_type", "vendor"],
+    "max_allow_list": 2000  # ChromaDB에 ID 목록으로 넘길 최대 개수 (더 많으면 where 조건으로 검색)
+}
+
+# 부모-자식 청크 (작은 자식 청크를 임베딩해 검색하고, 프롬프트에는 중복 없는 부모 섹션을 넣음)
+PARENT_CHILD_CHUNKING = {
+    "enabled": True,
+    "child_size": 200,           # 자식 청크 최대 글자 수 (문장 단위로 묶음, 가이드 행은 필드 단위)
+    "min_child_size": 40,        # 이보다 짧은 마지막 자식은 앞 자식에 합침
+    "candidate_multiplier": 3    # 부모 섹션 top_k개를 채우기 위해 검색할 자식 청크 배수
+}
+
+# 벡터 거리 분포로 프롬프트에 넣을 청크 수 결정 (확실한 질문은 적게, 애매한 질문은 많이)
+ADAPTIVE_TOP_K = {
+    "enabled": True,
+    "min_k": 1,           # 최소 청크 수
+    "max_k": 5,           # 최대 청크 수 (호출 시 top_k가 더 작으면 top_k)
+    "gap_ratio": 0.4,     # 인접 거리 간격이 상위 후보 거리 범위의 이 비율 이상이면 그 앞에서 자름
+    "min_gap": 0.05       # 자를 간격의 최소 절대 거리 (거리가 거의 같은 후보를 임의로 자르지 않도록)
+}
+
+# 검색 후보 재순위화 (로컬 CPU 점수 + MMR, 프롬프트에 넣을 청크 수 축소)
+RERANKER = {
+    "enabled": True,
+    "candidate_multiplier": 3,    # top_k의 몇 배를 후보로 검색할지
+    "lexical_weight": 0.4,        # 질문 토큰 커버리지 가중치
+    "semantic_weight": 0.3,       # 로컬 n-gram 임베딩 유사도 가중치
+    "rank_weight": 0.3,           # 기존 검색 순위 가중치
+    "mmr_lambda": 0.7,            # 관련도 비중 (낮을수록 다양성 중시)
+    "duplicate_threshold": 0.9,   # 선택된 청크와 이 유사도 이상이면 중복으로 제외
+    "min_relevance_ratio": 0.35   # 1위 대비 관련도가 이 비율 미만인 청크는 제외
+}
+
+# 문서 임베딩 수집 설정 (임베딩 API 한도: text-embedding-ada-002 기본 등급 기준)
+INGESTION = {
+    "batch_size": 100,              # 임베딩 요청 1회당 청크 수
+    "workers": 4,                   # 동시 임베딩 요청 수
+    "tokens_per_minute": 1000000,   # 분당 토큰 한도 (TPM)
+    "requests_per_minute": 3000,    # 분당 요청 한도 (RPM)
+    "max_retries": 5,               # 429 / 5xx 응답 재시도 횟수
+    "base_delay": 1.0,              # 첫 재시도 대기 시간 (초, 이후 2배씩 증가)
+    "max_delay": 60.0               # 최대 재시도 대기 시간 (초)
+}
+
+# 검색 결과 캐시 (retrieve_relevant_documents, 코퍼스 변경 시 자동 무효화)
+RETRIEVAL_CACHE = {
+    "enabled": True,
+    "max_entries": 512  # 캐시할 최대 질문 수 (LRU)
+}
+
+# 메모리 매핑 벡터 인덱스 (ChromaDB 임베딩을 내보내 프로세스 내 NumPy로 검색, 워커 간 읽기 전용 공유)
+MMAP_INDEX = {
+    "enabled": False,
+    "directory": "./chroma_db/mmap_index",
+    "compact_deleted_ratio": 0.2,  # 삭제 표시된 행 비율이 이보다 크면 전체 다시 내보내기
+    "quantized": False,            # int8 양자화 검색 (상주 메모리 약 1/4, 최종 후보는 float32로 재채점)
+    "rescore_multiplier": 4        # 재채점할 후보 수 (요청 수의 배수, 클수록 정확도↑ 속도↓)
+}
+
+# content_type별 샤드 컬렉션 (기본 컬렉션의 검색 전용 사본, 기존 임베딩을 재사용하므로 API 호출 없음)
+# 필터에 맞는 샤드에만 동시에 검색하고 거리순으로 병합 (메모리 매핑 인덱스가 켜져 있으면 그쪽을 우선 사용)
+SHARDED_COLLECTIONS = {
+    "enabled": False,
+    # 샤드 이름: 메타데이터 조건 (값 또는 값 목록, 위에서부터 처음 일치하는 샤드에 저장)
+    "shards": {
+        "procedure_guide": {"content_type": "procedure_guide"},
+        "csv_narrative": {"content_type": "csv_narrative"},
+        "manual": {"file_type": ["pdf", "pptx", "ppt"]}
+    },
+    "default_shard": "general",  # 어느 조건에도 맞지 않는 청크
+    "shard_top_k": {},           # 샤드별 최대 검색 수 (예: {"manual": 5}, 없으면 요청한 수)
+    "workers": 4                 # 동시 샤드 검색 스레드 수
+}
+
+# 벡터 DB 스냅샷 (임베딩 포함 내보내기/복원)
+SNAPSHOT = {
+    "directory": "./snapshots",  # 벡터 DB 초기화(reset_database)와 무관하게 유지
+    "page_size": 1000            # 내보내기/복원 시 한 번에 처리할 청크 수
+}
+
+# 벡터 DB 유지보수 (python maintenance.py run 또는 앱 실행 중 주기 실행)
+MAINTENANCE = {
+    "enabled": True,                     # 앱 실행 중 주기적으로 실행
+    "interval_hours": 24,                # 실행 주기 (첫 실행은 앱 시작 후 한 주기 뒤)
+    "hnsw_rebuild_deleted_ratio": 0.2,   # HNSW 인덱스의 삭제 항목 비율이 이 값 이상이면 컬렉션 재구축
+    "vacuum": True,                      # 청크 레지스트리 / 임베딩 캐시 VACUUM (chroma.sqlite3는 앱 중지 후 chroma utils vacuum)
+    "latency_probes": 20,                # 전후 검색 지연 측정 질문 수 (저장된 임베딩 사용, API 호출 없음)
+    "page_size": 1000,                   # 컬렉션 재구축 시 한 번에 복사할 청크 수
+    "reader_timeout": 60                 # 교체된 컬렉션을 쓰는 검색이 끝나기를 기다릴 최대 시간(초), 초과 시 다음 실행에서 삭제
 }
 
 # 키워드 기반 분기 설정
@@ -0,0 +1,176 @@
+"""
+RAG 컨텍스트 구성 모듈
+- 모델별 토큰 예산(RAG_SYSTEM["context_token_budget"]) 안에서 검색 문서를 순위순으로 담음
+- 같은 문서의 인접 청크(chunk_text 오버랩)는 겹치는 부분을 한 번만 남기고 이어 붙임
+- 업무 안내 가이드 필드(질문 예시 / 요약 응답 / 상세 안내)가 본문에 이미 있으면 생략
+- 사용한 토큰 수를 함께 반환
+"""
+
+from typing import List, Dict, Any, Optional
+
+try:
+    import tiktoken
+except ImportError:
+    tiktoken = None
+
+from ingestion import estimate_tokens
+
+# 예산 설정에 모델이 없을 때 사용할 키
+DEFAULT_BUDGET_KEY = "default"
+
+# 오버랩으로 볼 최소/최대 겹침 길이 (chunk_text 기본 오버랩은 100자)
+MIN_OVERLAP = 20
+MAX_OVERLAP = 300
+
+# 남은 예산이 이보다 작으면 문서를 잘라서 넣지 않음
+MIN_PARTIAL_TOKENS = 64
+
+GUIDE_FIELDS = [("질문 예시", "질문"), ("요약 응답", "요약"), ("상세 안내", "안내")]
+
+_encodings = {}
+
+
+def count_tokens(text: str, model: str) -> int:
+    """모델 토크나이저로 토큰 수 계산 (tiktoken이 없으면 보수적으로 추정)"""
+    if tiktoken is not None:
+        encoding = _encodings.get(model)
+        if encoding is None:
+            try:
+                encoding = tiktoken.encoding_for_model(model)
+            except KeyError:
+                encoding = tiktoken.get_encoding("cl100k_base")
+            _encodings[model] = encoding
+        return len(encoding.encode(text or ''))
+    return estimate_tokens(text) if text else 0
+
+
+def token_budget(budgets: Dict[str, int], model: str) -> int:
+    return budgets.get(model, budgets.get(DEFAULT_BUDGET_KEY, 2000))
+
+
+def overlap_length(previous: str, following: str) -> int:
+    """previous의 끝과 following의 시작이 겹치는 길이 (없으면 0)"""
+    limit = min(len(previous), len(following), MAX_OVERLAP)
+    for length in range(limit, MIN_OVERLAP - 1, -1):
+        if previous.endswith(following[:length]):
+            return length
+    return 0
+
+
+def _document_key(metadata: Dict[str, Any]) -> Optional[str]:
+    return metadata.get('doc_id') or metadata.get('source') or metadata.get('filename')
+
+
+def stitch_adjacent_chunks(docs: List[Any]) -> List[Dict[str, Any]]:
+    """
+    같은 문서의 연속된 청크(chunk_index가 1씩 증가)를 하나로 이어 붙입니다
+
+    업무 안내 가이드는 행 단위 청크이므로 이어 붙이지 않습니다.
+    묶음은 그 안에서 가장 순위가 높은 청크의 위치에 놓입니다.
+
+    Returns:
+        [{"text", "metadata", "chunks"(포함된 청크 수)}] (순위순)
+    """
+    groups = {}
+    for rank, doc in enumerate(docs):
+        metadata = getattr(doc, 'metadata', None) or {}
+        key = _document_key(metadata)
+        if key is None or metadata.get('content_type') == 'procedure_guide' \
+                or not isinstance(metadata.get('chunk_index'), int):
+            # 이어 붙이지 않는 청크는 (None, 순위)로 따로 묶음
+            key = (None, rank)
+        groups.setdefault(key, []).append((rank, metadata.get('chunk_index'), doc))
+
+    blocks = []
+    for key, members in groups.items():
+        if isinstance(key, tuple):
+            rank, _, doc = members[0]
+            blocks.append((rank, {"text": doc.page_content, "metadata": getattr(doc, 'metadata', None) or {},
+                                  "chunks": 1}))
+            continue
+        # chunk_index 순으로 정렬한 뒤 연속 구간마다 이어 붙임
+        members.sort(key=lambda member: member[1])
+        run = [members[0]]
+        for member in members[1:] + [None]:
+            if member is not None and member[1] == run[-1][1] + 1:
+                run.append(member)
+                continue
+            text = run[0][2].page_content
+            for _, _, doc in run[1:]:
+                overlap = overlap_length(text, doc.page_content)
+                text += doc.page_content[overlap:] if overlap else " " + doc.page_content
+            blocks.append((min(rank for rank, _, _ in run),
+                           {"text": text, "metadata": getattr(run[0][2], 'metadata', None) or {}, "chunks": len(run)}))
+            if member is not None:
+                run = [member]
+    blocks.sort(key=lambda block: block[0])
+    return [block for _, block in blocks]
+
+
+def _format_block(number: int, text: str, metadata: Dict[str, Any]) -> str:
+    if metadata.get('content_type') != 'procedure_guide':
+        return f"- ({number}) \"{text}\"\n\n"
+
+    # 업무 가이드 형식 (버전 정보 포함, 본문에 이미 있는 필드는 생략)
+    guide_version = metadata.get('guide_version', 'latest')
+    version_text = f" (버전: {guide_version})" if guide_version != 'latest' else ""
+    block = f"- ({number}) 업무 안내{version_text}: "
+    for field, label in GUIDE_FIELDS:
+        value = str(metadata.get(field) or '').strip()
+        if value and value not in text:
+            block += f"[{label}: {value}] "
+    return block + f"\n  원본내용: \"{text}\"\n\n"
+
+
+def _fit_block(number: int, text: str, metadata: Dict[str, Any], max_tokens: int, model: str) -> str:
+    """포맷된 문서가 max_tokens 이하가 되도록 본문 뒷부분을 자름 (들어갈 수 없으면 빈 문자열)"""
+    low, high = 0, len(text)
+    while low < high:
+        middle = (low + high + 1) // 2
+        if count_tokens(_format_block(number, text[:middle] + "…", metadata), model) <= max_tokens:
+            low = middle
+        else:
+            high = middle - 1
+    return _format_block(number, text[:low] + "…", metadata) if low else ""
+
+
+def build_context(docs: List[Any], model: str, budget: int) -> Dict[str, Any]:
+    """
+    검색 문서로 토큰 예산 안의 컨텍스트 문자열을 만듭니다
+
+    Args:
+        docs: 순위순 문서 (page_content, metadata를 가진 객체)
+        model: 토큰 계산에 사용할 모델
+        budget: 컨텍스트 최대 토큰 수
+
+    Returns:
+        {"context", "tokens", "budget", "documents"(포함된 청크 수), "truncated"(예산 때문에 빠지거나 잘린 문서 여부)}
+    """
+    context = "Context:\n"
+    tokens = count_tokens(context, model)
+    included = 0
+    truncated = False
+    for number, block in enumerate(stitch_adjacent_chunks(docs), start=1):
+        formatted = _format_block(number, block["text"], block["metadata"])
+        block_tokens = count_tokens(formatted, model)
+        if tokens + block_tokens > budget:
+            truncated = True
+            remaining = budget - tokens
+            if remaining < MIN_PARTIAL_TOKENS:
+                break
+            formatted = _fit_block(number, block["text"], block["metadata"], remaining, model)
+            if not formatted:
+                break
+            block_tokens = count_tokens(formatted, model)
+        context += formatted
+        tokens += block_tokens
+        included += block["chunks"]
+        if truncated:
+            break
+    return {
+        "context": context,
+        "tokens": tokens,
+        "budget": budget,
+        "documents": included,
+        "truncated": truncated
+    }
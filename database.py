@@ -1,19 +1,74 @@
 import os
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Set, Tuple
 import json
 from pathlib import Path
 import shutil
+import hashlib
+import atexit
+import threading
+import time
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
 
 # Vector database
 import chromadb
 from chromadb.config import Settings
 #from chromadb.utils import embedding_functions
-from chromadb.utils.embedding_functions import OpenAIEmbeddingFunction
 
 # OpenAI embedding model
 import openai
 #from openai import OpenAI ##2025-05-29 12:58 수정 (##처리)
 
+# 임베딩 백엔드 (openai / local)
+from config import EMBEDDING_BACKEND
+from embedding_backends import get_backend, EmbeddingBackend
+
+# 질문 임베딩 캐시
+from embedding_store import query_embedding_cache, chunk_embedding_store, content_hash
+
+# 문서 → 청크 ID 레지스트리
+from chunk_registry import ChunkRegistry, guide_family, canonical_guide_version
+
+# 어휘(BM25) 검색 인덱스
+from config import HYBRID_RETRIEVAL
+from lexical_index import LexicalIndex
+
+# 메타데이터 사전 필터 인덱스 (필터 -> 청크 ID 허용 목록)
+from config import METADATA_INDEX
+from metadata_index import MetadataIndex
+
+# 메모리 매핑 벡터 인덱스 (선택)
+from config import MMAP_INDEX
+from mmap_index import MmapVectorIndex
+
+# 임베딩 수집 파이프라인 (동시 임베딩 + 한도/재시도 + 단일 writer)
+from config import INGESTION
+from ingestion import RateLimiter, rate_limited_embedding, run_ingestion
+
+# 벡터 DB 마이그레이션 (번호별 1회 실행, 컬렉션 메타데이터에 기록)
+from migrations import migration, run_migrations, schema_version, SCHEMA_VERSION_KEY
+
+# content_type별 샤드 컬렉션 (동시 검색 후 거리순 병합)
+from config import SHARDED_COLLECTIONS
+
+# 벡터 DB 스냅샷 (임베딩 포함 내보내기/복원)
+from config import SNAPSHOT
+from snapshot import write_snapshot, read_snapshot, list_snapshots
+
+# 부모-자식 청크 (자식 청크 검색 결과를 부모 섹션으로 확장)
+from config import PARENT_CHILD_CHUNKING
+from document_processor import CHILD_METADATA_KEYS
+
+# 벡터 DB 유지보수 (HNSW 재구축, 레지스트리/캐시 VACUUM)
+from config import MAINTENANCE
+from maintenance import (
+    CHROMA_SQLITE_FILENAME, CHROMA_VACUUM_COMMAND, directory_size, vector_segments, embeddings_log_size,
+    chroma_layout_supported, vacuum_sqlite, print_report
+)
+
+# 검색 거리 분포로 반환할 청크 수 결정
+from config import ADAPTIVE_TOP_K
+
 
 # Initialize OpenAI client for embeddings
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY", "")
@@ -24,118 +79,1092 @@ openai.api_key = OPENAI_API_KEY
 CHROMA_DB_DIRECTORY = "./chroma_db"
 COLLECTION_NAME = "uploaded_docs"  # 요구사항에 맞게 컬렉션명 변경
 
-# Create embedding function
-embedding_function = OpenAIEmbeddingFunction(
-    api_key=OPENAI_API_KEY,
-    model_name="text-embedding-ada-002"
-)
+# 검색/수집에 사용 중인 기본 임베딩 백엔드는 collection_manager가 관리 (get_primary_backend)
+# 재임베딩으로 모델이 전환된 벡터 DB는 최초 연결 시 레지스트리에 기록된 사용 중 백엔드를 사용
+
+# 레지스트리 상태 키 (스키마 변경에도 유지): 검색/수집에 사용 중인 임베딩 백엔드, 임베딩 버전(모델 전환마다 증가), 재임베딩 진행 상태
+ACTIVE_BACKEND_KEY = "active_embedding_backend"
+EMBEDDING_VERSION_KEY = "embedding_version"
+REEMBED_TARGET_KEY = "reembed_target"
+REEMBED_CURSOR_KEY = "reembed_cursor"
+
+# 청크 메타데이터에 기록하는 임베딩 모델/버전 키
+EMBEDDING_STAMP_KEYS = ("embedding_model", "embedding_version")
+
+# 오프라인 검색용 로컬 임베딩 인덱스 (기본 백엔드가 로컬이면 별도 인덱스 불필요, local_index_enabled)
+local_backend = get_backend("local")
+# 비어 있거나 청크가 빠진 로컬 인덱스를 채우는 백그라운드 구축 스레드 (프로세스당 1개)
+_local_index_lock = threading.Lock()
+_local_index_thread = None
 
-# 마이그레이션 상태를 저장할 파일 경로
+# 기존 ada 임베딩 컬렉션 이름은 그대로 유지
+DEFAULT_EMBEDDING_MODEL = "text-embedding-ada-002"
+
+class EmbeddingModelMismatchError(Exception):
+    """컬렉션에 고정된 임베딩 모델과 다른 백엔드로 접근할 때 발생"""
+    pass
+
+def collection_name_for(backend: EmbeddingBackend) -> str:
+    """임베딩 모델별 컬렉션 이름 (모델이 다른 벡터가 한 컬렉션에 섞이지 않도록 분리)"""
+    if backend.model_name == DEFAULT_EMBEDDING_MODEL:
+        return COLLECTION_NAME
+    return f"{COLLECTION_NAME}__{backend.model_name}"
+
+# 이전 방식(플래그 파일)의 마이그레이션 완료 표시 경로 (마이그레이션 1 적용 여부 판단용)
 MIGRATION_STATUS_FILE = os.path.join(CHROMA_DB_DIRECTORY, "migration_completed.flag")
 
-def initialize_database():
-    """Initialize or connect to the ChromaDB vector database"""
-    # Make sure the directory exists
-    Path(CHROMA_DB_DIRECTORY).mkdir(parents=True, exist_ok=True)
+# 문서 ID / 파일명 / source → 청크 ID 레지스트리 (벡터 DB와 같은 디렉토리에 저장)
+CHUNK_REGISTRY_FILE = os.path.join(CHROMA_DB_DIRECTORY, "chunk_registry.sqlite3")
+chunk_registry = ChunkRegistry(CHUNK_REGISTRY_FILE)
+
+# 프로세스 내 BM25 인덱스 (최초 검색 시 벡터 DB로부터 구축, 이후 증분 갱신)
+lexical_index = LexicalIndex()
+# 재구축 직렬화 (새 인덱스를 따로 만든 뒤 완성되면 전역 참조만 교체)
+_lexical_index_lock = threading.Lock()
+
+# 프로세스 내 메타데이터 posting list (최초 필터 검색 시 벡터 DB로부터 구축, 이후 증분 갱신)
+METADATA_INDEX_FIELDS = METADATA_INDEX.get("fields", ["content_type", "guide_version", "file_type", "vendor"])
+metadata_index = MetadataIndex(METADATA_INDEX_FIELDS)
+# 재구축 직렬화 (새 인덱스를 따로 만든 뒤 완성되면 전역 참조만 교체)
+_metadata_index_lock = threading.Lock()
+
+# 메모리 매핑 벡터 인덱스 (기본 임베딩 모델 컬렉션 전용)
+mmap_index = MmapVectorIndex(
+    MMAP_INDEX.get("directory", os.path.join(CHROMA_DB_DIRECTORY, "mmap_index")),
+    quantized=MMAP_INDEX.get("quantized", False),
+    rescore_multiplier=MMAP_INDEX.get("rescore_multiplier", 4)
+)
+_mmap_export_lock = threading.Lock()
+
+# 임베딩 API 한도 (프로세스 내 모든 수집 요청이 공유)
+ingestion_rate_limiter = RateLimiter(
+    INGESTION.get("tokens_per_minute", 1000000),
+    INGESTION.get("requests_per_minute", 3000)
+)
+# 백엔드 모델별 한도/재시도 적용 임베딩 함수 (재임베딩 작업도 같은 한도를 공유)
+_ingestion_embedding_functions = {}
+# 벡터 DB / 레지스트리 / 인덱스 쓰기 직렬화 (단일 writer)
+_write_lock = threading.RLock()
+# 문서 편집으로 교체되어 삭제 대기 중인 청크 ID (새 청크 기록부터 삭제 완료까지 벡터 검색 결과에서 제외)
+_retiring_chunk_ids = frozenset()
+
+# 샤드 컬렉션 동시 검색 스레드 (스레드는 첫 검색 시 생성)
+_shard_executor = ThreadPoolExecutor(
+    max_workers=max(1, SHARDED_COLLECTIONS.get("workers", 4)),
+    thread_name_prefix="shard-search"
+)
+
+# 질문에서 장비 유형(벤더)을 감지하기 위한 키워드 (제품/제조사명만, 감지되면 vendor 필터 검색)
+VENDOR_QUERY_KEYWORDS = {
+    "nexg": ["넥스지", "nexg", "vforce", "넥스쥐", "axgate", "엑스게이트", "브이포스", "v-force", "vforceㅡ", "브이포스-utm"],
+    "cisco": ["시스코", "cisco", "nexus", "넥서스"],
+    "alteon": ["알티온", "alteon", "radware", "라드웨어"],
+}
+
+# 특정 벤더를 뜻하지 않는 일반 장비 키워드 (필터 없이 검색한 결과에서 해당 벤더 문서를 앞으로 정렬만 함)
+VENDOR_HINT_KEYWORDS = {
+    "cisco": ["aci", "스위치", "라우터", "switch", "router"],
+    "alteon": ["로드밸런서", "load balancer", "lb"],
+}
+
+# 수집 시 청크를 벤더로 분류하기 위한 키워드 (제품/제조사명만 사용)
+VENDOR_TAG_KEYWORDS = {
+    "nexg": ["nexg", "넥스지", "vforce", "v-force", "브이포스", "axgate", "엑스게이트"],
+    "cisco": ["cisco", "시스코", "nexus", "넥서스"],
+    "alteon": ["alteon", "알티온", "radware", "라드웨어"],
+}
+
+# 이전 버전 컬렉션명 (마이그레이션 1에서 uploaded_docs로 이전)
+LEGACY_COLLECTION_NAME = "shinhan_documents"
+MIGRATION_PAGE_SIZE = 500
+
+@migration(1, f"이전 컬렉션({LEGACY_COLLECTION_NAME}) 데이터를 {COLLECTION_NAME}로 이전")
+def _migrate_legacy_collection(chroma_client, collection, cursor: int, checkpoint):
+    """이전 컬렉션을 페이지 단위로 복사합니다 (같은 임베딩 모델이면 저장된 벡터를 그대로 사용)"""
+    # 플래그 파일 기반이던 이전 방식으로 이미 이전한 경우
+    if os.path.exists(MIGRATION_STATUS_FILE):
+        print("이전 컬렉션 마이그레이션이 이미 완료되었습니다.")
+        return
+    try:
+        old_collection = chroma_client.get_collection(name=LEGACY_COLLECTION_NAME)
+    except Exception:
+        print("이전 컬렉션이 없습니다. 마이그레이션 불필요.")
+        return
     
-    # 마이그레이션 완료 여부 확인 (파일 기반)
-    migration_completed = os.path.exists(MIGRATION_STATUS_FILE)
+    reuse_embeddings = get_primary_backend().model_name == DEFAULT_EMBEDDING_MODEL
+    include = ["documents", "metadatas", "embeddings"] if reuse_embeddings else ["documents", "metadatas"]
+    offset = cursor
+    while True:
+        page = old_collection.get(include=include, limit=MIGRATION_PAGE_SIZE, offset=offset)
+        ids = page.get('ids') or []
+        if not ids:
+            break
+        documents = page.get('documents') or [''] * len(ids)
+        # 메타데이터가 None인 경우 빈 딕셔너리로 대체
+        metadatas = [dict(metadata or {}) for metadata in (page.get('metadatas') or [None] * len(ids))]
+        chunks = [
+            {"chunk_id": chunk_id, "text": text, "metadata": metadata, "doc_id": metadata.get("doc_id")}
+            for chunk_id, text, metadata in zip(ids, documents, metadatas)
+        ]
+        tag_chunk_vendors(chunks)
+        embeddings = page.get('embeddings') if reuse_embeddings else None
+        if embeddings is None or len(embeddings) != len(ids):
+            embeddings = embed_texts(documents)
+        # upsert이므로 중단 후 같은 페이지를 다시 처리해도 안전
+        collection.upsert(
+            ids=ids,
+            documents=documents,
+            embeddings=[[float(x) for x in vector] for vector in embeddings],
+            metadatas=metadatas
+        )
+        chunk_registry.register(chunks)
+        offset += len(ids)
+        checkpoint(offset)
+        print(f"마이그레이션 진행: {offset}개 청크 이전")
+    print(f"마이그레이션이 성공적으로 완료되었습니다: '{COLLECTION_NAME}'")
+
+@migration(2, "기존 청크에 장비 유형(vendor) 태그 추가")
+def _migrate_vendor_tags(chroma_client, collection, cursor: int, checkpoint):
+    # 레지스트리 메타데이터로 기록하던 이전 방식으로 이미 보강한 경우
+    if chunk_registry.get_meta('vendor_tagged') == '1':
+        return
+    _backfill_vendor_tags(collection, start=cursor, checkpoint=checkpoint)
+    chunk_registry.set_meta('vendor_tagged', '1')
+
+@migration(3, "기존 청크에 임베딩 모델/버전(embedding_model, embedding_version) 기록")
+def _migrate_embedding_stamps(chroma_client, collection, cursor: int, checkpoint):
+    _backfill_embedding_stamps(collection, start=cursor, checkpoint=checkpoint)
+
+def _pinned_model(collection) -> Optional[str]:
+    """컬렉션이 고정된 임베딩 모델"""
+    return (collection.metadata or {}).get("embedding_model")
+
+def _open_pinned_collection(chroma_client, backend: EmbeddingBackend, name: Optional[str] = None):
+    """
+    백엔드의 임베딩 모델에 고정된 컬렉션을 열거나 생성합니다
     
-    # Create or connect to the database
-    chroma_client = chromadb.PersistentClient(
-        path=CHROMA_DB_DIRECTORY,
-        settings=Settings(anonymized_telemetry=False)
-    )
+    Args:
+        name: 컬렉션 이름 (기본값: 백엔드 모델별 컬렉션 이름)
     
-    # 마이그레이션이 필요한지 확인 (이전 컬렉션 존재 여부)
-    old_collection_name = "shinhan_documents"
-    migrate_data = False
-    old_collection = None
+    Raises:
+        EmbeddingModelMismatchError: 기존 컬렉션이 다른 임베딩 모델에 고정된 경우
+    """
+    name = name or collection_name_for(backend)
+    try:
+        collection = chroma_client.get_collection(name=name, embedding_function=backend)
+    except Exception:
+        collection = chroma_client.create_collection(
+            name=name,
+            embedding_function=backend,
+            metadata={"embedding_model": backend.model_name}
+        )
+        print(f"Created new collection: {name}")
+        return collection
     
-    if not migration_completed:
+    pinned_model = (collection.metadata or {}).get("embedding_model")
+    if pinned_model is None:
+        # 모델 고정 이전에 생성된 컬렉션은 현재 모델로 고정
         try:
-            # 이전 컬렉션 확인
-            old_collection = chroma_client.get_collection(
-                name=old_collection_name,
-                embedding_function=embedding_function
+            collection.modify(metadata={**(collection.metadata or {}), "embedding_model": backend.model_name})
+        except Exception as e:
+            print(f"컬렉션 임베딩 모델 고정 실패: {str(e)}")
+    elif pinned_model != backend.model_name:
+        raise EmbeddingModelMismatchError(
+            f"컬렉션 '{name}'은 '{pinned_model}' 모델에 고정되어 있어 '{backend.model_name}' 벡터를 사용할 수 없습니다"
+        )
+    print(f"Connected to collection: {name}")
+    return collection
+
+def _build_local_index(page_size: int = 500):
+    """
+    기본 컬렉션의 청크 중 로컬 인덱스에 없는 청크를 로컬 임베딩으로 색인합니다 (네트워크 호출 없음)
+    
+    청크 ID 목록을 먼저 읽고 페이지마다 쓰기 잠금 안에서 현재 내용을 다시 읽어 추가하므로,
+    구축 중의 업로드/삭제(두 컬렉션에 함께 기록)와 섞여도 삭제된 청크가 다시 추가되지 않습니다.
+    """
+    ids = collection_manager.get_collection().get(include=[]).get('ids') or []
+    total = 0
+    for start in range(0, len(ids), page_size):
+        with _write_lock:
+            source_collection = collection_manager.get_collection()
+            local_collection = collection_manager.get_local_collection()
+            batch = ids[start:start + page_size]
+            existing = set(local_collection.get(ids=batch, include=[]).get('ids') or [])
+            missing = [chunk_id for chunk_id in batch if chunk_id not in existing]
+            if not missing:
+                continue
+            page = source_collection.get(ids=missing, include=["metadatas", "documents"])
+            page_ids = page.get('ids') or []
+            if not page_ids:
+                continue
+            texts = page.get('documents') or [''] * len(page_ids)
+            metadatas = [metadata or {} for metadata in (page.get('metadatas') or [None] * len(page_ids))]
+            local_collection.add(
+                ids=page_ids,
+                documents=texts,
+                embeddings=local_backend.embed(texts),
+                metadatas=_metadatas_for(local_collection, metadatas)
             )
-            
-            # 이전 컬렉션에 데이터가 있는지 확인
+            total += len(page_ids)
+    print(f"로컬 임베딩 인덱스 구축 완료: {total}개 청크 추가")
+
+def _start_local_index_build() -> bool:
+    """로컬 임베딩 인덱스 구축 스레드를 시작합니다 (이미 구축 중이면 그대로 유지)"""
+    global _local_index_thread
+    with _local_index_lock:
+        if _local_index_thread is not None and _local_index_thread.is_alive():
+            return True
+        
+        def build():
             try:
-                old_data = old_collection.get()
-                if old_data and 'documents' in old_data and old_data['documents'] and len(old_data['documents']) > 0:
-                    print(f"Found {len(old_data['documents'])} documents in old collection '{old_collection_name}'")
-                    migrate_data = True
+                _build_local_index()
             except Exception as e:
-                print(f"Error checking old collection: {e}")
-                migrate_data = False
+                # 다음 오프라인 검색(local_index_ready)에서 다시 시도
+                print(f"로컬 임베딩 인덱스 구축 중 오류: {str(e)}")
+        
+        _local_index_thread = threading.Thread(target=build, name="local-index-build", daemon=True)
+        _local_index_thread.start()
+    print("로컬 임베딩 인덱스 백그라운드 구축 시작")
+    return True
+
+def _local_index_building() -> bool:
+    return _local_index_thread is not None and _local_index_thread.is_alive()
+
+def shard_names() -> List[str]:
+    """샤드 이름 목록 (설정된 샤드 + 기본 샤드)"""
+    return list(SHARDED_COLLECTIONS.get("shards", {})) + [SHARDED_COLLECTIONS.get("default_shard", "general")]
+
+def shard_collection_name(shard: str) -> str:
+    return f"{collection_name_for(get_primary_backend())}__shard_{shard}"
+
+def _as_values(value) -> Optional[set]:
+    """조건 값이 허용하는 값 집합 (값, 값 목록, $eq, $in 이외의 연산자는 None)"""
+    if isinstance(value, dict):
+        if "$in" in value:
+            return set(value["$in"])
+        return {value["$eq"]} if "$eq" in value else None
+    if isinstance(value, (list, tuple, set)):
+        return set(value)
+    return {value}
+
+def shard_for(metadata: Optional[Dict[str, Any]]) -> str:
+    """청크 메타데이터가 저장될 샤드 (위에서부터 처음 일치하는 샤드, 없으면 기본 샤드)"""
+    metadata = metadata or {}
+    for shard, definition in SHARDED_COLLECTIONS.get("shards", {}).items():
+        if all(metadata.get(key) in _as_values(value) for key, value in definition.items()):
+            return shard
+    return SHARDED_COLLECTIONS.get("default_shard", "general")
+
+def _shard_candidates(conditions: Optional[Dict[str, Any]]) -> List[str]:
+    """
+    검색 조건에 맞는 청크가 있을 수 있는 샤드 목록
+    
+    샤드 조건과 검색 조건이 같은 키에서 겹치지 않으면 제외합니다. 청크는 처음 일치하는 샤드에
+    저장되므로, 검색 조건의 값이 앞선 단일 키 샤드에 모두 포함되면(예: content_type=procedure_guide)
+    그 뒤의 샤드와 기본 샤드도 제외합니다.
+    """
+    # 집합으로 표현할 수 없는 조건($ne 등)은 샤드 선택에 사용하지 않음
+    conditions = {key: _as_values(value) for key, value in (conditions or {}).items()}
+    conditions = {key: values for key, values in conditions.items() if values is not None}
+    candidates = []
+    for shard, definition in SHARDED_COLLECTIONS.get("shards", {}).items():
+        if all(_as_values(value) & conditions[key] for key, value in definition.items() if key in conditions):
+            candidates.append(shard)
+        if len(definition) == 1 and all(key in conditions and conditions[key] <= _as_values(value)
+                                        for key, value in definition.items()):
+            return candidates
+    candidates.append(SHARDED_COLLECTIONS.get("default_shard", "general"))
+    return candidates
+
+def _build_shards(chroma_client, source_collection, page_size: int = 500) -> Dict[str, Any]:
+    """기본 컬렉션의 청크와 임베딩을 샤드 컬렉션으로 다시 나눠 담습니다 (임베딩 API 호출 없음)"""
+    shards = {}
+    for shard in shard_names():
+        try:
+            chroma_client.delete_collection(shard_collection_name(shard))
         except Exception:
-            # 이전 컬렉션이 없으면 마이그레이션 필요 없음
-            print("이전 컬렉션이 없습니다. 마이그레이션 불필요.")
-            migrate_data = False
+            pass
+        shards[shard] = _open_pinned_collection(chroma_client, get_primary_backend(), shard_collection_name(shard))
+    
+    offset = 0
+    while True:
+        page = source_collection.get(include=["metadatas", "documents", "embeddings"], limit=page_size, offset=offset)
+        ids = page.get('ids') or []
+        if not ids:
+            break
+        documents = page.get('documents') or [''] * len(ids)
+        metadatas = [metadata or {} for metadata in (page.get('metadatas') or [None] * len(ids))]
+        groups = {}
+        for chunk_id, text, metadata, vector in zip(ids, documents, metadatas, page['embeddings']):
+            group = groups.setdefault(shard_for(metadata), ([], [], [], []))
+            for values, value in zip(group, (chunk_id, text, metadata, [float(x) for x in vector])):
+                values.append(value)
+        for shard, (group_ids, group_documents, group_metadatas, group_embeddings) in groups.items():
+            shards[shard].add(ids=group_ids, documents=group_documents, metadatas=group_metadatas,
+                              embeddings=group_embeddings)
+        offset += len(ids)
+    print("샤드 컬렉션 구축 완료: " + ", ".join(f"{shard} {collection.count()}개" for shard, collection in shards.items()))
+    return shards
+
+class CollectionManager:
+    """
+    프로세스 단위로 ChromaDB 클라이언트와 컬렉션을 재사용하는 관리자
     
-    # 새 컬렉션 생성 또는 연결
+    - 최초 요청 시 한 번만 PersistentClient 생성 및 마이그레이션 확인
+    - 임베딩 백엔드별 컬렉션(모델 고정) 관리
+    - 주기적인 헬스 체크와 장애 시 재연결
+    - 유지보수로 교체된 컬렉션은 그 전에 시작한 검색이 끝난 뒤 삭제 (reading / wait_for_readers)
+    - 프로세스 종료 시 명시적 정리(shutdown)
+    """
+    
+    def __init__(self, path: str = CHROMA_DB_DIRECTORY, health_check_interval: float = 30.0):
+        self.path = path
+        self.health_check_interval = health_check_interval
+        self._client = None
+        self._collection = None
+        self._collections = {}
+        self._shards = None
+        # 검색/수집에 사용 중인 기본 임베딩 백엔드 이름 (연결 시 레지스트리에서 확인, 재임베딩 완료 시 교체)
+        self._backend_name = None
+        self._last_health_check = 0.0
+        self._migrations_checked = False
+        self._lock = threading.RLock()
+        # 컬렉션 교체 세대별 진행 중인 검색 수
+        self._swap_generation = 0
+        self._readers = {}
+        self._readers_changed = threading.Condition()
+    
+    def get_collection(self, backend: Optional[EmbeddingBackend] = None):
+        """
+        캐시된 컬렉션을 반환하고, 필요하면 연결 또는 재연결합니다
+        
+        Args:
+            backend: 임베딩 백엔드 (기본값: 설정된 기본 백엔드)
+        """
+        collection = self._get_primary_collection()
+        # 기본 모델 전환(switch_primary)과 겹친 요청은 시작할 때의 모델 컬렉션으로 계속 검색
+        if backend is not None and \
+                (_pinned_model(collection) or self.get_primary_backend().model_name) != backend.model_name:
+            return self._get_secondary_collection(backend)
+        return collection
+    
+    def get_primary_backend_name(self) -> str:
+        """검색/수집에 사용 중인 기본 임베딩 백엔드 이름 (필요하면 연결하여 레지스트리에 기록된 백엔드 확인)"""
+        if self._backend_name is None:
+            self._get_primary_collection()
+        return self._backend_name
+    
+    def get_primary_backend(self) -> EmbeddingBackend:
+        """검색/수집에 사용 중인 기본 임베딩 백엔드"""
+        return get_backend(self.get_primary_backend_name())
+    
+    def _get_primary_collection(self):
+        collection = self._collection
+        if collection is not None:
+            # 일정 주기마다만 헬스 체크 수행 (요청 경로 비용 최소화)
+            if time.monotonic() - self._last_health_check < self.health_check_interval:
+                return collection
+            if self.health_check():
+                return collection
+            print("ChromaDB 헬스 체크 실패 - 재연결을 시도합니다")
+            return self.reconnect()
+        
+        with self._lock:
+            if self._collection is None:
+                self._open()
+            return self._collection
+    
+    def get_local_collection(self):
+        """오프라인 검색용 로컬 임베딩 컬렉션 (기본 백엔드가 로컬이면 기본 컬렉션)"""
+        return self.get_collection(local_backend)
+    
+    def local_index_ready(self) -> bool:
+        """
+        로컬 임베딩 인덱스가 기본 컬렉션의 청크를 모두 담고 있는지 확인합니다
+        
+        빠진 청크가 있으면 백그라운드 구축을 시작하고 False를 반환합니다 (요청 경로에서는 구축하지 않음).
+        """
+        primary = self.get_collection()
+        local = self.get_local_collection()
+        if local is primary:
+            return True
+        if _local_index_building():
+            return False
+        if local.count() >= primary.count():
+            return True
+        _start_local_index_build()
+        return False
+    
+    def write_collections(self) -> List[Any]:
+        """청크 추가/삭제 시 함께 갱신해야 하는 모든 컬렉션 (기본 + 로컬 임베딩 인덱스)"""
+        collections = [self.get_collection()]
+        if local_index_enabled():
+            collections.append(self.get_local_collection())
+        return collections
+    
+    def get_shard_collections(self) -> Dict[str, Any]:
+        """
+        content_type별 샤드 컬렉션 {샤드 이름: 컬렉션}
+        
+        처음 열 때 샤드의 청크 수 합계가 기본 컬렉션과 다르면 기본 컬렉션으로부터 다시 구축합니다.
+        """
+        primary = self.get_collection()
+        shards = self._shards
+        if shards is not None:
+            return shards
+        # 구축 중 청크 쓰기가 끼어들지 않도록 쓰기 잠금을 먼저 획득
+        with _write_lock, self._lock:
+            if self._shards is None:
+                shards = {
+                    shard: _open_pinned_collection(self._client, self.get_primary_backend(), shard_collection_name(shard))
+                    for shard in shard_names()
+                }
+                if sum(collection.count() for collection in shards.values()) != primary.count():
+                    shards = _build_shards(self._client, primary)
+                self._shards = shards
+            return self._shards
+    
+    def _get_secondary_collection(self, backend: EmbeddingBackend):
+        primary = self.get_collection()
+        collection = self._collections.get(backend.model_name)
+        if collection is not None:
+            return collection
+        with self._lock:
+            if backend.model_name not in self._collections:
+                # 로컬 인덱스 구축은 요청 경로에서 하지 않음 (start_local_index_build / local_index_ready)
+                self._collections[backend.model_name] = _open_pinned_collection(self._client, backend)
+            return self._collections[backend.model_name]
+    
+    def _open(self):
+        """클라이언트를 생성하고 컬렉션에 연결합니다 (잠금 상태에서 호출)"""
+        # Make sure the directory exists
+        Path(self.path).mkdir(parents=True, exist_ok=True)
+        
+        chroma_client = chromadb.PersistentClient(
+            path=self.path,
+            settings=Settings(anonymized_telemetry=False)
+        )
+        
+        # 재임베딩으로 전환된 벡터 DB는 레지스트리에 기록된 백엔드의 컬렉션 사용
+        configured_name = EMBEDDING_BACKEND.get("primary", "openai")
+        active_name = chunk_registry.get_state(ACTIVE_BACKEND_KEY) or configured_name
+        collection = _open_pinned_collection(chroma_client, get_backend(active_name))
+        if active_name != configured_name and collection.count() == 0:
+            # 사용 중인 모델 컬렉션이 비어 있으면 재임베딩 없이 설정된 모델로 바로 전환
+            active_name = configured_name
+            collection = _open_pinned_collection(chroma_client, get_backend(active_name))
+        if active_name != configured_name:
+            print(f"기본 임베딩 모델: {get_backend(active_name).model_name} ({active_name})")
+        # 마이그레이션이 기본 백엔드를 참조하므로 먼저 기록
+        self._backend_name = active_name
+        chunk_registry.set_state(ACTIVE_BACKEND_KEY, active_name)
+        
+        # 대기 중인 마이그레이션 실행 (프로세스 시작 후 최초 연결 시 1회, 재연결 시에는 생략)
+        if not self._migrations_checked:
+            run_migrations(chroma_client, collection)
+            self._migrations_checked = True
+        
+        # 레지스트리가 없는 기존 벡터 DB는 최초 연결 시 한 번 구축
+        if not chunk_registry.is_built():
+            chunk_registry.rebuild(collection)
+        
+        self._client = chroma_client
+        self._collection = collection
+        self._last_health_check = time.monotonic()
+        
+        # 설정된 모델과 사용 중인 모델이 다르면 백그라운드 재임베딩 시작 (중단된 작업은 이어서 진행)
+        if active_name != configured_name and EMBEDDING_BACKEND.get("auto_reembed", True):
+            start_reembedding(configured_name)
+    
+    def switch_primary(self, name: str):
+        """
+        기본 임베딩 백엔드와 컬렉션을 함께 교체합니다 (재임베딩 완료 시 쓰기 잠금 안에서 호출)
+        
+        진행 중인 검색은 시작할 때의 백엔드로 이전 모델 컬렉션을 계속 검색합니다.
+        """
+        with _write_lock, self._lock:
+            self._get_primary_collection()
+            backend = get_backend(name)
+            previous = self._collection
+            collection = self._collections.pop(backend.model_name, None) or _open_pinned_collection(self._client, backend)
+            self._backend_name = name
+            self._collection = collection
+            self._collections[_pinned_model(previous)] = previous
+            self._shards = None
+            self._last_health_check = time.monotonic()
+            print(f"기본 임베딩 모델: {backend.model_name} ({name})")
+    
+    def get_client(self):
+        """연결된 ChromaDB 클라이언트 (필요하면 연결)"""
+        self.get_collection()
+        return self._client
+    
+    def refresh_collections(self):
+        """클라이언트는 유지하고 컬렉션 객체만 이름으로 다시 엽니다 (유지보수로 컬렉션이 교체된 경우)"""
+        with self._lock:
+            if self._client is None:
+                return
+            self._collection = _open_pinned_collection(self._client, self.get_primary_backend())
+            self._collections = {}
+            self._shards = None
+    
+    @contextmanager
+    def reading(self):
+        """
+        검색 구간 표시 (이 안에서 얻은 컬렉션 객체는 유지보수로 교체되어도 구간이 끝날 때까지 삭제되지 않음)
+        """
+        with self._readers_changed:
+            generation = self._swap_generation
+            self._readers[generation] = self._readers.get(generation, 0) + 1
+        try:
+            yield
+        finally:
+            with self._readers_changed:
+                self._readers[generation] -= 1
+                if not self._readers[generation]:
+                    del self._readers[generation]
+                self._readers_changed.notify_all()
+    
+    def replace_collection(self, current, replacement, name: str, old_name: str) -> int:
+        """
+        replacement 컬렉션을 name으로, 기존 컬렉션을 old_name으로 바꾸고 컬렉션 객체를 다시 엽니다
+        (쓰기 잠금 상태에서 호출, 이름이 바뀌는 동안 재연결이 끼어들지 않도록 관리자 잠금 안에서 수행)
+        
+        Returns:
+            교체 후 세대 (wait_for_readers에 전달)
+        """
+        with self._lock:
+            current.modify(name=old_name)
+            replacement.modify(name=name)
+            self.refresh_collections()
+            with self._readers_changed:
+                self._swap_generation += 1
+                return self._swap_generation
+    
+    def wait_for_readers(self, generation: int, timeout: float) -> bool:
+        """generation 이전에 시작한 검색이 모두 끝날 때까지 대기 (시간 초과 시 False)"""
+        with self._readers_changed:
+            return self._readers_changed.wait_for(
+                lambda: all(reader_generation >= generation for reader_generation in self._readers), timeout
+            )
+    
+    def health_check(self) -> bool:
+        """컬렉션이 정상적으로 응답하는지 확인합니다"""
+        collection = self._collection
+        if collection is None:
+            return False
+        try:
+            collection.count()
+            self._last_health_check = time.monotonic()
+            return True
+        except Exception as e:
+            print(f"ChromaDB 헬스 체크 오류: {str(e)}")
+            return False
+    
+    def reconnect(self):
+        """기존 연결을 정리하고 새로 연결합니다"""
+        with self._lock:
+            self._close()
+            self._open()
+            return self._collection
+    
+    def shutdown(self):
+        """프로세스 종료 시 클라이언트 리소스를 정리합니다"""
+        with self._lock:
+            if self._client is not None:
+                print("ChromaDB 연결을 종료합니다")
+            self._close()
+            # 초기화 후 새로 연결하면 마이그레이션을 다시 확인
+            self._migrations_checked = False
+    
+    def _close(self):
+        client = self._client
+        self._client = None
+        self._collection = None
+        self._collections = {}
+        self._shards = None
+        if client is not None:
+            try:
+                # 클라이언트 시스템 캐시 정리 (백그라운드 리소스 해제)
+                client.clear_system_cache()
+            except Exception as e:
+                print(f"ChromaDB 종료 중 오류: {str(e)}")
+
+# 프로세스 전역 컬렉션 관리자
+collection_manager = CollectionManager()
+atexit.register(collection_manager.shutdown)
+
+def get_primary_backend() -> EmbeddingBackend:
+    """검색/수집에 사용 중인 기본 임베딩 백엔드"""
+    return collection_manager.get_primary_backend()
+
+def local_index_enabled(backend: Optional[EmbeddingBackend] = None) -> bool:
+    """오프라인 검색용 로컬 임베딩 인덱스 사용 여부 (기본 백엔드가 로컬이면 별도 인덱스 불필요)"""
+    backend = backend or get_primary_backend()
+    return bool(EMBEDDING_BACKEND.get("local_index", True)) and backend is not local_backend
+
+def start_local_index_build() -> bool:
+    """
+    오프라인 검색용 로컬 임베딩 인덱스에 빠진 청크가 있으면 백그라운드로 구축합니다 (서버 시작 시 호출)
+    
+    구축이 끝나기 전의 오프라인 검색은 어휘 검색(BM25)으로 대체됩니다.
+    
+    Returns:
+        구축 작업 실행 여부
+    """
+    if not local_index_enabled():
+        return False
+    return not collection_manager.local_index_ready()
+
+def classify_vendor(text: str, metadata: Optional[Dict[str, Any]] = None) -> str:
+    """
+    청크의 장비 유형(벤더)을 분류합니다
+    
+    파일명/출처에 벤더명이 있으면 우선 사용하고, 없으면 본문에서 가장 많이 언급된 벤더를 사용합니다.
+    
+    Returns:
+        벤더 키 (nexg, cisco, alteon) 또는 "none"
+    """
+    metadata = metadata or {}
+    name_fields = " ".join(
+        str(metadata.get(field, '')) for field in ('source', 'filename', 'doc_name')
+    ).lower()
+    for vendor, keywords in VENDOR_TAG_KEYWORDS.items():
+        if any(keyword in name_fields for keyword in keywords):
+            return vendor
+    
+    text_lower = (text or '').lower()
+    best_vendor, best_hits = "none", 0
+    for vendor, keywords in VENDOR_TAG_KEYWORDS.items():
+        hits = sum(text_lower.count(keyword) for keyword in keywords)
+        if hits > best_hits:
+            best_vendor, best_hits = vendor, hits
+    return best_vendor
+
+def tag_chunk_vendors(chunks: List[Dict[str, Any]]):
+    """청크 메타데이터에 vendor 태그를 추가합니다 (이미 있으면 유지)"""
+    for chunk in chunks:
+        metadata = chunk.setdefault("metadata", {})
+        if "vendor" not in metadata:
+            metadata["vendor"] = classify_vendor(chunk.get("text", ""), metadata)
+
+def embedding_version() -> int:
+    """사용 중인 임베딩 버전 (재임베딩으로 기본 모델을 전환할 때마다 1 증가)"""
+    return int(chunk_registry.get_state(EMBEDDING_VERSION_KEY, '1'))
+
+def _stamp_metadata(metadata: Dict[str, Any], backend: EmbeddingBackend, version: int) -> Dict[str, Any]:
+    return {**metadata, "embedding_model": backend.model_name, "embedding_version": version}
+
+def stamp_embedding_model(chunks: List[Dict[str, Any]]):
+    """청크 메타데이터에 사용 중인 임베딩 모델/버전을 기록합니다"""
+    backend = get_primary_backend()
+    version = embedding_version()
+    for chunk in chunks:
+        chunk["metadata"] = _stamp_metadata(chunk.get("metadata") or {}, backend, version)
+
+def _metadatas_for(collection, metadatas: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """다른 모델에 고정된 컬렉션(로컬 임베딩 인덱스)에 기록할 메타데이터 (embedding_model을 그 컬렉션의 모델로)"""
+    model = _pinned_model(collection)
+    return [
+        {**metadata, "embedding_model": model}
+        if metadata and metadata.get("embedding_model") not in (None, model) else metadata
+        for metadata in metadatas
+    ]
+
+def _backfill_embedding_stamps(collection, page_size: int = MIGRATION_PAGE_SIZE, start: int = 0, checkpoint=None):
+    """임베딩 모델/버전이 없는 기존 청크에 컬렉션의 모델을 기록합니다 (재임베딩 없이 메타데이터만 갱신)"""
+    backend = get_primary_backend()
+    version = embedding_version()
+    offset = start
+    updated = 0
+    while True:
+        page = collection.get(include=["metadatas"], limit=page_size, offset=offset)
+        ids = page.get('ids') or []
+        if not ids:
+            break
+        update_ids, update_metadatas = [], []
+        for chunk_id, metadata in zip(ids, page.get('metadatas') or [None] * len(ids)):
+            if "embedding_model" not in (metadata or {}):
+                update_ids.append(chunk_id)
+                update_metadatas.append(_stamp_metadata(metadata or {}, backend, version))
+        if update_ids:
+            collection.update(ids=update_ids, metadatas=update_metadatas)
+            updated += len(update_ids)
+        offset += len(ids)
+        if checkpoint is not None:
+            checkpoint(offset)
+    print(f"임베딩 모델/버전 기록 완료: {updated}개 청크")
+
+def _backfill_vendor_tags(collection, page_size: int = MIGRATION_PAGE_SIZE, start: int = 0, checkpoint=None):
+    """vendor 태그가 없는 기존 청크에 태그를 추가합니다 (재임베딩 없이 메타데이터만 갱신)"""
+    offset = start
+    updated = 0
+    while True:
+        page = collection.get(include=["metadatas", "documents"], limit=page_size, offset=offset)
+        ids = page.get('ids') or []
+        if not ids:
+            break
+        metadatas = page.get('metadatas') or [None] * len(ids)
+        texts = page.get('documents') or [''] * len(ids)
+        update_ids, update_metadatas = [], []
+        for chunk_id, metadata, text in zip(ids, metadatas, texts):
+            metadata = dict(metadata or {})
+            if "vendor" not in metadata:
+                metadata["vendor"] = classify_vendor(text, metadata)
+                update_ids.append(chunk_id)
+                update_metadatas.append(metadata)
+        if update_ids:
+            collection.update(ids=update_ids, metadatas=update_metadatas)
+            updated += len(update_ids)
+        offset += len(ids)
+        if checkpoint is not None:
+            checkpoint(offset)
+    print(f"벤더 태그 보강 완료: {updated}개 청크")
+
+def initialize_database():
+    """Return the process-wide ChromaDB collection (connects on first use)"""
+    return collection_manager.get_collection()
+
+def embed_query(query: str, backend: Optional[EmbeddingBackend] = None) -> List[float]:
+    """
+    질문 임베딩을 반환합니다 (캐시 우선, 없을 때만 임베딩 API 호출)
+    
+    Args:
+        query: 사용자 질문
+        backend: 임베딩 백엔드 (기본값: 설정된 기본 백엔드)
+        
+    Returns:
+        임베딩 벡터
+    """
+    return embed_queries([query], backend)[0]
+
+def embed_queries(queries: List[str], backend: Optional[EmbeddingBackend] = None) -> List[List[float]]:
+    """
+    여러 질문의 임베딩을 반환합니다 (캐시에 없는 질문만 모아 임베딩 API 1회 호출)
+    
+    Args:
+        queries: 사용자 질문 목록
+        backend: 임베딩 백엔드 (기본값: 설정된 기본 백엔드)
+        
+    Returns:
+        queries와 같은 순서의 임베딩 벡터 목록
+    """
+    backend = backend or get_primary_backend()
+    # 로컬 백엔드는 계산 비용이 낮으므로 캐시를 거치지 않음
+    if not backend.requires_network:
+        return backend.embed(list(queries))
+    return query_embedding_cache.get_or_compute_many(backend.model_name, queries, backend)
+
+def _ingestion_embedding_function(backend: EmbeddingBackend):
+    """백엔드 임베딩 함수를 수집 API 한도 대기 + 재시도로 감싼 함수 (모델별 1개)"""
+    function = _ingestion_embedding_functions.get(backend.model_name)
+    if function is None:
+        function = _ingestion_embedding_functions.setdefault(backend.model_name, rate_limited_embedding(
+            backend,
+            ingestion_rate_limiter,
+            max_retries=INGESTION.get("max_retries", 5),
+            base_delay=INGESTION.get("base_delay", 1.0),
+            max_delay=INGESTION.get("max_delay", 60.0)
+        ))
+    return function
+
+def embed_texts(texts: List[str], backend: Optional[EmbeddingBackend] = None) -> List[List[float]]:
+    """
+    청크 텍스트 임베딩을 반환합니다 (콘텐츠 해시 저장소에 없는 텍스트만 API 호출)
+    
+    Args:
+        texts: 임베딩할 청크 텍스트 목록
+        backend: 임베딩 백엔드 (기본값: 사용 중인 기본 백엔드)
+        
+    Returns:
+        texts와 같은 순서의 임베딩 벡터 목록
+    """
+    backend = backend or get_primary_backend()
+    if not backend.requires_network:
+        return backend.embed(list(texts))
+    return chunk_embedding_store.embed(
+        backend.model_name, texts, _ingestion_embedding_function(backend),
+        batch_size=INGESTION.get("batch_size", 100)
+    )
+
+def _add_to_local_index(chunks: List[Dict[str, Any]]):
+    """오프라인 검색용 로컬 임베딩 컬렉션에 청크를 추가합니다 (네트워크 호출 없음)"""
+    if not chunks or not local_index_enabled():
+        return
     try:
-        collection = chroma_client.get_collection(
-            name=COLLECTION_NAME,
-            embedding_function=embedding_function
+        texts = [chunk["text"] for chunk in chunks]
+        local_collection = collection_manager.get_local_collection()
+        local_collection.upsert(
+            ids=[chunk["chunk_id"] for chunk in chunks],
+            documents=texts,
+            embeddings=local_backend.embed(texts),
+            metadatas=_metadatas_for(local_collection, [chunk["metadata"] for chunk in chunks])
         )
-        print(f"Connected to existing collection: {COLLECTION_NAME}")
-    except Exception:
-        collection = chroma_client.create_collection(
-            name=COLLECTION_NAME,
-            embedding_function=embedding_function
+    except Exception as e:
+        print(f"로컬 임베딩 인덱스 추가 중 오류: {str(e)}")
+
+def get_lexical_index() -> LexicalIndex:
+    """
+    최신 코퍼스를 반영한 BM25 인덱스를 반환합니다
+    
+    다른 프로세스에서 청크가 변경되어 코퍼스 세대가 달라졌으면 벡터 DB로부터 새 인덱스를 구축해 교체합니다.
+    구축 중에도 다른 검색은 기존 인덱스를 그대로 사용합니다.
+    """
+    global lexical_index
+    with collection_manager.reading():
+        collection = initialize_database()
+        if lexical_index.generation == chunk_registry.generation():
+            return lexical_index
+        with _lexical_index_lock:
+            # 대기하는 동안 다른 스레드가 이미 재구축했으면 그대로 사용
+            generation = chunk_registry.generation()
+            if lexical_index.generation == generation:
+                return lexical_index
+            index = LexicalIndex()
+            offset = 0
+            page_size = 1000
+            while True:
+                page = collection.get(include=["metadatas", "documents"], limit=page_size, offset=offset)
+                ids = page.get('ids') or []
+                if not ids:
+                    break
+                index.add(
+                    ids,
+                    page.get('documents') or [''] * len(ids),
+                    page.get('metadatas') or [{}] * len(ids)
+                )
+                offset += len(ids)
+            index.generation = generation
+            lexical_index = index
+            print(f"어휘 검색 인덱스 구축 완료: {len(index)}개 청크")
+    return index
+
+def _update_lexical_index(generation_before: int, added: Optional[List[Dict[str, Any]]] = None,
+                          removed_ids: Optional[List[str]] = None):
+    """
+    이 프로세스의 추가/삭제를 BM25 인덱스에 증분 반영합니다 (다른 프로세스 변경이 끼어들었으면 다음 검색 시 재구축)
+    
+    구축 중인 인덱스는 교체 전까지 전역 참조에 보이지 않으므로 완성된 인덱스에만 반영됩니다.
+    """
+    index = lexical_index
+    if index.generation is None or index.generation != generation_before:
+        return
+    if added:
+        index.add(
+            [chunk["chunk_id"] for chunk in added],
+            [chunk["text"] for chunk in added],
+            [chunk["metadata"] for chunk in added]
         )
-        print(f"Created new collection: {COLLECTION_NAME}")
+    if removed_ids:
+        index.remove(removed_ids)
+    index.generation = chunk_registry.generation()
+
+def get_metadata_index() -> MetadataIndex:
+    """
+    최신 코퍼스를 반영한 메타데이터 사전 필터 인덱스를 반환합니다
+    
+    다른 프로세스에서 청크가 변경되어 코퍼스 세대가 달라졌으면 벡터 DB로부터 새 인덱스를 구축해 교체합니다.
+    구축 중에도 다른 검색은 기존 인덱스를 그대로 사용합니다.
+    """
+    global metadata_index
+    collection = initialize_database()
+    if metadata_index.generation == chunk_registry.generation():
+        return metadata_index
+    with _metadata_index_lock:
+        # 대기하는 동안 다른 스레드가 이미 재구축했으면 그대로 사용
+        generation = chunk_registry.generation()
+        if metadata_index.generation == generation:
+            return metadata_index
+        index = MetadataIndex(METADATA_INDEX_FIELDS)
+        offset = 0
+        page_size = 1000
+        while True:
+            page = collection.get(include=["metadatas"], limit=page_size, offset=offset)
+            ids = page.get('ids') or []
+            if not ids:
+                break
+            index.add(ids, page.get('metadatas') or [{}] * len(ids))
+            offset += len(ids)
+        index.generation = generation
+        metadata_index = index
+        print(f"메타데이터 사전 필터 인덱스 구축 완료: {len(index)}개 청크")
+    return index
+
+def _update_metadata_index(generation_before: int, added: Optional[List[Dict[str, Any]]] = None,
+                           removed_ids: Optional[List[str]] = None):
+    """
+    이 프로세스의 추가/삭제를 메타데이터 인덱스에 증분 반영합니다 (다른 프로세스 변경이 끼어들었으면 다음 검색 시 재구축)
+    
+    구축 중인 인덱스는 교체 전까지 전역 참조에 보이지 않으므로, 완성된 인덱스에만 반영되고
+    구축 도중의 변경은 세대 불일치로 다음 검색 시 다시 구축됩니다.
+    """
+    index = metadata_index
+    if index.generation is None or index.generation != generation_before:
+        return
+    if added:
+        index.add([chunk["chunk_id"] for chunk in added], [chunk["metadata"] for chunk in added])
+    if removed_ids:
+        index.remove(removed_ids)
+    index.generation = chunk_registry.generation()
+
+def prefilter_ids(conditions: Optional[Dict[str, Any]]) -> Optional[Set[str]]:
+    """
+    필터 조건 중 인덱스 필드 조건을 만족하는 청크 ID 집합 (벡터 검색 허용 목록)
     
-    # 마이그레이션 실행 (필요한 경우)
-    if migrate_data and not migration_completed and old_collection is not None:
+    Returns:
+        청크 ID 집합 (비활성화, 인덱스 필드 조건 없음, 오류 시 None)
+    """
+    if not conditions or not METADATA_INDEX.get("enabled", True):
+        return None
+    try:
+        return get_metadata_index().candidates(conditions)
+    except Exception as e:
+        print(f"메타데이터 사전 필터 오류: {str(e)}")
+        return None
+
+def get_mmap_index(backend: Optional[EmbeddingBackend] = None) -> Optional[MmapVectorIndex]:
+    """
+    최신 코퍼스를 반영한 메모리 매핑 벡터 인덱스를 반환합니다 (비활성화 시 None)
+    
+    인덱스가 없거나, 다른 프로세스의 변경으로 세대가 달라졌거나, 삭제 표시 비율이 높거나,
+    양자화 설정이나 기본 임베딩 모델이 바뀌었으면 컬렉션에서 다시 내보냅니다.
+    
+    Args:
+        backend: 질문 임베딩 백엔드 (기본 모델이 전환되어 모델이 다르면 None)
+    """
+    if not MMAP_INDEX.get("enabled", False):
+        return None
+    if not MmapVectorIndex.available():
+        print("numpy가 설치되지 않아 메모리 매핑 벡터 인덱스를 사용할 수 없습니다")
+        return None
+    
+    collection = initialize_database()
+    model = _pinned_model(collection) or get_primary_backend().model_name
+    if backend is not None and backend.model_name != model:
+        return None
+    generation = chunk_registry.generation()
+    manifest = mmap_index.read_manifest()
+    if manifest and manifest.get("generation") == generation and manifest.get("model") == model \
+            and manifest.get("quantized", False) == mmap_index.quantized \
+            and mmap_index.deleted_ratio() <= MMAP_INDEX.get("compact_deleted_ratio", 0.2):
+        return mmap_index
+    
+    with _mmap_export_lock:
         try:
-            old_data = old_collection.get()
-            
-            # 문서, ID, 메타데이터가 모두 존재하는지 확인
-            if ('documents' in old_data and 'ids' in old_data and
-                'metadatas' in old_data and old_data['documents'] and len(old_data['documents']) > 0):
-                
-                print(f"Migrating {len(old_data['documents'])} documents to new collection '{COLLECTION_NAME}'")
-                
-                # 메타데이터가 None인 경우 빈 딕셔너리로 대체
-                metadatas = []
-                for i, metadata in enumerate(old_data['metadatas']):
-                    if metadata is None:
-                        metadatas.append({})
-                    else:
-                        metadatas.append(metadata)
-                
-                # 새 컬렉션에 데이터 추가 (배치 처리)
-                batch_size = 100  # 한 번에 처리할 문서 수 (토큰 제한 문제 해결)
-                total_docs = len(old_data['documents'])
-                
-                for i in range(0, total_docs, batch_size):
-                    end_idx = min(i + batch_size, total_docs)
-                    print(f"마이그레이션 배치 {i//batch_size + 1}/{(total_docs + batch_size - 1)//batch_size}: 문서 {i} ~ {end_idx-1}")
-                    
-                    try:
-                        collection.add(
-                            documents=old_data['documents'][i:end_idx],
-                            ids=old_data['ids'][i:end_idx],
-                            metadatas=metadatas[i:end_idx]
-                        )
-                    except Exception as e:
-                        print(f"배치 {i//batch_size + 1} 마이그레이션 중 오류 발생: {str(e)}")
-                        # 오류가 발생해도 계속 진행
-                
-                print(f"마이그레이션이 성공적으로 완료되었습니다: '{COLLECTION_NAME}'")
-                
-                # 마이그레이션 완료 표시 (파일 생성)
-                with open(MIGRATION_STATUS_FILE, 'w') as f:
-                    f.write("Migration completed")
-                print("마이그레이션 완료 플래그 설정됨")
-            
+            mmap_index.export(collection, model, generation)
+            return mmap_index
         except Exception as e:
-            print(f"마이그레이션 오류: {str(e)}")
+            print(f"메모리 매핑 벡터 인덱스 내보내기 중 오류: {str(e)}")
+            return None
+
+def _update_mmap_index(generation_before: int, added: Optional[List[Dict[str, Any]]] = None,
+                       embeddings: Optional[List[List[float]]] = None,
+                       removed_ids: Optional[List[str]] = None):
+    """이 프로세스의 추가/삭제를 메모리 매핑 인덱스에 증분 반영합니다 (세대가 어긋나면 다음 검색 시 다시 내보내기)"""
+    if not MMAP_INDEX.get("enabled", False) or not MmapVectorIndex.available():
+        return
+    try:
+        generation_after = chunk_registry.generation()
+        if added and mmap_index.append(
+            [chunk["chunk_id"] for chunk in added],
+            [chunk["text"] for chunk in added],
+            embeddings,
+            [chunk["metadata"] for chunk in added],
+            generation_before,
+            generation_after
+        ):
+            generation_before = generation_after
+        if removed_ids:
+            mmap_index.mark_deleted(removed_ids, generation_before, generation_after)
+    except Exception as e:
+        print(f"메모리 매핑 벡터 인덱스 갱신 중 오류: {str(e)}")
+
+def _update_shard_collections(added: Optional[List[Dict[str, Any]]] = None,
+                             embeddings: Optional[List[List[float]]] = None,
+                             removed_ids: Optional[List[str]] = None):
+    """추가/변경/삭제된 청크를 샤드 컬렉션에 반영합니다 (메타데이터가 바뀌어 샤드가 달라진 청크는 이동)"""
+    if not SHARDED_COLLECTIONS.get("enabled", False):
+        return
+    try:
+        shards = collection_manager.get_shard_collections()
+        stale_ids = list(removed_ids or []) + [chunk["chunk_id"] for chunk in added or []]
+        for i in range(0, len(stale_ids), 500):
+            for shard_collection in shards.values():
+                shard_collection.delete(ids=stale_ids[i:i + 500])
+        groups = {}
+        for chunk, vector in zip(added or [], embeddings or []):
+            groups.setdefault(shard_for(chunk["metadata"]), []).append((chunk, vector))
+        for shard, items in groups.items():
+            shards[shard].add(
+                ids=[chunk["chunk_id"] for chunk, _ in items],
+                documents=[chunk["text"] for chunk, _ in items],
+                metadatas=[chunk["metadata"] for chunk, _ in items],
+                embeddings=[vector for _, vector in items]
+            )
+    except Exception as e:
+        print(f"샤드 컬렉션 갱신 중 오류: {str(e)}")
+
+def _write_chunk_batch(batch: List[Dict[str, Any]], embeddings: List[List[float]]):
+    """임베딩이 끝난 배치를 벡터 DB와 레지스트리/검색 인덱스에 기록합니다 (단일 writer)"""
+    while True:
+        with _write_lock:
+            collection = initialize_database()
+            model = get_primary_backend().model_name
+            if all(chunk["metadata"].get("embedding_model") == model for chunk in batch):
+                generation_before = chunk_registry.generation()
+                collection.add(
+                    documents=[chunk["text"] for chunk in batch],
+                    embeddings=embeddings,
+                    ids=[chunk["chunk_id"] for chunk in batch],
+                    metadatas=[chunk["metadata"] for chunk in batch]
+                )
+                chunk_registry.register(batch)
+                _update_lexical_index(generation_before, added=batch)
+                _update_metadata_index(generation_before, added=batch)
+                _update_mmap_index(generation_before, added=batch, embeddings=embeddings)
+                _update_shard_collections(added=batch, embeddings=embeddings)
+                _add_to_local_index(batch)
+                _journal_reembed_changes([chunk["chunk_id"] for chunk in batch], generation_before)
+                return
+        # 임베딩하는 동안 재임베딩 작업이 기본 모델을 전환한 배치는 잠금 밖에서 새 모델로 다시 임베딩
+        stamp_embedding_model(batch)
+        embeddings = embed_texts([chunk["text"] for chunk in batch])
+
+def ingest_document_chunks(chunks: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    문서 청크를 벡터 DB에 추가하고 배치별 결과를 반환합니다
     
-    return collection
+    배치 임베딩은 INGESTION 설정의 분당 토큰/요청 한도 안에서 동시에 요청하고
+    (429 / 5xx는 백오프 후 재시도), 벡터 DB 쓰기는 한 스레드에서 순서대로 수행합니다.
+    
+    Args:
+        chunks: {"text": str, "doc_id": str, "chunk_id": str, "metadata": dict} 목록
+        
+    Returns:
+        {"total_chunks", "added_chunks", "batches": [{"index", "chunk_ids", "success", "error"}]}
+    """
+    initialize_database()
+    
+    # 수집 시 장비 유형(벤더) 분류 (검색 시 where 필터로 사용)
+    tag_chunk_vendors(chunks)
+    stamp_embedding_model(chunks)
+    
+    print(f"처리할 총 문서 청크 수: {len(chunks)}")
+    report = run_ingestion(
+        chunks,
+        embed_batch=embed_texts,
+        write_batch=_write_chunk_batch,
+        batch_size=INGESTION.get("batch_size", 100),
+        workers=INGESTION.get("workers", 4)
+    )
+    
+    failed = [batch for batch in report["batches"] if not batch["success"]]
+    print(f"총 {report['added_chunks']}/{report['total_chunks']} 청크가 성공적으로 추가되었습니다.")
+    if failed:
+        print(f"실패한 배치 {len(failed)}개: " + ", ".join(
+            f"{batch['index'] + 1}번({batch['error']})" for batch in failed
+        ))
+    return report
 
 def add_document_embeddings(
     chunks: List[Dict[str, Any]]
@@ -148,251 +1177,592 @@ def add_document_embeddings(
                Each dict should have: {"text": str, "doc_id": str, "chunk_id": str, "metadata": dict}
                
     Returns:
-        Boolean indicating whether documents were added (True) or not (False)
+        모든 배치가 추가되었으면 True, 청크가 없거나 실패한 배치가 있으면 False
+        (배치별 결과가 필요하면 ingest_document_chunks 사용)
     """
     if not chunks:
         return False
     
-    # Initialize the database
-    collection = initialize_database()
+    report = ingest_document_chunks(chunks)
+    return report["added_chunks"] == report["total_chunks"]
+
+def _build_where(conditions: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+    """
+    메타데이터 조건 딕셔너리를 ChromaDB where 절로 변환합니다
+    (조건이 2개 이상이면 $and로 결합)
+    """
+    if not conditions:
+        return None
+    if len(conditions) == 1:
+        return dict(conditions)
+    return {"$and": [{key: value} for key, value in conditions.items()]}
+
+def _make_document(text: str, metadata: Optional[Dict[str, Any]], chunk_id: Optional[str] = None,
+                   distance: Optional[float] = None):
+    """page_content/metadata/chunk_id/distance(벡터 검색 거리, 없으면 None)를 가진 문서 객체 생성"""
+    return type('Document', (), {
+        'page_content': text,
+        'metadata': metadata or {},
+        'chunk_id': chunk_id,
+        'distance': distance
+    })
+
+def expand_to_parents(docs: List[Any]) -> List[Any]:
+    """
+    자식 청크를 부모 섹션으로 바꾸고 같은 부모는 한 번만 남깁니다 (가장 먼저 나온 자식의 순위와 거리)
     
-    # 배치 처리를 위한 설정
-    batch_size = 100  # 한 번에 처리할 문서 수 (토큰 제한 문제 해결)
+    부모 섹션 본문은 청크 레지스트리에서 parent_id로 한 번에 조회합니다. 부모-자식 청크가 아니거나
+    부모 본문을 찾지 못한 문서는 그대로 두며, 같은 청크가 여러 번 나오면 첫 번째만 남깁니다.
+    """
+    parent_ids = [(getattr(doc, 'metadata', None) or {}).get("parent_id") for doc in docs]
+    parent_texts = chunk_registry.parent_texts(parent_id for parent_id in parent_ids if parent_id) \
+        if any(parent_ids) else {}
+    expanded = []
+    seen = set()
+    for doc, parent_id in zip(docs, parent_ids):
+        metadata = getattr(doc, 'metadata', None) or {}
+        if parent_id in parent_texts:
+            key = parent_id
+            doc = _make_document(
+                parent_texts[parent_id],
+                {field: value for field, value in metadata.items() if field not in CHILD_METADATA_KEYS},
+                parent_id,
+                getattr(doc, 'distance', None)
+            )
+        else:
+            key = getattr(doc, 'chunk_id', None) or doc.page_content
+        if key in seen:
+            continue
+        seen.add(key)
+        expanded.append(doc)
+    return expanded
+
+def _results_to_documents(results, index: int = 0) -> List[Any]:
+    """collection.query 결과(index번째 질문)를 page_content/metadata 문서 객체 목록으로 변환"""
+    documents = []
+    if results and 'documents' in results and results['documents'] and len(results['documents']) > index \
+            and results['documents'][index]:
+        metadatas = results['metadatas'][index] if 'metadatas' in results and results['metadatas'] else []
+        ids = results['ids'][index] if 'ids' in results and results['ids'] else []
+        distances = results['distances'][index] if results.get('distances') else []
+        for i, doc_text in enumerate(results['documents'][index]):
+            doc_metadata = metadatas[i] if i < len(metadatas) and metadatas[i] else {}
+            documents.append(_make_document(doc_text, doc_metadata, ids[i] if i < len(ids) else None,
+                                            distances[i] if i < len(distances) else None))
+    return documents
+
+def _chroma_query(collection, query_embeddings: List[List[float]], n_results: int,
+                  conditions: Optional[Dict[str, Any]], allowed_ids: Optional[Set[str]] = None, **kwargs):
+    """
+    collection.query 호출 (사전 필터 허용 목록이 작으면 ID 목록 + 나머지 조건으로, 크면 where 조건으로 검색)
+    """
+    if allowed_ids is not None and len(allowed_ids) <= METADATA_INDEX.get("max_allow_list", 2000):
+        _, residual = metadata_index.split_conditions(conditions)
+        try:
+            return collection.query(
+                query_embeddings=query_embeddings,
+                n_results=min(n_results, len(allowed_ids)),
+                where=_build_where(residual),
+                ids=sorted(allowed_ids),
+                **kwargs
+            )
+        except TypeError:
+            # ids 인자를 지원하지 않는 ChromaDB 버전은 where 조건으로 검색
+            pass
+    return collection.query(
+        query_embeddings=query_embeddings,
+        n_results=n_results,
+        where=_build_where(conditions),
+        **kwargs
+    )
+
+def _query_shards(shards: Dict[str, Any], query_embeddings: List[List[float]], n_results: int,
+                  conditions: Optional[Dict[str, Any]],
+                  shard_top_k: Optional[Dict[str, int]] = None,
+                  allowed_ids: Optional[Set[str]] = None) -> List[List[Any]]:
+    """
+    조건에 맞는 샤드 컬렉션을 동시에 검색하고 질문별로 거리순 병합합니다
     
-    # 전체 청크 수
-    total_chunks = len(chunks)
-    success_count = 0
+    Args:
+        shard_top_k: 샤드별 최대 검색 수 (없는 샤드는 n_results)
+        allowed_ids: 메타데이터 사전 필터 허용 목록
+    """
+    shard_top_k = shard_top_k if shard_top_k is not None else SHARDED_COLLECTIONS.get("shard_top_k", {})
     
-    print(f"처리할 총 문서 청크 수: {total_chunks}")
+    def query_shard(shard: str):
+        limit = min(n_results, shard_top_k.get(shard, n_results))
+        return _chroma_query(shards[shard], query_embeddings, limit, conditions, allowed_ids,
+                             include=["documents", "metadatas", "distances"])
     
-    # 배치 단위로 처리
-    for i in range(0, total_chunks, batch_size):
-        end_idx = min(i + batch_size, total_chunks)
-        current_batch = chunks[i:end_idx]
+    candidates = [shard for shard in _shard_candidates(conditions) if shard_top_k.get(shard, n_results) > 0]
+    futures = {shard: _shard_executor.submit(query_shard, shard) for shard in candidates}
+    
+    hits_per_query = [[] for _ in query_embeddings]
+    errors = []
+    for shard, future in futures.items():
+        try:
+            results = future.result()
+        except Exception as e:
+            print(f"샤드 '{shard}' 검색 중 오류 발생: {str(e)}")
+            errors.append(e)
+            continue
+        for i in range(len(query_embeddings)):
+            hits_per_query[i].extend(doc for doc in _results_to_documents(results, i) if doc.distance is not None)
+    if errors and len(errors) == len(futures):
+        raise errors[0]
+    
+    return [sorted(hits, key=lambda doc: doc.distance)[:n_results] for hits in hits_per_query]
+
+def _query_many(collection, query_embeddings: List[List[float]], n_results: int,
+                conditions: Optional[Dict[str, Any]],
+                vector_index: Optional[MmapVectorIndex] = None,
+                shards: Optional[Dict[str, Any]] = None,
+                shard_top_k: Optional[Dict[str, int]] = None,
+                allowed_ids: Optional[Set[str]] = None) -> List[List[Any]]:
+    """
+    여러 질문 임베딩을 한 번의 collection.query로 검색하여 질문별 문서 목록을 반환
+    (메모리 매핑 인덱스가 주어지면 프로세스 내에서 검색하고, 실패 시 ChromaDB로 대체.
+    샤드 컬렉션이 주어지면 조건에 맞는 샤드만 동시에 검색.
+    allowed_ids(메타데이터 사전 필터 결과)가 주어지면 그 청크 중에서만 검색)
+    """
+    if allowed_ids is not None and not allowed_ids:
+        # 필터에 맞는 청크가 없으면 검색 생략
+        return [[] for _ in query_embeddings]
+    retiring = _retiring_chunk_ids
+    if retiring:
+        return [
+            [doc for doc in docs if doc.chunk_id not in retiring]
+            for docs in _query_many_unfiltered(collection, query_embeddings, n_results, conditions,
+                                               vector_index, shards, shard_top_k, allowed_ids)
+        ]
+    return _query_many_unfiltered(collection, query_embeddings, n_results, conditions,
+                                  vector_index, shards, shard_top_k, allowed_ids)
+
+def _query_many_unfiltered(collection, query_embeddings: List[List[float]], n_results: int,
+                           conditions: Optional[Dict[str, Any]],
+                           vector_index: Optional[MmapVectorIndex],
+                           shards: Optional[Dict[str, Any]],
+                           shard_top_k: Optional[Dict[str, int]],
+                           allowed_ids: Optional[Set[str]]) -> List[List[Any]]:
+    """_query_many 본문 (편집 중 삭제 대기 청크 제외 전)"""
+    if vector_index is not None:
+        try:
+            if allowed_ids is not None:
+                _, residual = metadata_index.split_conditions(conditions)
+                hits_per_query = vector_index.query(query_embeddings, n_results, residual, allowed_ids)
+            else:
+                hits_per_query = vector_index.query(query_embeddings, n_results, conditions)
+            return [
+                [_make_document(text, metadata, chunk_id, distance) for chunk_id, text, metadata, distance in hits]
+                for hits in hits_per_query
+            ]
+        except Exception as e:
+            print(f"메모리 매핑 인덱스 검색 실패, ChromaDB로 검색합니다: {str(e)}")
+    if shards:
+        return _query_shards(shards, query_embeddings, n_results, conditions, shard_top_k, allowed_ids)
+    results = _chroma_query(collection, query_embeddings, n_results, conditions, allowed_ids,
+                            include=["documents", "metadatas", "distances"])
+    return [_results_to_documents(results, i) for i in range(len(query_embeddings))]
+
+def _group_key(conditions: Dict[str, Any], *extra) -> str:
+    return json.dumps([conditions, *extra], sort_keys=True, ensure_ascii=False)
+
+def detect_query_vendors(query: str, include_hints: bool = False) -> List[str]:
+    """
+    사용자 질문에서 장비 유형(벤더) 키워드를 감지합니다
+    
+    Args:
+        query: 사용자 질문
+        include_hints: 일반 장비 키워드(스위치, 로드밸런서 등)로 추정한 벤더도 포함 (정렬용)
+    """
+    query_lower = query.lower()
+    keyword_sets = [VENDOR_QUERY_KEYWORDS] + ([VENDOR_HINT_KEYWORDS] if include_hints else [])
+    return [vendor for vendor in VENDOR_QUERY_KEYWORDS
+            if any(keyword.lower() in query_lower
+                   for keywords in keyword_sets for keyword in keywords.get(vendor, []))]
+
+def _matches_vendor(doc, vendors: List[str]) -> bool:
+    """문서가 감지된 벤더에 해당하는지 확인 (태그 우선, 없으면 이름 포함 여부)"""
+    metadata = doc.metadata or {}
+    if metadata.get('vendor') in vendors:
+        return True
+    fields = [metadata.get('source', ''), metadata.get('doc_name', ''), doc.page_content]
+    return any(isinstance(field, str) and vendor in field.lower() for vendor in vendors for field in fields)
+
+def resolve_guide_version_filter(filter: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+    """
+    필터의 guide_version을 실제 저장된 버전 값으로 바꿉니다
+
+    청크 레지스트리의 가이드 버전 카탈로그에서 같은 날짜의 버전 값을 찾습니다. 필터에 source/filename이
+    있으면 그 가이드 계열 안에서만 찾습니다. 요청한 날짜의 버전이 없으면 그 계열의 최신 버전(계열이 없으면
+    각 계열의 최신 버전)으로 바꿔 다시 검색하지 않고 한 번의 필터 검색으로 처리합니다.
+    """
+    if not filter or not isinstance(filter.get("guide_version"), str):
+        return filter
+    source = filter.get("source") or filter.get("filename")
+    family = guide_family(source) if isinstance(source, str) else None
+    try:
+        versions = chunk_registry.resolve_guide_versions(filter["guide_version"], family=family)
+    except Exception as e:
+        print(f"가이드 버전 카탈로그 조회 오류: {str(e)}")
+        return filter
+    if not versions:
+        return filter
+    resolved = dict(filter)
+    resolved["guide_version"] = versions[0] if len(versions) == 1 else {"$in": versions}
+    requested_key = canonical_guide_version(filter["guide_version"])
+    if requested_key and all(canonical_guide_version(version) != requested_key for version in versions):
+        scope = f"{family} 가이드의" if family else "가이드별"
+        print(f"가이드 버전 {filter['guide_version']}이(가) 없어 {scope} 최신 버전 {resolved['guide_version']}으로 검색합니다")
+    elif resolved["guide_version"] != filter["guide_version"]:
+        print(f"가이드 버전 {filter['guide_version']} -> {resolved['guide_version']}")
+    return resolved
+
+def adaptive_cutoff(distances: List[float], min_k: int, max_k: int,
+                    gap_ratio: float = 0.4, min_gap: float = 0.0) -> int:
+    """
+    거리 분포의 elbow(가장 큰 간격)로 남길 문서 수를 정합니다
+    
+    오름차순 상위 max_k + 1개 거리에서 min_k번째 이후의 가장 큰 인접 간격을 찾아,
+    그 간격이 거리 범위의 gap_ratio 이상이고 min_gap 이상이면 간격 앞까지만 남깁니다.
+    뚜렷한 간격이 없으면(애매한 질문) max_k개를 남깁니다.
+    
+    Returns:
+        남길 문서 수 (min_k ~ max_k, 거리가 2개 미만이면 max_k)
+    """
+    distances = sorted(distances)[:max_k + 1]
+    if len(distances) < 2 or len(distances) <= min_k:
+        return max_k
+    spread = distances[-1] - distances[0]
+    cut = max(range(max(min_k, 1), len(distances)), key=lambda i: distances[i] - distances[i - 1])
+    gap = distances[cut] - distances[cut - 1]
+    if spread > 0 and gap >= spread * gap_ratio and gap >= min_gap:
+        return cut
+    return max_k
+
+def adaptive_top_k(docs: List[Any], max_k: int) -> int:
+    """
+    문서의 벡터 검색 거리(distance 속성)로 남길 문서 수를 정합니다 (ADAPTIVE_TOP_K 설정)
+    
+    어휘 검색으로만 찾은 문서처럼 거리가 없는 문서는 계산에서 제외합니다.
+    
+    Args:
+        docs: 검색 후보 문서
+        max_k: 최대 문서 수 (설정의 max_k가 더 작으면 설정 값)
+    """
+    max_k = min(max_k, ADAPTIVE_TOP_K.get("max_k", max_k))
+    min_k = min(ADAPTIVE_TOP_K.get("min_k", 1), max_k)
+    distances = [doc.distance for doc in docs if getattr(doc, 'distance', None) is not None]
+    return adaptive_cutoff(distances, min_k, max_k,
+                           gap_ratio=ADAPTIVE_TOP_K.get("gap_ratio", 0.4),
+                           min_gap=ADAPTIVE_TOP_K.get("min_gap", 0.0))
+
+def nearest_documents(docs: List[Any], k: int) -> List[Any]:
+    """
+    벡터 거리가 있는 문서 중 가장 가까운 k개와 거리가 없는 문서를 원래(결합 순위) 순서대로 반환합니다
+    
+    adaptive_top_k의 거리 간격 컷은 벡터 검색 후보에만 적용하고, 어휘 검색으로만 찾은 문서는
+    거리로 비교할 수 없으므로 그대로 남겨 재순위화에 맡깁니다.
+    """
+    ranked = sorted((i for i, doc in enumerate(docs) if getattr(doc, 'distance', None) is not None),
+                    key=lambda i: docs[i].distance)
+    cut = set(ranked[k:])
+    return [doc for i, doc in enumerate(docs) if i not in cut]
+
+def search_similar_docs(
+    query: str, 
+    top_k: int = 3,
+    filter: Optional[Dict[str, str]] = None,
+    offline: bool = False,
+    shard_top_k: Optional[Dict[str, int]] = None,
+    adaptive: bool = False
+) -> List[Any]:
+    """
+    Search for similar documents in the vector database
+    
+    질문에 제품/제조사명이 있으면 수집 시 태깅된 vendor 메타데이터로 필터링한 단일 검색을 수행하고,
+    결과가 top_k보다 적을 때만 필터 없이 초과 검색한 뒤 벤더 일치 문서를 우선 정렬합니다.
+    "스위치", "로드밸런서" 같은 일반 장비 키워드는 필터에 쓰지 않고 이 정렬에만 사용합니다.
+    필터의 content_type / guide_version / file_type / vendor 조건은 메타데이터 사전 필터 인덱스로
+    후보 청크 ID를 먼저 계산하여 벡터 검색의 허용 목록으로 사용합니다.
+    
+    Args:
+        query: The query to search for
+        top_k: Number of results to return
+        filter: Optional metadata filter dictionary (e.g., {"content_type": "procedure_guide"})
+        offline: True이면 네트워크 없이 로컬 임베딩 인덱스에서 검색
+        shard_top_k: 샤드 컬렉션 사용 시 샤드별 최대 검색 수 (기본값: SHARDED_COLLECTIONS 설정)
+        adaptive: True이면 top_k를 상한으로 거리 분포에 따라 문서 수를 줄임 (adaptive_top_k)
         
-        # 현재 배치에서 데이터 추출
-        texts = [chunk["text"] for chunk in current_batch]
-        ids = [chunk["chunk_id"] for chunk in current_batch]
-        metadatas = [chunk["metadata"] for chunk in current_batch]
+    Returns:
+        List of document objects with page_content, metadata and distance
+    """
+    docs = search_similar_docs_batch([query], filters=filter, top_k=top_k, offline=offline,
+                                     shard_top_k=shard_top_k)[0]
+    if adaptive and ADAPTIVE_TOP_K.get("enabled", True):
+        docs = nearest_documents(docs, adaptive_top_k(docs, top_k))
+    return docs
+
+def search_similar_docs_batch(
+    queries: List[str],
+    filters: Optional[Any] = None,
+    top_k: int = 3,
+    offline: bool = False,
+    shard_top_k: Optional[Dict[str, int]] = None
+) -> List[List[Any]]:
+    """
+    여러 질문을 한 번에 검색합니다 (평가, 캐시 예열, 대시보드 사전 계산용)
+    
+    모든 질문을 한 번의 임베딩 요청으로 임베딩하고, 같은 where 조건을 가진 질문끼리 묶어
+    여러 질문 임베딩을 담은 collection.query 한 번으로 검색합니다.
+    
+    Args:
+        queries: 검색할 질문 목록
+        filters: 모든 질문에 적용할 메타데이터 필터 딕셔너리, 또는 질문별 필터 목록
+        top_k: 질문별 반환할 문서 수
+        offline: True이면 네트워크 없이 로컬 임베딩 인덱스에서 검색
+        shard_top_k: 샤드 컬렉션 사용 시 샤드별 최대 검색 수 (기본값: SHARDED_COLLECTIONS 설정)
         
+    Returns:
+        질문 순서대로의 문서 목록 리스트 (각 문서는 page_content와 metadata를 가짐)
+    """
+    with collection_manager.reading():
+        return _search_similar_docs_batch(queries, filters, top_k, offline, shard_top_k)
+
+def _search_similar_docs_batch(queries: List[str], filters: Optional[Any], top_k: int, offline: bool,
+                               shard_top_k: Optional[Dict[str, int]]) -> List[List[Any]]:
+    """search_similar_docs_batch 본문 (컬렉션 교체 대기 구간 안에서 실행)"""
+    if not queries:
+        return []
+    
+    if filters is None or isinstance(filters, dict):
+        query_filters = [filters] * len(queries)
+    else:
+        query_filters = list(filters)
+        if len(query_filters) != len(queries):
+            raise ValueError("filters 목록의 길이는 queries와 같아야 합니다")
+    
+    documents_per_query = [[] for _ in queries]
+    # 자식 청크 여러 개가 같은 부모로 합쳐지므로 부모 top_k개를 채울 만큼 자식을 검색
+    fetch_k = top_k * PARENT_CHILD_CHUNKING.get("candidate_multiplier", 3) \
+        if PARENT_CHILD_CHUNKING.get("enabled", False) else top_k
+    
+    # 오프라인 검색은 로컬 임베딩 컬렉션 사용 (임베딩 모델이 다른 컬렉션과 섞이지 않음)
+    primary = get_primary_backend()
+    backend = local_backend if offline else primary
+    if offline and primary.requires_network and not local_index_enabled(primary):
+        print("로컬 임베딩 인덱스가 비활성화되어 오프라인 벡터 검색을 수행할 수 없습니다")
+        return documents_per_query
+    if backend is not primary and not collection_manager.local_index_ready():
+        # 로컬 인덱스를 구축하는 동안에는 네트워크 없이 가능한 어휘 검색(BM25)으로 대체
+        print("로컬 임베딩 인덱스 구축 중 - 오프라인 검색을 어휘 검색으로 대체합니다")
+        return [
+            _lexical_documents(_lexical_hits(query, top_k, resolve_guide_version_filter(query_filter)))[:top_k]
+            for query, query_filter in zip(queries, query_filters)
+        ]
+    
+    # Initialize the database
+    collection = collection_manager.get_collection(backend)
+    vector_index = get_mmap_index(backend) if backend is primary else None
+    shards = None
+    if backend is primary and vector_index is None and SHARDED_COLLECTIONS.get("enabled", False):
         try:
-            # 현재 배치 추가
-            collection.add(
-                documents=texts,
-                ids=ids,
-                metadatas=metadatas
-            )
-            success_count += len(current_batch)
-            print(f"배치 {i//batch_size + 1}/{(total_chunks + batch_size - 1)//batch_size} 추가 완료: {i}~{end_idx-1} 청크")
+            shards = collection_manager.get_shard_collections()
+            # 기본 모델이 방금 전환되었으면 샤드는 새 모델 벡터이므로 사용하지 않음
+            if any(_pinned_model(shard) != backend.model_name for shard in shards.values()):
+                shards = None
         except Exception as e:
-            print(f"배치 {i//batch_size + 1} 추가 중 오류 발생: {str(e)}")
-            # 오류가 발생해도 계속 진행
+            print(f"샤드 컬렉션 연결 실패, 기본 컬렉션으로 검색합니다: {str(e)}")
     
-    print(f"총 {success_count}/{total_chunks} 청크가 성공적으로 추가되었습니다.")
+    # 질문 임베딩은 한 번의 요청으로 계산 (캐시에 있는 질문은 제외)
+    try:
+        query_embeddings = embed_queries(queries, backend)
+    except Exception as e:
+        print(f"질문 임베딩 생성 중 오류 발생: {str(e)}")
+        return documents_per_query
     
-    print(f"Added {len(chunks)} document chunks to the database")
-    return True
+    # 사용자 질문에서 장비 유형 키워드 감지 (제품/제조사명은 필터, 일반 장비 키워드는 정렬에만 사용)
+    vendors_per_query = [detect_query_vendors(query) for query in queries]
+    hinted_vendors_per_query = [detect_query_vendors(query, include_hints=True) for query in queries]
+    base_conditions = [dict(resolve_guide_version_filter(query_filter) or {}) for query_filter in query_filters]
+    
+    # 1단계: 벤더 태그 필터를 where 절에 포함한 검색 (같은 조건의 질문은 한 번에)
+    vendor_groups = {}
+    for i, vendors in enumerate(vendors_per_query):
+        if vendors:
+            conditions = dict(base_conditions[i])
+            conditions["vendor"] = vendors[0] if len(vendors) == 1 else {"$in": vendors}
+            vendor_groups.setdefault(_group_key(conditions), (conditions, []))[1].append(i)
+    
+    for conditions, indices in vendor_groups.values():
+        print(f"벤더 필터 검색: {conditions} ({len(indices)}개 질문)")
+        try:
+            for i, docs in zip(indices, _query_many(collection, [query_embeddings[i] for i in indices], fetch_k, conditions,
+                                                    vector_index, shards, shard_top_k, prefilter_ids(conditions))):
+                documents_per_query[i] = expand_to_parents(docs)
+        except Exception as e:
+            print(f"벤더 필터 검색 중 오류 발생: {str(e)}")
+    
+    # 2단계: Fallback - 결과가 top_k보다 적은 질문만 전체 검색
+    fallback_groups = {}
+    for i in range(len(queries)):
+        if len(documents_per_query[i]) >= top_k:
+            continue
+        # 벤더가 감지된 경우 한 번만 초과 검색하여 벤더 일치 문서를 재정렬
+        n_results = fetch_k * 3 if hinted_vendors_per_query[i] else fetch_k
+        fallback_groups.setdefault(
+            _group_key(base_conditions[i], n_results), (base_conditions[i], n_results, [])
+        )[2].append(i)
+    
+    for conditions, n_results, indices in fallback_groups.values():
+        if conditions:
+            print(f"메타데이터 필터 적용: {conditions} ({len(indices)}개 질문)")
+        try:
+            candidates_per_query = dict(zip(
+                indices, _query_many(collection, [query_embeddings[i] for i in indices], n_results, conditions,
+                                     vector_index, shards, shard_top_k, prefilter_ids(conditions))
+            ))
+            
+            for i in indices:
+                candidates = expand_to_parents(candidates_per_query[i])
+                
+                # 벤더 일치 문서를 앞으로 (유사도 순서는 그룹 내에서 유지)
+                if hinted_vendors_per_query[i]:
+                    candidates.sort(key=lambda doc: 0 if _matches_vendor(doc, hinted_vendors_per_query[i]) else 1)
+                
+                # 기존 결과에 추가 (중복 제거)
+                existing_texts = set(doc.page_content for doc in documents_per_query[i])
+                for doc in candidates:
+                    if doc.page_content not in existing_texts:
+                        documents_per_query[i].append(doc)
+                        existing_texts.add(doc.page_content)
+        except Exception as e:
+            print(f"전체 문서 검색 중 오류 발생: {str(e)}")
+            # 연결 상태가 비정상이면 다음 요청을 위해 재연결
+            if not collection_manager.health_check():
+                try:
+                    collection_manager.reconnect()
+                except Exception as reconnect_error:
+                    print(f"ChromaDB 재연결 실패: {str(reconnect_error)}")
+    
+    # 최종 결과는 최대 top_k 개수로 제한
+    return [docs[:top_k] for docs in documents_per_query]
 
-def search_similar_docs(
-    query: str, 
+def _lexical_hits(query: str, top_k: int, conditions: Optional[Dict[str, Any]]) -> List[tuple]:
+    """BM25 검색 결과 [(chunk_id, 점수, 질문 토큰 커버리지)] (오류 시 빈 목록)"""
+    try:
+        return get_lexical_index().search(query, top_k=top_k, conditions=conditions)
+    except Exception as e:
+        print(f"어휘 검색 중 오류 발생: {str(e)}")
+        return []
+
+def _lexical_documents(hits: List[tuple]) -> List[Any]:
+    """BM25 검색 결과를 문서 객체로 (자식 청크는 부모 섹션으로)"""
+    docs = []
+    for chunk_id, _, _ in hits:
+        text, metadata = lexical_index.document(chunk_id)
+        docs.append(_make_document(text, metadata, chunk_id))
+    return expand_to_parents(docs)
+
+def _lexical_is_confident(hits: List[tuple]) -> bool:
+    """어휘 검색 1위가 질문 토큰 대부분을 포함하고 2위와 점수 차이가 충분한지 확인"""
+    _, top_score, top_coverage = hits[0]
+    if top_coverage < HYBRID_RETRIEVAL.get("lexical_confidence", 0.8):
+        return False
+    if len(hits) == 1:
+        return True
+    return top_score >= hits[1][1] * HYBRID_RETRIEVAL.get("lexical_margin", 1.5)
+
+def hybrid_search_docs(
+    query: str,
     top_k: int = 3,
     filter: Optional[Dict[str, str]] = None
 ) -> List[Any]:
     """
-    Search for similar documents in the vector database
+    BM25 어휘 검색과 벡터 검색을 Reciprocal Rank Fusion으로 결합합니다
+    
+    어휘 검색 결과가 확실한 경우(질문 토큰 커버리지와 점수 차이 기준)에는 임베딩 호출 없이
+    어휘 검색 결과만 반환합니다.
     
     Args:
-        query: The query to search for
-        top_k: Number of results to return
-        filter: Optional metadata filter dictionary (e.g., {"content_type": "procedure_guide"})
+        query: 사용자 질문
+        top_k: 반환할 문서 수
+        filter: 메타데이터 필터 딕셔너리 (e.g., {"content_type": "procedure_guide"})
         
     Returns:
         List of document objects with page_content and metadata
     """
-    # Initialize the database
-    collection = initialize_database()
+    if not HYBRID_RETRIEVAL.get("enabled", True):
+        return search_similar_docs(query, top_k=top_k, filter=filter)
     
-    # 키워드 필터링을 위한 정의
-    keyword_filters = {
-        "nexg": ["넥스지", "nexg", "vforce", "넥스쥐", "axgate", "엑스게이트", "브이포스", "v-force", "vforceㅡ", "브이포스-utm"],
-        "cisco": ["시스코", "cisco", "nexus", "넥서스", "aci", "스위치", "라우터", "switch", "router"],
-        "alteon": ["알티온", "alteon", "radware", "라드웨어", "로드밸런서", "load balancer", "lb"],
-    }
+    candidate_count = max(top_k * 2, HYBRID_RETRIEVAL.get("candidates", 20))
+    filter = resolve_guide_version_filter(filter)
     
-    # 사용자 질문에서 장비 유형 키워드 감지
-    detected_vendors = []
-    for vendor, keywords in keyword_filters.items():
-        if any(keyword.lower() in query.lower() for keyword in keywords):
-            detected_vendors.append(vendor)
-            
-    # 메타데이터 필터 로직
-    where_clause = {}
-    
-    # 벤더 필터링을 위한 where 조건
-    if detected_vendors:
-        # where_clause["vendor"] = {"$in": detected_vendors}
-        print(f"장비 유형 필터링: {detected_vendors}")
-    
-    # 추가 필터링 (예: 특정 컨텐츠 타입으로 제한)
-    if filter:
-        for key, value in filter.items():
-            where_clause[key] = value
-            
-    # 필터링 조건이 있는 경우 로그 출력
-    if where_clause:
-        print(f"메타데이터 필터 적용: {where_clause}")
+    lexical_hits = _lexical_hits(query, candidate_count, filter)
+    lexical_docs = _lexical_documents(lexical_hits)
     
-    documents = []
+    # 어휘 검색이 확실하면 임베딩/벡터 검색 생략
+    if lexical_hits and _lexical_is_confident(lexical_hits):
+        print(f"어휘 검색 결과가 확실하여 벡터 검색을 생략합니다 (커버리지 {lexical_hits[0][2]:.2f})")
+        return lexical_docs[:top_k]
     
-    # 1단계: 검색 전략 - 특정 파일명/메타데이터 우선 필터링
-    if detected_vendors:
-        print(f"메타데이터 필터링 검색 시도: {', '.join(detected_vendors)}")
-        
-        # 각 벤더별로 필터링 시도
-        for vendor in detected_vendors:
-            # 필터링 조건 정의
-            try:
-                # 파일명에 키워드가 포함된 문서 필터링
-                # ChromaDB는 $contains 연산자를 지원하지 않으므로 
-                # 키워드 기반 매칭은 후처리 로직으로 처리
-                print(f"{vendor} 키워드로 검색을 시도합니다")
-                
-                # 일단 전체 검색 실행
-                results = collection.query(
-                    query_texts=[query],
-                    n_results=top_k,
-                    where=where_clause if where_clause else None
-                )
-                
-                # 검색 결과가 있으면 벤더 키워드 포함 여부를 확인하여 필터링
-                if results and 'documents' in results and results['documents'] and results['documents'][0]:
-                    filtered_indices = []
-                    
-                    # 메타데이터와 내용에서 키워드 필터링
-                    for i, doc_text in enumerate(results['documents'][0]):
-                        meta = results['metadatas'][0][i] if 'metadatas' in results and results['metadatas'] and i < len(results['metadatas'][0]) else {}
-                        source = meta.get('source', '')
-                        doc_name = meta.get('doc_name', '')
-                        
-                        # 메타데이터나 내용에 벤더 키워드가 포함된 경우 필터링
-                        # 문자열 체크 전 타입 확인 및 안전한 소문자 변환
-                        if (source and isinstance(source, str) and vendor.lower() in source.lower()) or \
-                           (doc_name and isinstance(doc_name, str) and vendor.lower() in doc_name.lower()) or \
-                           (doc_text and isinstance(doc_text, str) and vendor.lower() in doc_text.lower()):
-                            filtered_indices.append(i)
-                    
-                    if filtered_indices:
-                        print(f"{vendor} 관련 문서에서 {len(filtered_indices)} 개의 결과를 찾았습니다")
-                        # 필터링된 결과만 사용
-                        filtered_docs = [results['documents'][0][i] for i in filtered_indices]
-                        filtered_meta = [results['metadatas'][0][i] for i in filtered_indices] if 'metadatas' in results and results['metadatas'] else []
-                        
-                        # results 객체 업데이트
-                        results['documents'][0] = filtered_docs
-                        if 'metadatas' in results and results['metadatas']:
-                            results['metadatas'][0] = filtered_meta
-                
-                # 결과 처리
-                if results and 'documents' in results and results['documents'] and results['documents'][0]:
-                    print(f"{vendor} 관련 문서에서 {len(results['documents'][0])} 개의 결과를 찾았습니다.")
-                    for i, doc_text in enumerate(results['documents'][0]):
-                        doc_metadata = results['metadatas'][0][i] if 'metadatas' in results and results['metadatas'] else {}
-                        documents.append(type('Document', (), {
-                            'page_content': doc_text,
-                            'metadata': doc_metadata
-                        }))
-                    
-                    # 충분한 결과를 찾았으면 더 이상 검색하지 않음
-                    if len(documents) >= top_k:
-                        print(f"{len(documents)} 개의 결과를 찾아 검색 완료")
-                        return documents[:top_k]
-                        
-            except Exception as e:
-                print(f"{vendor} 문서 검색 중 오류 발생: {str(e)}")
+    vector_docs = search_similar_docs(query, top_k=top_k * 2, filter=filter)
+    if not lexical_docs:
+        return vector_docs[:top_k]
     
-    # 2단계: Fallback - 필터링 결과가 없거나 충분하지 않은 경우 전체 검색
-    if not documents or len(documents) < top_k:
-        print(f"벤더 필터링 검색 결과가 없어 전체 문서 검색을 시도합니다: {query}")
-        try:
-            # 메타데이터 필터 적용 (있는 경우)
-            version_where = where_clause.copy() if where_clause else {}
-            
-            # 가이드 버전 필터 특별 처리 - 특정 버전 또는 최신 버전
-            version_specified = False
-            if "guide_version" in version_where and version_where["guide_version"] != "latest":
-                version_specified = True
-                print(f"특정 버전 가이드 검색: {version_where['guide_version']}")
-            
-            results = collection.query(
-                query_texts=[query],
-                n_results=top_k,
-                where=version_where if version_where else None
-            )
-            
-            # 만약 특정 버전 검색 결과가 없으면 최신 버전으로 대체 검색
-            if version_specified and (not results or 'documents' not in results or not results['documents'] or not results['documents'][0]):
-                print(f"특정 버전({version_where['guide_version']})에서 결과를 찾지 못해 최신 버전으로 검색합니다")
-                
-                # guide_version을 'latest'로 변경하여 다시 검색
-                version_where["guide_version"] = "latest"
-                results = collection.query(
-                    query_texts=[query],
-                    n_results=top_k,
-                    where=version_where if version_where else None
-                )
-            
-            # 결과 처리
-            if results and 'documents' in results and results['documents'] and results['documents'][0]:
-                print(f"전체 문서 검색에서 {len(results['documents'][0])} 개의 결과를 찾았습니다.")
-                
-                # 기존 결과에 추가 (중복 제거)
-                existing_texts = set(doc.page_content for doc in documents)
-                
-                for i, doc_text in enumerate(results['documents'][0]):
-                    # 중복 검사
-                    if doc_text not in existing_texts:
-                        doc_metadata = results['metadatas'][0][i] if 'metadatas' in results and results['metadatas'] else {}
-                        documents.append(type('Document', (), {
-                            'page_content': doc_text,
-                            'metadata': doc_metadata
-                        }))
-                        existing_texts.add(doc_text)
-        except Exception as e:
-            print(f"전체 문서 검색 중 오류 발생: {str(e)}")
+    return reciprocal_rank_fusion([vector_docs, lexical_docs], HYBRID_RETRIEVAL.get("rrf_k", 60))[:top_k]
+
+def reciprocal_rank_fusion(ranked_lists: List[List[Any]], k: int = 60) -> List[Any]:
+    """
+    여러 검색 결과 순위를 Reciprocal Rank Fusion으로 결합합니다 (score = Σ 1 / (k + rank))
     
-    # 최종 결과는 최대 top_k 개수로 제한
-    return documents[:top_k]
+    같은 청크(chunk_id, 없으면 본문)는 한 번만 남기고 처음 나온 문서 객체를 사용합니다.
+    점수가 같으면 먼저 나온 순서를 유지합니다.
+    """
+    fused_scores = {}
+    fused_docs = {}
+    for ranked_docs in ranked_lists:
+        for rank, doc in enumerate(ranked_docs):
+            key = getattr(doc, 'chunk_id', None) or doc.page_content
+            fused_scores[key] = fused_scores.get(key, 0.0) + 1.0 / (k + rank + 1)
+            fused_docs.setdefault(key, doc)
+    
+    ranked_keys = sorted(fused_scores, key=lambda key: fused_scores[key], reverse=True)
+    return [fused_docs[key] for key in ranked_keys]
+
+def get_corpus_generation() -> Optional[int]:
+    """코퍼스 세대 (업로드/삭제/편집/동기화로 청크가 바뀔 때마다 증가, 검색 결과 캐시 무효화용)"""
+    try:
+        return chunk_registry.generation()
+    except Exception as e:
+        print(f"코퍼스 세대 조회 오류: {str(e)}")
+        return None
 
 def get_database_status():
     """
     Get status information about the database
     
+    청크 레지스트리의 증분 카운터를 읽으므로 코퍼스 크기와 무관하게 상수 시간에 응답합니다.
+    
     Returns:
         Dictionary with status information
+        (chunk_count, document_count, file_types, content_types, guide_versions)
     """
     try:
-        # Initialize the database
-        collection = initialize_database()
-        
-        # Get all IDs
-        all_ids = collection.get()['ids']
-        
-        # Count unique documents based on metadata.source
-        all_metadata = collection.get()['metadatas']
-        unique_sources = set()
-        for metadata in all_metadata:
-            if metadata and 'source' in metadata:
-                unique_sources.add(metadata['source'])
+        # 레지스트리 구축 보장
+        initialize_database()
         
-        return {
-            "chunk_count": len(all_ids),
-            "document_count": len(unique_sources)
-        }
+        status = chunk_registry.stats()
+        status["guide_versions"] = chunk_registry.guide_versions()
+        return status
     except Exception as e:
         print(f"Error getting database status: {e}")
         return {
             "chunk_count": 0,
-            "document_count": 0
+            "document_count": 0,
+            "file_types": {},
+            "content_types": {},
+            "guide_versions": {}
         }
 
 def delete_document(doc_id: str):
@@ -404,80 +1774,60 @@ def delete_document(doc_id: str):
     Returns:
         삭제 성공 여부 (True/False)
     """
+    return delete_documents([doc_id]).get(doc_id, 0) > 0
+
+def delete_documents(doc_ids: List[str]) -> Dict[str, int]:
+    """
+    여러 문서의 청크를 한 번에 벡터 DB에서 삭제합니다
+    
+    청크 레지스트리에서 삭제 대상 청크 ID를 조회하므로 비용은 컬렉션 크기가 아니라
+    삭제되는 청크 수에 비례합니다.
+    
+    Args:
+        doc_ids: 삭제할 문서 ID 목록 (UUID, 시스템 파일명 UUID 또는 청크 ID 접두사)
+    Returns:
+        문서 ID별 삭제된 청크 수
+    """
+    deleted_counts = {doc_id: 0 for doc_id in doc_ids}
+    
     try:
         collection = initialize_database()
-        deleted_chunks = 0
         
-        # 1단계: 메타데이터에서 doc_id 필드로 검색
-        try:
-            results = collection.get(
-                where={"doc_id": doc_id}
-            )
-            
-            if results and results['ids'] and len(results['ids']) > 0:
-                # 해당 ID의 모든 청크 삭제
-                chunk_ids = results['ids']
-                collection.delete(ids=chunk_ids)
-                deleted_chunks += len(chunk_ids)
-                print(f"Deleted {len(chunk_ids)} chunks for document ID: {doc_id}")
-        except Exception as metadata_err:
-            print(f"메타데이터 검색 중 오류: {str(metadata_err)}")
-        
-        # 2단계: 메타데이터에서 source 필드에 doc_id가 포함된 항목 검색
-        try:
-            # source 필드가 있는 모든 메타데이터 가져오기
-            all_data = collection.get()
-            if all_data and 'metadatas' in all_data and all_data['metadatas']:
-                source_match_ids = []
-                
-                for i, metadata in enumerate(all_data['metadatas']):
-                    # 메타데이터에 source가 있고 doc_id가 포함된 경우
-                    if metadata and 'source' in metadata and isinstance(metadata['source'], str):
-                        source = metadata['source']
-                        if doc_id in source:
-                            # 해당 청크 ID 추가
-                            if i < len(all_data['ids']):
-                                source_match_ids.append(all_data['ids'][i])
-                
-                if source_match_ids:
-                    collection.delete(ids=source_match_ids)
-                    deleted_chunks += len(source_match_ids)
-                    print(f"Deleted {len(source_match_ids)} chunks with source containing: {doc_id}")
-        except Exception as source_err:
-            print(f"소스 필드 검색 중 오류: {str(source_err)}")
-        
-        # 3단계: 이전 버전 호환성 - 청크 ID에서 doc_id 형식으로 검색
-        try:
-            all_chunks = collection.get()
-            target_ids = []
-            
-            if all_chunks and 'ids' in all_chunks and all_chunks['ids']:
-                for chunk_id in all_chunks['ids']:
-                    # 청크 ID가 "doc_id-번호" 형식이므로 doc_id로 시작하는지 확인
-                    if isinstance(chunk_id, str) and (
-                        chunk_id.startswith(f"{doc_id}-") or 
-                        chunk_id.startswith(f"{doc_id}_")
-                    ):
-                        target_ids.append(chunk_id)
-            
-            if target_ids:
-                collection.delete(ids=target_ids)
-                deleted_chunks += len(target_ids)
-                print(f"Deleted {len(target_ids)} chunks with IDs starting with: {doc_id}")
-        except Exception as chunk_err:
-            print(f"청크 ID 검색 중 오류: {str(chunk_err)}")
-        
-        # 삭제 결과 반환
-        if deleted_chunks > 0:
-            print(f"총 {deleted_chunks}개의 청크가 문서 ID {doc_id}와 관련하여 삭제되었습니다.")
-            return True
-        else:
-            print(f"문서 ID {doc_id}에 해당하는 청크를 찾을 수 없습니다.")
-            return False
-            
+        # 삭제 대상 청크 ID 수집 (여러 문서에 걸친 중복 제거)
+        target_ids = []
+        seen_ids = set()
+        for doc_id in doc_ids:
+            for chunk_id in chunk_registry.chunk_ids_for(doc_id):
+                deleted_counts[doc_id] += 1
+                if chunk_id not in seen_ids:
+                    seen_ids.add(chunk_id)
+                    target_ids.append(chunk_id)
+        
+        if not target_ids:
+            print(f"문서 ID {', '.join(doc_ids)}에 해당하는 청크를 찾을 수 없습니다.")
+            return deleted_counts
+        
+        # 배치 단위로 삭제 (로컬 임베딩 인덱스 등 열린 모든 컬렉션에서)
+        batch_size = 500
+        for i in range(0, len(target_ids), batch_size):
+            batch_ids = target_ids[i:i + batch_size]
+            with _write_lock:
+                generation_before = chunk_registry.generation()
+                for target_collection in collection_manager.write_collections():
+                    target_collection.delete(ids=batch_ids)
+                chunk_registry.unregister(batch_ids)
+                _update_lexical_index(generation_before, removed_ids=batch_ids)
+                _update_metadata_index(generation_before, removed_ids=batch_ids)
+                _update_mmap_index(generation_before, removed_ids=batch_ids)
+                _update_shard_collections(removed_ids=batch_ids)
+                _journal_reembed_changes(batch_ids, generation_before)
+        
+        print(f"총 {len(target_ids)}개의 청크가 문서 {len([d for d in doc_ids if deleted_counts[d] > 0])}개와 관련하여 삭제되었습니다.")
+        return deleted_counts
+    
     except Exception as e:
         print(f"Error deleting document from database: {e}")
-        return False
+        return deleted_counts
 
 def get_all_document_ids():
     """
@@ -487,82 +1837,852 @@ def get_all_document_ids():
         Set of unique document IDs
     """
     try:
-        # 데이터베이스 연결
-        collection = initialize_database()
-        
-        # 메타데이터에서 문서 ID 추출
-        doc_ids = set()
-        
-        # 모든 메타데이터 가져오기
-        try:
-            results = collection.get()
-            
-            if results and 'metadatas' in results and results['metadatas']:
-                for metadata in results['metadatas']:
-                    if metadata and 'doc_id' in metadata:
-                        doc_ids.add(metadata['doc_id'])
-        except Exception as e:
-            print(f"메타데이터 조회 오류: {str(e)}")
+        # 레지스트리 구축 보장
+        initialize_database()
         
-        # 청크 ID에서 문서 ID 추출 (이전 버전 호환성)
-        try:
-            all_ids = collection.get()['ids']
-            for chunk_id in all_ids:
-                if '-' in chunk_id:
-                    doc_id = chunk_id.split('-')[0]
-                    doc_ids.add(doc_id)
-        except Exception as e:
-            print(f"청크 ID 처리 오류: {str(e)}")
-            
-        return doc_ids
+        # 메타데이터 doc_id + 청크 ID 접두사 (이전 버전 호환성)
+        return chunk_registry.all_document_ids()
     except Exception as e:
         print(f"문서 ID 목록 조회 오류: {str(e)}")
         return set()
 
+def _text_hash(text: str) -> str:
+    return hashlib.sha256((text or '').encode('utf-8')).hexdigest()
+
+def _document_chunks(collection, doc_id: str) -> Dict[str, List[Any]]:
+    """문서의 현재 청크 {"ids", "documents", "metadatas"} (레지스트리의 청크 ID로 조회)"""
+    existing_ids = chunk_registry.chunk_ids_for(doc_id)
+    existing = {"ids": [], "documents": [], "metadatas": []}
+    for i in range(0, len(existing_ids), 500):
+        page = collection.get(ids=existing_ids[i:i + 500], include=["documents", "metadatas"])
+        existing["ids"].extend(page.get('ids') or [])
+        existing["documents"].extend(page.get('documents') or [])
+        existing["metadatas"].extend(page.get('metadatas') or [])
+    return existing
+
+def _plan_document_update(existing: Dict[str, List[Any]], doc_id: str,
+                          chunks: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    기존 청크와 새 청크를 텍스트 해시로 비교하여 유지 / 메타데이터만 변경 / 신규 / 삭제로 분류합니다
+    
+    chunks의 메타데이터는 벤더 태그와 임베딩 모델이 이미 기록된 상태여야 기존 메타데이터와 비교할 수 있습니다.
+    
+    Returns:
+        {"new_chunks", "changed_chunks", "kept_ids", "removed_ids"} (chunks의 chunk_id/doc_id/메타데이터 갱신)
+    """
+    existing_by_hash = {}
+    for chunk_id, text, metadata in zip(existing["ids"], existing["documents"], existing["metadatas"]):
+        existing_by_hash.setdefault(_text_hash(text), []).append((chunk_id, metadata or {}))
+    
+    # 업로드 시 부여된 문서 ID 유지 (파일명 UUID로 요청된 경우)
+    stable_doc_id = next(
+        (metadata.get("doc_id") for metadata in existing["metadatas"] if metadata and metadata.get("doc_id")),
+        doc_id
+    )
+    
+    new_chunks, changed_chunks = [], []
+    kept_ids = set()
+    # 신규 청크 ID는 기존 청크(유지/삭제 모두)와 이미 부여한 신규 ID를 피함
+    taken_ids = set(existing["ids"])
+    for chunk in chunks:
+        chunk["doc_id"] = stable_doc_id
+        chunk["metadata"]["doc_id"] = stable_doc_id
+        text_hash = _text_hash(chunk["text"])
+        candidates = existing_by_hash.get(text_hash)
+        if candidates:
+            chunk_id, old_metadata = candidates.pop(0)
+            chunk["chunk_id"] = chunk_id
+            kept_ids.add(chunk_id)
+            if old_metadata != chunk["metadata"]:
+                changed_chunks.append(chunk)
+        else:
+            # 같은 텍스트가 문서 안에 여러 번 나오면 (편집으로 문단을 복제한 경우 포함) 순번으로 구분
+            chunk_id = f"{stable_doc_id}-{text_hash[:16]}"
+            occurrence = 0
+            while chunk_id in taken_ids:
+                occurrence += 1
+                chunk_id = f"{stable_doc_id}-{text_hash[:16]}-{occurrence}"
+            taken_ids.add(chunk_id)
+            chunk["chunk_id"] = chunk_id
+            new_chunks.append(chunk)
+    removed_ids = [chunk_id for chunk_id in existing["ids"] if chunk_id not in kept_ids]
+    return {"new_chunks": new_chunks, "changed_chunks": changed_chunks, "kept_ids": kept_ids,
+            "removed_ids": removed_ids}
+
 def update_document_embeddings(doc_id: str, chunks: List[Dict[str, Any]]) -> bool:
     """
-    문서의 기존 임베딩을 삭제하고 새로운 임베딩으로 교체합니다
+    문서의 청크를 새 청크 목록으로 교체합니다 (변경된 청크만 재임베딩)
+    
+    기존 청크와 텍스트(콘텐츠 해시)가 같은 청크는 기존 청크 ID와 벡터를 그대로 유지하고
+    메타데이터만 갱신합니다. 새 텍스트는 "문서ID-콘텐츠해시" 형식의 안정적인 ID로 추가합니다.
+    임베딩은 쓰기 잠금 밖에서 계산하고, 잠금 안에서는 그 사이 문서가 바뀌지 않았는지 확인한 뒤 기록만 합니다.
+    사라진 청크는 새 청크가 기록될 때부터 삭제가 끝날 때까지 검색 결과에서 제외되므로
+    검색 중인 요청에는 문서가 비어 보이거나 이전/새 청크가 함께 보이지 않습니다.
     
     Args:
-        doc_id: 업데이트할 문서의 ID (UUID)
+        doc_id: 업데이트할 문서의 ID (UUID 또는 시스템 파일명 UUID)
         chunks: 새로운 텍스트 청크와 메타데이터 목록
                각 딕셔너리는 {"text": str, "doc_id": str, "chunk_id": str, "metadata": dict} 형식
                
     Returns:
         업데이트 성공 여부 (True/False)
     """
+    global _retiring_chunk_ids
     if not chunks:
         return False
     
     try:
-        # 벡터 데이터베이스 연결
-        collection = initialize_database()
+        tag_chunk_vendors(chunks)
+        while True:
+            # 1. 잠금 밖에서 기존 청크와 비교하고 바뀐 텍스트만 임베딩 (API 호출 동안 다른 쓰기를 막지 않음)
+            existing = _document_chunks(initialize_database(), doc_id)
+            stamp_embedding_model(chunks)
+            plan = _plan_document_update(existing, doc_id, chunks)
+            new_embeddings = embed_texts([chunk["text"] for chunk in plan["new_chunks"]]) if plan["new_chunks"] else []
+            
+            with _write_lock:
+                collection = initialize_database()
+                # 임베딩하는 동안 같은 문서가 바뀌었거나 기본 모델이 전환되었으면 잠금을 풀고 다시 분류/임베딩
+                # (이미 임베딩한 텍스트는 청크 임베딩 저장소에서 재사용)
+                model = get_primary_backend().model_name
+                if _document_chunks(collection, doc_id) != existing or \
+                        any(chunk["metadata"].get("embedding_model") != model for chunk in chunks):
+                    continue
+                new_chunks, changed_chunks = plan["new_chunks"], plan["changed_chunks"]
+                kept_ids, removed_ids = plan["kept_ids"], plan["removed_ids"]
+                generation_before = chunk_registry.generation()
+            
+                # 2. 새 청크 기록 ~ 이전 청크 삭제 사이에는 이전 청크를 검색 결과에서 제외
+                _retiring_chunk_ids = frozenset(removed_ids)
+                try:
+                    # 신규 청크 추가
+                    if new_chunks:
+                        collection.upsert(
+                            documents=[chunk["text"] for chunk in new_chunks],
+                            embeddings=new_embeddings,
+                            ids=[chunk["chunk_id"] for chunk in new_chunks],
+                            metadatas=[chunk["metadata"] for chunk in new_chunks]
+                        )
+                        _add_to_local_index(new_chunks)
+                
+                    # 텍스트가 같은 청크는 메타데이터만 갱신 (재임베딩 없음)
+                    changed_embeddings = []
+                    if changed_chunks:
+                        changed_ids = [chunk["chunk_id"] for chunk in changed_chunks]
+                        changed_metadatas = [chunk["metadata"] for chunk in changed_chunks]
+                        for target_collection in collection_manager.write_collections():
+                            target_collection.update(ids=changed_ids, metadatas=_metadatas_for(target_collection, changed_metadatas))
+                        if MMAP_INDEX.get("enabled", False) or SHARDED_COLLECTIONS.get("enabled", False):
+                            page = collection.get(ids=changed_ids, include=["embeddings"])
+                            vectors = dict(zip(page.get('ids') or [], page.get('embeddings') or []))
+                            changed_embeddings = [[float(x) for x in vectors[chunk_id]] for chunk_id in changed_ids]
+                
+                    # 사라진 청크 삭제
+                    if removed_ids:
+                        for target_collection in collection_manager.write_collections():
+                            for i in range(0, len(removed_ids), 500):
+                                target_collection.delete(ids=removed_ids[i:i + 500])
+                
+                    chunk_registry.register(new_chunks + changed_chunks)
+                    chunk_registry.unregister(removed_ids)
+                    _update_lexical_index(generation_before, added=new_chunks + changed_chunks, removed_ids=removed_ids)
+                    _update_metadata_index(generation_before, added=new_chunks + changed_chunks, removed_ids=removed_ids)
+                    _update_mmap_index(
+                        generation_before,
+                        added=new_chunks + changed_chunks,
+                        embeddings=list(new_embeddings) + changed_embeddings,
+                        removed_ids=removed_ids
+                    )
+                    _update_shard_collections(
+                        added=new_chunks + changed_chunks,
+                        embeddings=list(new_embeddings) + changed_embeddings,
+                        removed_ids=removed_ids
+                    )
+                finally:
+                    _retiring_chunk_ids = frozenset()
+                _journal_reembed_changes([chunk["chunk_id"] for chunk in new_chunks + changed_chunks] + removed_ids,
+                                         generation_before)
+            break
         
-        # 1. 기존 문서 청크 삭제
-        delete_result = delete_document(doc_id)
+        print(f"Updated document {doc_id}: 신규 {len(new_chunks)}개 임베딩, 메타데이터 갱신 {len(changed_chunks)}개, "
+              f"삭제 {len(removed_ids)}개, 유지 {len(kept_ids) - len(changed_chunks)}개")
+        return True
         
-        # 2. 새로운 청크 추가
-        # 데이터 추출
-        texts = [chunk["text"] for chunk in chunks]
-        ids = [chunk["chunk_id"] for chunk in chunks]
-        metadatas = [chunk["metadata"] for chunk in chunks]
+    except Exception as e:
+        print(f"Error updating document embeddings: {e}")
+        return False
+
+# 백그라운드 재임베딩 작업 (프로세스 내 1개)
+_reembed_lock = threading.Lock()
+_reembed_thread = None
+_reembed_status = {"state": "idle"}
+# 재임베딩 전환 전까지 이 프로세스에서 변경된 청크 (쓰기 잠금 안에서 갱신, 작업 중이 아니면 None)
+_reembed_journal = None
+
+def _journal_reembed_changes(chunk_ids: List[str], generation_before: int):
+    """청크 쓰기를 재임베딩 변경 기록에 추가합니다 (쓰기 잠금 안에서 호출)"""
+    if _reembed_journal is None:
+        return
+    _reembed_journal["ids"].update(chunk_ids)
+    _reembed_journal["writes"].append((generation_before, chunk_registry.generation()))
+
+def _reset_reembed_journal(active: bool = True):
+    """변경 기록을 비우고 현재 세대부터 다시 기록합니다 (쓰기 잠금 안에서 호출)"""
+    global _reembed_journal
+    _reembed_journal = {"ids": set(), "writes": [], "generation": chunk_registry.generation()} if active else None
+
+def _take_reembed_journal():
+    """
+    기록된 변경을 꺼내고 기록을 초기화합니다 (쓰기 잠금 안에서 호출)
+    
+    Returns:
+        (변경된 청크 ID 집합, 다른 프로세스의 변경 여부)
+        이 프로세스의 쓰기 전후 세대가 이어지지 않으면 다른 프로세스가 청크를 변경한 것으로 봅니다.
+    """
+    journal = _reembed_journal
+    expected = journal["generation"]
+    foreign = False
+    for generation_before, generation_after in journal["writes"]:
+        if generation_before != expected:
+            foreign = True
+        expected = generation_after
+    if chunk_registry.generation() != expected:
+        foreign = True
+    _reset_reembed_journal()
+    return journal["ids"], foreign
+
+def get_reembedding_status() -> Dict[str, Any]:
+    """
+    재임베딩 작업 상태
+    
+    Returns:
+        {"state"(idle / running / completed / failed), "target_backend", "target_model", "processed", "total",
+         "error", "active_backend", "active_model", "embedding_version", "configured_backend", ...}
+    """
+    status = dict(_reembed_status)
+    status.update({
+        "active_backend": collection_manager.get_primary_backend_name(),
+        "active_model": get_primary_backend().model_name,
+        "embedding_version": embedding_version(),
+        "configured_backend": EMBEDDING_BACKEND.get("primary", "openai")
+    })
+    return status
+
+def start_reembedding(backend_name: Optional[str] = None) -> Dict[str, Any]:
+    """
+    코퍼스를 다른 임베딩 모델로 다시 임베딩하는 백그라운드 작업을 시작합니다
+    
+    작업 중에도 검색/업로드는 기존 모델 컬렉션을 그대로 사용합니다. 새 모델 컬렉션(섀도 컬렉션)을
+    배치 단위로 채운 뒤, 그 사이 변경된 청크만 잠금 밖에서 임베딩하고 쓰기 잠금 안에서는 준비된 쓰기만
+    적용하여 기본 컬렉션을 한 번에 전환합니다.
+    진행 위치는 레지스트리에 저장하므로 프로세스가 재시작되어도 이어서 진행합니다.
+    
+    Args:
+        backend_name: 대상 임베딩 백엔드 이름 (기본값: EMBEDDING_BACKEND["primary"])
         
-        # 새 임베딩 추가
-        collection.add(
-            documents=texts,
-            ids=ids,
-            metadatas=metadatas
+    Returns:
+        작업 상태 (get_reembedding_status)
+    """
+    global _reembed_thread
+    target_name = backend_name or EMBEDDING_BACKEND.get("primary", "openai")
+    target = get_backend(target_name)
+    initialize_database()
+    with _reembed_lock:
+        if _reembed_thread is not None and _reembed_thread.is_alive():
+            print(f"재임베딩 작업이 이미 진행 중입니다: {_reembed_status.get('target_model')}")
+            return get_reembedding_status()
+        if target.model_name == get_primary_backend().model_name:
+            print(f"이미 '{target.model_name}' 모델을 사용 중입니다")
+            return get_reembedding_status()
+        _reembed_status.clear()
+        _reembed_status.update({
+            "state": "running",
+            "target_backend": target_name,
+            "target_model": target.model_name,
+            "processed": 0,
+            "total": 0,
+            "error": None,
+            "started_at": time.time(),
+            "finished_at": None
+        })
+        _reembed_thread = threading.Thread(
+            target=_run_reembedding, args=(target_name,), name="reembedding", daemon=True
         )
+        _reembed_thread.start()
+    return get_reembedding_status()
+
+def _run_reembedding(target_name: str):
+    """재임베딩 작업 스레드 (start_reembedding에서 시작)"""
+    target = get_backend(target_name)
+    batch_size = max(1, EMBEDDING_BACKEND.get("reembed_batch_size", 100))
+    interval = EMBEDDING_BACKEND.get("reembed_interval", 1.0)
+    try:
+        source = initialize_database()
+        shadow = collection_manager.get_collection(target)
+        version = embedding_version() + 1
         
-        print(f"Updated document {doc_id} with {len(chunks)} chunks")
-        return True
+        # 같은 대상으로 중단된 작업이면 저장된 위치부터 재개
+        cursor = 0
+        if chunk_registry.get_state(REEMBED_TARGET_KEY) == target_name:
+            cursor = int(chunk_registry.get_state(REEMBED_CURSOR_KEY, '0') or 0)
+        chunk_registry.set_state(REEMBED_TARGET_KEY, target_name)
+        _reembed_status["total"] = source.count()
+        print(f"재임베딩 시작: {get_primary_backend().model_name} -> {target.model_name} ({_reembed_status['total']}개 청크, 위치 {cursor}부터)")
+        
+        # 1. 기존 컬렉션을 페이지 단위로 새 모델 컬렉션에 복사 (검색은 기존 컬렉션 사용)
+        while True:
+            page = source.get(include=["documents", "metadatas"], limit=batch_size, offset=cursor)
+            ids = page.get('ids') or []
+            if not ids:
+                break
+            texts = page.get('documents') or [''] * len(ids)
+            shadow.upsert(
+                ids=ids,
+                documents=texts,
+                embeddings=embed_texts(texts, target),
+                metadatas=[_stamp_metadata(metadata or {}, target, version)
+                           for metadata in (page.get('metadatas') or [None] * len(ids))]
+            )
+            cursor += len(ids)
+            chunk_registry.set_state(REEMBED_CURSOR_KEY, str(cursor))
+            _reembed_status["processed"] = cursor
+            if interval:
+                time.sleep(interval)
         
+        # 2. 변경 기록을 시작한 뒤 복사 중의 변경을 전체 비교로 반영 (잠금 없음)
+        with _write_lock:
+            _reset_reembed_journal()
+        _reconcile_shadow(source, shadow, target, version)
+        
+        # 3. 기록된 변경만 잠금 밖에서 읽고 임베딩한 뒤, 잠금 안에서는 준비된 쓰기만 적용하고
+        #    그 사이 새 변경이 없으면 전환 (다른 프로세스의 변경이 있으면 잠금 밖에서 전체 비교)
+        prepared = None
+        while True:
+            with _write_lock:
+                changed_ids, foreign = _take_reembed_journal()
+                if prepared is not None:
+                    _apply_shadow_rows(shadow, prepared, skip_ids=changed_ids)
+                if not changed_ids and not foreign:
+                    # 새 컬렉션에서 마이그레이션이 다시 실행되지 않도록 스키마 버전 복사
+                    shadow.modify(metadata={**(shadow.metadata or {}), SCHEMA_VERSION_KEY: schema_version(source)})
+                    chunk_registry.set_state(EMBEDDING_VERSION_KEY, str(version))
+                    chunk_registry.set_state(ACTIVE_BACKEND_KEY, target_name)
+                    chunk_registry.set_state(REEMBED_TARGET_KEY, '')
+                    chunk_registry.set_state(REEMBED_CURSOR_KEY, '0')
+                    collection_manager.switch_primary(target_name)
+                    # 검색 결과 캐시 / 인덱스가 새 모델 기준으로 다시 만들어지도록 세대 증가
+                    chunk_registry.bump_generation()
+                    _reset_reembed_journal(active=False)
+                    break
+            if foreign:
+                _reconcile_shadow(source, shadow, target, version)
+                prepared = None
+            else:
+                prepared = _prepare_shadow_rows(source, target, version, changed_ids)
+        
+        _reembed_status.update({"state": "completed", "processed": shadow.count(), "finished_at": time.time()})
+        print(f"재임베딩 완료: 기본 임베딩 모델이 '{target.model_name}'(버전 {version})로 전환되었습니다")
     except Exception as e:
-        print(f"Error updating document embeddings: {e}")
+        with _write_lock:
+            _reset_reembed_journal(active=False)
+        _reembed_status.update({"state": "failed", "error": str(e), "finished_at": time.time()})
+        print(f"재임베딩 중 오류 (다음 시작 시 이어서 진행): {str(e)}")
+
+def _prepare_shadow_rows(source, target: EmbeddingBackend, version: int, chunk_ids: Set[str]) -> Dict[str, Any]:
+    """
+    변경된 청크의 현재 내용을 읽고 대상 모델로 임베딩합니다 (쓰기 잠금 밖에서 호출)
+    
+    Returns:
+        {"ids", "documents", "embeddings", "metadatas", "deleted_ids"(기존 컬렉션에서 삭제된 청크)}
+    """
+    rows = {"ids": [], "documents": [], "embeddings": [], "metadatas": [], "deleted_ids": []}
+    chunk_ids = sorted(chunk_ids)
+    for i in range(0, len(chunk_ids), 500):
+        batch = chunk_ids[i:i + 500]
+        page = source.get(ids=batch, include=["documents", "metadatas"])
+        ids = page.get('ids') or []
+        texts = page.get('documents') or [''] * len(ids)
+        rows["ids"].extend(ids)
+        rows["documents"].extend(texts)
+        rows["metadatas"].extend(_stamp_metadata(metadata or {}, target, version)
+                                 for metadata in (page.get('metadatas') or [None] * len(ids)))
+        if ids:
+            rows["embeddings"].extend(embed_texts(texts, target))
+        found = set(ids)
+        rows["deleted_ids"].extend(chunk_id for chunk_id in batch if chunk_id not in found)
+    return rows
+
+def _apply_shadow_rows(shadow, rows: Dict[str, Any], skip_ids: Set[str]):
+    """준비된 변경을 섀도 컬렉션에 기록합니다 (skip_ids: 준비 후 다시 변경되어 다음에 준비할 청크)"""
+    keep = [i for i, chunk_id in enumerate(rows["ids"]) if chunk_id not in skip_ids]
+    for start in range(0, len(keep), 500):
+        indices = keep[start:start + 500]
+        shadow.upsert(
+            ids=[rows["ids"][i] for i in indices],
+            documents=[rows["documents"][i] for i in indices],
+            embeddings=[rows["embeddings"][i] for i in indices],
+            metadatas=[rows["metadatas"][i] for i in indices]
+        )
+    deleted_ids = [chunk_id for chunk_id in rows["deleted_ids"] if chunk_id not in skip_ids]
+    for start in range(0, len(deleted_ids), 500):
+        shadow.delete(ids=deleted_ids[start:start + 500])
+
+def _reconcile_shadow(source, shadow, target: EmbeddingBackend, version: int, page_size: int = 1000) -> int:
+    """
+    섀도 컬렉션을 기존 컬렉션과 같게 맞춥니다 (텍스트가 바뀐 청크만 재임베딩)
+    
+    Returns:
+        추가/변경/삭제한 청크 수
+    """
+    def rows(collection):
+        result = {}
+        offset = 0
+        while True:
+            page = collection.get(include=["documents", "metadatas"], limit=page_size, offset=offset)
+            ids = page.get('ids') or []
+            if not ids:
+                break
+            for chunk_id, text, metadata in zip(ids, page.get('documents') or [''] * len(ids),
+                                                page.get('metadatas') or [None] * len(ids)):
+                result[chunk_id] = (_text_hash(text), metadata or {})
+            offset += len(ids)
+        return result
+    
+    expected = {
+        chunk_id: (text_hash, _stamp_metadata(metadata, target, version))
+        for chunk_id, (text_hash, metadata) in rows(source).items()
+    }
+    current = rows(shadow)
+    reembed_ids = [chunk_id for chunk_id, (text_hash, _) in expected.items()
+                   if chunk_id not in current or current[chunk_id][0] != text_hash]
+    metadata_ids = [chunk_id for chunk_id, (text_hash, metadata) in expected.items()
+                    if chunk_id in current and current[chunk_id][0] == text_hash and current[chunk_id][1] != metadata]
+    stale_ids = [chunk_id for chunk_id in current if chunk_id not in expected]
+    
+    for i in range(0, len(reembed_ids), 500):
+        page = source.get(ids=reembed_ids[i:i + 500], include=["documents"])
+        ids = page.get('ids') or []
+        if ids:
+            texts = page.get('documents') or [''] * len(ids)
+            shadow.upsert(ids=ids, documents=texts, embeddings=embed_texts(texts, target),
+                          metadatas=[expected[chunk_id][1] for chunk_id in ids])
+    for i in range(0, len(metadata_ids), 500):
+        ids = metadata_ids[i:i + 500]
+        shadow.update(ids=ids, metadatas=[expected[chunk_id][1] for chunk_id in ids])
+    for i in range(0, len(stale_ids), 500):
+        shadow.delete(ids=stale_ids[i:i + 500])
+    
+    changed = len(reembed_ids) + len(metadata_ids) + len(stale_ids)
+    if changed:
+        print(f"재임베딩 변경 반영: 재임베딩 {len(reembed_ids)}개, 메타데이터 {len(metadata_ids)}개, 삭제 {len(stale_ids)}개")
+    return changed
+
+# 벡터 DB 유지보수 (동시에 1개만 실행)
+_maintenance_lock = threading.Lock()
+_maintenance_thread = None
+_last_maintenance_report = None
+
+def _query_latency(collection, probes: int) -> Dict[str, float]:
+    """저장된 임베딩 probes개를 질문으로 사용한 검색 지연 시간 (ms, 임베딩 API 호출 없음)"""
+    if probes <= 0 or collection.count() == 0:
+        return {}
+    vectors = collection.get(include=["embeddings"], limit=probes).get('embeddings')
+    if vectors is None or len(vectors) == 0:
+        return {}
+    timings = []
+    for vector in vectors:
+        started = time.perf_counter()
+        collection.query(query_embeddings=[[float(x) for x in vector]], n_results=5, include=["distances"])
+        timings.append((time.perf_counter() - started) * 1000)
+    timings.sort()
+    return {
+        "median": round(timings[len(timings) // 2], 2),
+        "p95": round(timings[min(len(timings) - 1, int(len(timings) * 0.95))], 2),
+        "probes": len(timings)
+    }
+
+def storage_report(probes: Optional[int] = None) -> Dict[str, Any]:
+    """
+    벡터 DB 저장 공간과 검색 지연 시간 보고서
+    
+    Returns:
+        {"total_bytes", "sqlite_bytes", "layout_supported"(chromadb 내부 구조 조회 가능 여부),
+         "log_entries"(임베딩 로그 행 수), "segments"(컬렉션별 HNSW 삭제 비율, 조회할 수 없으면 빈 목록),
+         "query_latency_ms": {"median", "p95", "probes"}}
+    """
+    collection = initialize_database()
+    probes = MAINTENANCE.get("latency_probes", 20) if probes is None else probes
+    return {
+        "total_bytes": directory_size(CHROMA_DB_DIRECTORY),
+        "sqlite_bytes": directory_size(os.path.join(CHROMA_DB_DIRECTORY, CHROMA_SQLITE_FILENAME)),
+        "layout_supported": chroma_layout_supported(),
+        "log_entries": embeddings_log_size(CHROMA_DB_DIRECTORY),
+        "segments": vector_segments(CHROMA_DB_DIRECTORY),
+        "query_latency_ms": _query_latency(collection, probes)
+    }
+
+def _all_collection_names(chroma_client) -> List[str]:
+    # chromadb 0.6부터 list_collections는 이름 목록을 반환
+    return [getattr(collection, 'name', collection) for collection in chroma_client.list_collections()]
+
+def _collection_names(chroma_client) -> List[str]:
+    """재구축 대상이 될 수 있는 컬렉션 이름 (재구축/복원 중 임시 컬렉션 제외)"""
+    return [name for name in _all_collection_names(chroma_client) if not name.endswith(("__rebuild", "__restore", "__old"))]
+
+def _leftover_collections(chroma_client) -> List[str]:
+    """재구축/복원 후 삭제되지 않고 남은 이전/임시 컬렉션 이름"""
+    return [name for name in _all_collection_names(chroma_client) if name.endswith(("__rebuild", "__restore", "__old"))]
+
+def _backend_for_model(model_name: Optional[str]) -> Optional[EmbeddingBackend]:
+    """컬렉션에 고정된 모델의 임베딩 백엔드 (알 수 없는 모델이면 None)"""
+    for name in dict.fromkeys([collection_manager.get_primary_backend_name(), EMBEDDING_BACKEND.get("primary", "openai"), "local", "openai"]):
+        try:
+            backend = get_backend(name)
+        except Exception:
+            continue
+        if backend.model_name == model_name:
+            return backend
+    return None
+
+def _rebuild_collection(chroma_client, name: str, page_size: int) -> Optional[Tuple[str, int]]:
+    """
+    컬렉션을 새 컬렉션에 복사한 뒤 이름을 바꿔 교체합니다 (HNSW 인덱스의 삭제 항목 제거, 쓰기 잠금 상태에서 호출)
+    
+    Returns:
+        (교체되어 삭제할 이전 컬렉션 이름, 교체 세대) (재구축하지 않았으면 None)
+    """
+    backend = _backend_for_model(_pinned_model(chroma_client.get_collection(name=name)))
+    if backend is None:
+        print(f"컬렉션 '{name}'의 임베딩 모델을 알 수 없어 재구축하지 않습니다")
+        return None
+    source = _open_pinned_collection(chroma_client, backend, name)
+    rebuild_name, old_name = f"{name}__rebuild", f"{name}__old"
+    for leftover in (rebuild_name, old_name):
+        try:
+            chroma_client.delete_collection(leftover)
+        except Exception:
+            pass
+    target = chroma_client.create_collection(name=rebuild_name, embedding_function=backend, metadata=source.metadata)
+    offset = 0
+    while True:
+        page = source.get(include=["embeddings", "documents", "metadatas"], limit=page_size, offset=offset)
+        ids = page.get('ids') or []
+        if not ids:
+            break
+        target.add(
+            ids=ids,
+            documents=page.get('documents'),
+            embeddings=[[float(x) for x in vector] for vector in page['embeddings']],
+            metadatas=page.get('metadatas')
+        )
+        offset += len(ids)
+    if target.count() != source.count():
+        chroma_client.delete_collection(rebuild_name)
+        raise RuntimeError(f"컬렉션 '{name}' 재구축 중 청크 수가 다릅니다 ({target.count()} != {source.count()})")
+    # 이전 컬렉션은 교체 전에 시작한 검색이 끝난 뒤 삭제 (run_maintenance)
+    return old_name, collection_manager.replace_collection(source, target, name, old_name)
+
+def run_maintenance(force_rebuild: bool = False, dry_run: bool = False) -> Dict[str, Any]:
+    """
+    벡터 DB 유지보수를 실행하고 전후 크기와 검색 지연 시간 보고서를 반환합니다
+    
+    1. 청크 레지스트리의 청크 수가 벡터 DB와 다르면 레지스트리 재구축 (남은 삭제 항목 정리)
+    2. HNSW 삭제 항목 비율이 hnsw_rebuild_deleted_ratio 이상인 컬렉션 재구축 (공개 API로 복사 후 이름 교체)
+    3. 메모리 매핑 인덱스의 삭제 표시 압축
+    4. 청크 레지스트리 / 임베딩 캐시 VACUUM
+    
+    ChromaDB 내부 파일(chroma.sqlite3, 세그먼트 디렉토리)은 수정하지 않습니다. 삭제 비율은 내부 구조를 아는
+    chromadb 버전에서만 계산하며, 그 외 버전에서는 force_rebuild일 때만 재구축합니다. 임베딩 로그 정리와
+    chroma.sqlite3 VACUUM은 보고서의 offline_vacuum 명령으로 앱을 중지한 뒤 실행합니다.
+    
+    실행 중 쓰기(업로드/삭제)는 대기하고 검색은 계속 처리합니다.
+    
+    Args:
+        force_rebuild: 삭제 비율과 관계없이 모든 컬렉션 재구축
+        dry_run: 변경 없이 수행할 작업만 보고
+        
+    Returns:
+        {"before", "after", "actions", "dry_run", "started_at", "elapsed_seconds",
+         "offline_vacuum"(chroma.sqlite3 정리 명령)}
+    """
+    global _last_maintenance_report
+    if not _maintenance_lock.acquire(blocking=False):
+        raise RuntimeError("벡터 DB 유지보수가 이미 실행 중입니다")
+    try:
+        started = time.monotonic()
+        collection = initialize_database()
+        report = {
+            "dry_run": dry_run,
+            "started_at": time.strftime('%Y-%m-%d %H:%M:%S'),
+            "before": storage_report(),
+            "actions": [],
+            "offline_vacuum": CHROMA_VACUUM_COMMAND.format(path=CHROMA_DB_DIRECTORY)
+        }
+        actions = report["actions"]
+        threshold = MAINTENANCE.get("hnsw_rebuild_deleted_ratio", 0.2)
+        
+        with _write_lock:
+            # 1. 청크 레지스트리 정리
+            registry_count, chunk_count = chunk_registry.stats()["chunk_count"], collection.count()
+            if registry_count != chunk_count:
+                actions.append(f"청크 레지스트리 재구축 ({registry_count} -> {chunk_count}개)")
+                if not dry_run:
+                    chunk_registry.rebuild(collection)
+            
+            # 2. HNSW 재구축 (재임베딩 작업이 섀도 컬렉션을 채우는 중이면 생략)
+            if force_rebuild:
+                rebuild_targets = [(name, "강제") for name in _collection_names(collection_manager.get_client())]
+            else:
+                rebuild_targets = [
+                    (segment["collection"], f"삭제 비율 {segment['deleted_ratio']:.1%}")
+                    for segment in report["before"]["segments"]
+                    if segment["elements"] and segment["deleted_ratio"] >= threshold
+                ]
+                if not report["before"]["layout_supported"]:
+                    actions.append("설치된 chromadb 버전의 저장 구조를 지원하지 않아 삭제 비율 기반 재구축 생략 "
+                                   "(--rebuild로 강제 재구축 가능)")
+            if rebuild_targets and _reembed_status.get("state") == "running":
+                actions.append("재임베딩 작업 중이므로 HNSW 재구축 생략")
+                rebuild_targets = []
+            # 이전 실행에서 검색이 끝나지 않아 남겨 둔 컬렉션 삭제
+            for leftover in _leftover_collections(collection_manager.get_client()):
+                actions.append(f"이전 재구축에서 남은 컬렉션 삭제: {leftover}")
+                if not dry_run:
+                    collection_manager.get_client().delete_collection(leftover)
+            old_names = []
+            swap_generation = None
+            for name, reason in rebuild_targets:
+                actions.append(f"HNSW 재구축: {name} ({reason})")
+                if not dry_run:
+                    replaced = _rebuild_collection(collection_manager.get_client(), name,
+                                                   MAINTENANCE.get("page_size", 1000))
+                    if replaced:
+                        old_names.append(replaced[0])
+                        swap_generation = replaced[1]
+            if old_names:
+                collection = initialize_database()
+            
+            # 3. 메모리 매핑 인덱스 압축
+            if MMAP_INDEX.get("enabled", False) and MmapVectorIndex.available() and mmap_index.deleted_ratio() > 0:
+                actions.append(f"메모리 매핑 인덱스 압축 (삭제 표시 {mmap_index.deleted_ratio():.1%})")
+                if not dry_run:
+                    with _mmap_export_lock:
+                        mmap_index.export(collection, _pinned_model(collection) or get_primary_backend().model_name,
+                                          chunk_registry.generation())
+            
+            # 4. 이 앱이 관리하는 SQLite 파일 VACUUM (chroma.sqlite3는 offline_vacuum 명령으로)
+            if MAINTENANCE.get("vacuum", True) and not dry_run:
+                targets = [
+                    ("청크 레지스트리", CHUNK_REGISTRY_FILE, chunk_registry.vacuum),
+                    ("임베딩 캐시", chunk_embedding_store.db_path, None)
+                ]
+                for label, path, vacuum in targets:
+                    if not os.path.exists(path):
+                        continue
+                    try:
+                        before = os.path.getsize(path)
+                        if vacuum is not None:
+                            vacuum()
+                        else:
+                            vacuum_sqlite(path)
+                        actions.append(f"{label} VACUUM ({before / 1048576:.1f}MB -> {os.path.getsize(path) / 1048576:.1f}MB)")
+                    except Exception as e:
+                        actions.append(f"{label} VACUUM 실패: {str(e)}")
+        
+        # 교체 전 컬렉션으로 검색 중인 요청이 끝난 뒤 삭제 (쓰기 잠금 밖에서 대기, 시간 초과 시 다음 실행에서 삭제)
+        if old_names:
+            if collection_manager.wait_for_readers(swap_generation, MAINTENANCE.get("reader_timeout", 60)):
+                for old_name in old_names:
+                    collection_manager.get_client().delete_collection(old_name)
+            else:
+                actions.append(f"검색이 끝나지 않아 이전 컬렉션 {len(old_names)}개 삭제를 다음 실행으로 미룸")
+        
+        report["after"] = storage_report()
+        report["elapsed_seconds"] = round(time.monotonic() - started, 2)
+        _last_maintenance_report = report
+        print(f"벡터 DB 유지보수 완료 ({report['elapsed_seconds']}초)")
+        print_report(report)
+        return report
+    finally:
+        _maintenance_lock.release()
+
+def get_last_maintenance_report() -> Optional[Dict[str, Any]]:
+    """이 프로세스에서 마지막으로 실행한 유지보수 보고서 (없으면 None)"""
+    return _last_maintenance_report
+
+def start_maintenance_scheduler() -> bool:
+    """
+    MAINTENANCE["interval_hours"]마다 유지보수를 실행하는 백그라운드 스레드를 시작합니다 (프로세스당 1개)
+    
+    Returns:
+        스케줄러 실행 여부
+    """
+    global _maintenance_thread
+    interval = MAINTENANCE.get("interval_hours", 24) * 3600
+    if not MAINTENANCE.get("enabled", True) or interval <= 0:
         return False
+    if _maintenance_thread is not None and _maintenance_thread.is_alive():
+        return True
+    
+    def loop():
+        while True:
+            time.sleep(interval)
+            try:
+                run_maintenance()
+            except Exception as e:
+                print(f"벡터 DB 유지보수 중 오류: {str(e)}")
+    
+    _maintenance_thread = threading.Thread(target=loop, name="vector-db-maintenance", daemon=True)
+    _maintenance_thread.start()
+    print(f"벡터 DB 유지보수 스케줄러 시작: {MAINTENANCE.get('interval_hours', 24)}시간마다 실행")
+    return True
 
 def reset_database():
     """Reset the database by removing the directory"""
+    # 열린 클라이언트를 먼저 정리 (다음 요청 시 새로 연결)
+    collection_manager.shutdown()
+    chunk_registry.close()
     if os.path.exists(CHROMA_DB_DIRECTORY):
         shutil.rmtree(CHROMA_DB_DIRECTORY)
         print(f"Removed database directory: {CHROMA_DB_DIRECTORY}")
+
+def resolve_snapshot_path(name: str) -> str:
+    """스냅샷 디렉토리 안의 경로로 제한 (API에서 전달된 이름의 경로 조작 방지)"""
+    directory = os.path.abspath(SNAPSHOT.get("directory", "./snapshots"))
+    path = os.path.abspath(os.path.join(directory, os.path.basename(name)))
+    if not path.endswith('.npz'):
+        path += '.npz'
+    return path
+
+def list_database_snapshots() -> List[Dict[str, Any]]:
+    """저장된 스냅샷 목록 (최신순)"""
+    return list_snapshots(SNAPSHOT.get("directory", "./snapshots"))
+
+def export_snapshot(output_path: Optional[str] = None) -> Dict[str, Any]:
+    """
+    현재 벡터 DB를 임베딩을 포함한 스냅샷 파일로 저장합니다
+    
+    Args:
+        output_path: 저장할 .npz 경로 (없으면 스냅샷 디렉토리에 시각 기반 이름으로 저장)
+        
+    Returns:
+        manifest 딕셔너리 + 저장 경로(path) / 파일명(name)
+    """
+    collection = initialize_database()
+    path = output_path or resolve_snapshot_path(f"snapshot_{time.strftime('%Y%m%d_%H%M%S')}.npz")
+    page_size = SNAPSHOT.get("page_size", 1000)
+    
+    def pages():
+        offset = 0
+        while True:
+            page = collection.get(
+                include=["embeddings", "documents", "metadatas"], limit=page_size, offset=offset
+            )
+            if not page.get('ids'):
+                break
+            yield page
+            offset += len(page['ids'])
+    
+    # 내보내는 동안 다른 쓰기가 끼어들지 않도록 잠금
+    with _write_lock:
+        manifest = write_snapshot(
+            path, pages(), collection.count(), get_primary_backend().model_name, schema_version(collection),
+            parents=chunk_registry.all_parent_sections()
+        )
+    return {**manifest, "path": path, "name": os.path.basename(path)}
+
+def restore_snapshot(path: str) -> Dict[str, Any]:
+    """
+    스냅샷 파일로 벡터 DB를 교체합니다 (저장된 임베딩을 그대로 적재, 임베딩 API 호출 없음)
+    
+    스냅샷을 새 컬렉션에 적재한 뒤 기본 컬렉션과 이름을 바꿔 교체하므로 복원하는 동안에도 검색은
+    기존 컬렉션으로 처리됩니다. 이전 컬렉션과 기본 컬렉션에서 파생된 로컬 임베딩 인덱스 / 샤드 컬렉션은
+    교체 전에 시작한 검색이 끝난 뒤 삭제하며, 파생 컬렉션은 다음 사용 시 다시 구축됩니다.
+    
+    Args:
+        path: 복원할 .npz 경로
+        
+    Returns:
+        {"restored_chunks", "model", "schema_version", "elapsed_seconds"}
+        
+    Raises:
+        EmbeddingModelMismatchError: 스냅샷의 임베딩 모델이 현재 기본 모델과 다른 경우
+    """
+    started = time.monotonic()
+    snapshot = read_snapshot(path)
+    manifest = snapshot["manifest"]
+    backend = get_primary_backend()
+    if manifest["model"] != backend.model_name:
+        raise EmbeddingModelMismatchError(
+            f"스냅샷은 '{manifest['model']}' 모델로 만들어져 '{backend.model_name}' 컬렉션에 복원할 수 없습니다"
+        )
+    
+    ids, documents, metadatas = snapshot["ids"], snapshot["documents"], snapshot["metadatas"]
+    embeddings = snapshot["embeddings"]
+    page_size = SNAPSHOT.get("page_size", 1000)
+    with _write_lock:
+        collection = initialize_database()
+        chroma_client = collection_manager.get_client()
+        name = collection.name
+        restore_name, old_name = f"{name}__restore", f"{name}__old"
+        for leftover in (restore_name, old_name):
+            try:
+                chroma_client.delete_collection(leftover)
+            except Exception:
+                pass
+        # 마이그레이션 없이 스냅샷 스키마 버전을 그대로 기록한 새 컬렉션에 적재
+        target = chroma_client.create_collection(
+            name=restore_name,
+            embedding_function=backend,
+            metadata={"embedding_model": backend.model_name, SCHEMA_VERSION_KEY: manifest["schema_version"]}
+        )
+        for i in range(0, len(ids), page_size):
+            page_vectors = embeddings[i:i + page_size].tolist()
+            target.add(
+                ids=ids[i:i + page_size],
+                documents=documents[i:i + page_size],
+                embeddings=page_vectors,
+                metadatas=metadatas[i:i + page_size]
+            )
+            # 같은 텍스트를 다시 업로드할 때 재임베딩하지 않도록 청크 임베딩 저장소에도 기록
+            chunk_embedding_store.put_many(backend.model_name, {
+                content_hash(backend.model_name, text): vector
+                for text, vector in zip(documents[i:i + page_size], page_vectors)
+            })
+            print(f"스냅샷 복원 진행: {min(i + page_size, len(ids))}/{len(ids)} 청크")
+        if target.count() != len(ids):
+            chroma_client.delete_collection(restore_name)
+            raise RuntimeError(f"스냅샷 복원 중 청크 수가 다릅니다 ({target.count()} != {len(ids)})")
+        
+        # 기본 컬렉션 교체 후 남은 마이그레이션 실행과 청크 레지스트리 재구축
+        swap_generation = collection_manager.replace_collection(collection, target, name, old_name)
+        collection = initialize_database()
+        run_migrations(chroma_client, collection)
+        # 부모-자식 청크의 부모 섹션 본문 (벡터 DB가 아닌 레지스트리에 저장, 재구축 시 자식 없는 부모 정리)
+        chunk_registry.put_parent_sections(snapshot["parents"])
+        chunk_registry.rebuild(collection)
+    
+    # 교체 전 컬렉션으로 검색 중인 요청이 끝난 뒤 이전 컬렉션과 파생 컬렉션 삭제 (쓰기 잠금 밖에서 대기)
+    readers_done = collection_manager.wait_for_readers(swap_generation, MAINTENANCE.get("reader_timeout", 60))
+    if not readers_done:
+        print("검색이 끝나지 않아 이전 컬렉션 삭제를 다음 유지보수로 미룹니다")
+    with _write_lock:
+        stale_names = [old_name] if readers_done else []
+        stale_names += [shard_collection_name(shard) for shard in shard_names()]
+        if local_index_enabled():
+            stale_names.append(collection_name_for(local_backend))
+        for stale_name in stale_names:
+            try:
+                chroma_client.delete_collection(stale_name)
+            except Exception:
+                pass
+        collection_manager.refresh_collections()
+    
+    elapsed = time.monotonic() - started
+    print(f"스냅샷 복원 완료: {len(ids)}개 청크 ({elapsed:.1f}초)")
+    return {
+        "restored_chunks": len(ids),
+        "model": manifest["model"],
+        "schema_version": manifest["schema_version"],
+        "elapsed_seconds": round(elapsed, 2)
+    }
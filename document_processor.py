@@ -26,6 +26,15 @@ try:
 except ImportError:
     pd = None
 
+from config import PARENT_CHILD_CHUNKING
+from context_builder import overlap_length
+
+# 자식 청크 메타데이터 키 (검색 결과를 부모 섹션으로 바꿀 때 제거)
+CHILD_METADATA_KEYS = ("parent_id", "child_index")
+
+# 업무 안내 가이드 행에서 자식 청크로 나눌 필드
+GUIDE_CHILD_FIELDS = ["질문 예시", "요약 응답", "상세 안내", "키워드"]
+
 def process_document(file_path: str) -> List[Dict[str, Any]]:
     """
     Process a document file and extract text chunks with metadata
@@ -108,6 +117,9 @@ def process_document(file_path: str) -> List[Dict[str, Any]]:
             "metadata": metadata
         })
     
+    if PARENT_CHILD_CHUNKING.get("enabled", False):
+        chunks = make_child_chunks(chunks)
+    
     return chunks
 
 def extract_text_from_pdf(file_path: str) -> List[str]:
@@ -437,6 +449,9 @@ def process_text(text: str, doc_id: str, filename: str, file_type: str = "txt",
             "metadata": metadata
         })
     
+    if PARENT_CHILD_CHUNKING.get("enabled", False):
+        chunks = make_child_chunks(chunks)
+    
     return chunks
 
 def chunk_text(text: str, chunk_size: int = 500, overlap: int = 100) -> List[str]:
@@ -482,3 +497,82 @@ def chunk_text(text: str, chunk_size: int = 500, overlap: int = 100) -> List[str
         start = end - overlap  # Create overlap with the next chunk
     
     return chunks
+
+def split_sentences(text: str, max_size: int = 200, min_size: int = 40) -> List[str]:
+    """
+    문장 경계에서 text를 max_size 글자 이하의 겹치지 않는 조각으로 나눕니다
+    
+    한 문장이 max_size보다 길면 공백 위치에서 자르고, min_size보다 짧은 마지막 조각은 앞 조각에 합칩니다.
+    """
+    pieces = []
+    current = ""
+    for sentence in re.split(r'(?<=[.!?])\s+', re.sub(r'\s+', ' ', text).strip()):
+        while len(sentence) > max_size:
+            cut = sentence.rfind(' ', max_size // 2, max_size)
+            cut = cut if cut > 0 else max_size
+            if current:
+                pieces.append(current)
+                current = ""
+            pieces.append(sentence[:cut].strip())
+            sentence = sentence[cut:].strip()
+        if current and len(current) + 1 + len(sentence) > max_size:
+            pieces.append(current)
+            current = sentence
+        else:
+            current = f"{current} {sentence}".strip()
+    if current:
+        if pieces and len(current) < min_size:
+            pieces[-1] = f"{pieces[-1]} {current}"
+        else:
+            pieces.append(current)
+    return [piece for piece in pieces if piece]
+
+def make_child_chunks(chunks: List[Dict[str, Any]], child_size: Optional[int] = None,
+                      min_child_size: Optional[int] = None) -> List[Dict[str, Any]]:
+    """
+    부모 청크(chunk_text 결과)를 검색용 자식 청크로 나눕니다
+    
+    일반 문서의 자식은 앞 청크와 겹치는 부분(chunk_text 오버랩)을 뺀 본문을 문장 단위로 묶은 것이므로
+    같은 글자를 두 번 임베딩하지 않고, 업무 안내 가이드 행은 필드(질문 예시 / 요약 응답 / 상세 안내 / 키워드)별로
+    나눕니다. 자식 메타데이터에는 부모 청크 ID(parent_id)와 순번(child_index)만 기록하고, 부모 본문은
+    자식 청크의 parent_text 항목(메타데이터 아님)으로 넘겨 청크 레지스트리에 부모별로 한 번만 저장합니다.
+    검색 후에는 parent_id로 부모 섹션을 찾아 바꿉니다. 나눌 필요가 없는 짧은 청크는 그대로 둡니다.
+    
+    Args:
+        chunks: {"doc_id", "chunk_id", "text", "metadata"} 부모 청크 목록 (문서 내 순서)
+        child_size: 자식 청크 최대 글자 수 (기본값: PARENT_CHILD_CHUNKING 설정)
+        min_child_size: 마지막 자식의 최소 글자 수 (기본값: PARENT_CHILD_CHUNKING 설정)
+        
+    Returns:
+        자식 청크 목록 (나눈 청크는 {"doc_id", "chunk_id", "text", "metadata", "parent_text"})
+    """
+    child_size = child_size or PARENT_CHILD_CHUNKING.get("child_size", 200)
+    min_child_size = min_child_size or PARENT_CHILD_CHUNKING.get("min_child_size", 40)
+    children = []
+    previous = None
+    for chunk in chunks:
+        text, metadata = chunk["text"], chunk["metadata"]
+        overlap = 0
+        if metadata.get("content_type") == "procedure_guide":
+            task = metadata.get("업무 유형", "")
+            pieces = [f"{task} {field}: {metadata[field]}".strip()
+                      for field in GUIDE_CHILD_FIELDS if metadata.get(field)]
+            pieces = pieces or split_sentences(text, child_size, min_child_size)
+        else:
+            if previous is not None and previous["doc_id"] == chunk["doc_id"]:
+                overlap = overlap_length(previous["text"], text)
+            pieces = split_sentences(text[overlap:], child_size, min_child_size)
+        previous = chunk
+        
+        if not overlap and len(pieces) <= 1:
+            children.append(chunk)
+            continue
+        for j, piece in enumerate(pieces):
+            children.append({
+                "doc_id": chunk["doc_id"],
+                "chunk_id": f"{chunk['chunk_id']}-c{j}",
+                "text": piece,
+                "metadata": {**metadata, "parent_id": chunk["chunk_id"], "child_index": j},
+                "parent_text": text
+            })
+    return children
@@ -0,0 +1,118 @@
+"""
+임베딩 백엔드 모듈
+- openai: OpenAI 임베딩 API (text-embedding-ada-002, "openai:<모델명>"으로 다른 모델 지정)
+- local: 네트워크/GPU 없이 동작하는 결정적 로컬 임베딩 (한글 문자 n-gram 해싱)
+
+각 백엔드는 model_name으로 식별되며, 벡터 DB 컬렉션은 하나의 model_name에 고정됩니다.
+"""
+
+import os
+import re
+import math
+import hashlib
+from abc import ABC, abstractmethod
+from typing import List, Sequence, Dict
+
+
+class EmbeddingBackend(ABC):
+    """임베딩 백엔드 기본 클래스 (ChromaDB embedding_function으로도 사용 가능)"""
+
+    # 벡터 DB 컬렉션/캐시 키에 사용되는 모델 식별자
+    model_name = ""
+    # 네트워크 호출 필요 여부
+    requires_network = True
+
+    def __call__(self, input: Sequence[str]) -> List[List[float]]:
+        return self.embed(list(input))
+
+    @abstractmethod
+    def embed(self, texts: List[str]) -> List[List[float]]:
+        """텍스트 목록의 임베딩 벡터 목록 (texts와 같은 순서)"""
+
+
+class OpenAIEmbeddingBackend(EmbeddingBackend):
+    """OpenAI 임베딩 API 백엔드"""
+
+    requires_network = True
+
+    def __init__(self, api_key: str = None, model_name: str = "text-embedding-ada-002"):
+        # 로컬 백엔드만 사용하는 모듈(재순위화 등)이 chromadb 없이 임포트되도록 사용 시점에 임포트
+        from chromadb.utils.embedding_functions import OpenAIEmbeddingFunction
+        self.model_name = model_name
+        self._function = OpenAIEmbeddingFunction(
+            api_key=api_key if api_key is not None else os.getenv("OPENAI_API_KEY", ""),
+            model_name=model_name
+        )
+
+    def embed(self, texts: List[str]) -> List[List[float]]:
+        return [[float(x) for x in vector] for vector in self._function(texts)]
+
+
+class LocalHashEmbeddingBackend(EmbeddingBackend):
+    """
+    한글 문자 n-gram 해싱 임베딩 (CPU 전용, 결정적)
+
+    공백을 정리한 텍스트에서 1~3글자 n-gram과 단어 토큰을 추출하여
+    고정 차원 벡터에 부호 해싱(signed hashing)으로 누적한 뒤 L2 정규화합니다.
+    """
+
+    requires_network = False
+
+    def __init__(self, dimension: int = 512, ngram_range: tuple = (1, 3)):
+        self.dimension = dimension
+        self.ngram_range = ngram_range
+        self.model_name = f"local-char-ngram-{ngram_range[0]}-{ngram_range[1]}-d{dimension}"
+
+    def _features(self, text: str) -> Dict[str, float]:
+        text = re.sub(r'\s+', ' ', (text or '').lower()).strip()
+        features = {}
+        min_n, max_n = self.ngram_range
+        for n in range(min_n, max_n + 1):
+            # 긴 n-gram일수록 더 구체적인 신호이므로 가중치를 높임
+            weight = float(n)
+            for i in range(len(text) - n + 1):
+                gram = text[i:i + n]
+                if gram.strip():
+                    key = f"c{n}:{gram}"
+                    features[key] = features.get(key, 0.0) + weight
+        # 단어 단위 토큰 (IP 주소, 장비명 등 정확한 토큰 매칭)
+        for token in re.findall(r'[0-9a-z가-힣._\-:]+', text):
+            key = f"w:{token}"
+            features[key] = features.get(key, 0.0) + 2.0
+        return features
+
+    def embed(self, texts: List[str]) -> List[List[float]]:
+        vectors = []
+        for text in texts:
+            vector = [0.0] * self.dimension
+            for feature, weight in self._features(text).items():
+                digest = hashlib.blake2b(feature.encode('utf-8'), digest_size=8).digest()
+                index = int.from_bytes(digest[:4], 'little') % self.dimension
+                sign = 1.0 if digest[4] & 1 else -1.0
+                # 빈도가 높은 n-gram의 영향을 완화
+                vector[index] += sign * math.log1p(weight)
+            norm = math.sqrt(sum(x * x for x in vector)) or 1.0
+            vectors.append([x / norm for x in vector])
+        return vectors
+
+
+_backends = {}
+
+
+def get_backend(name: str) -> EmbeddingBackend:
+    """
+    이름으로 임베딩 백엔드를 반환합니다 (프로세스 내 재사용)
+
+    Args:
+        name: "openai", "openai:<모델명>"(예: openai:text-embedding-3-small) 또는 "local"
+    """
+    if name not in _backends:
+        if name == "openai":
+            _backends[name] = OpenAIEmbeddingBackend()
+        elif name.startswith("openai:"):
+            _backends[name] = OpenAIEmbeddingBackend(model_name=name.split(":", 1)[1])
+        elif name == "local":
+            _backends[name] = LocalHashEmbeddingBackend()
+        else:
+            raise ValueError(f"지원하지 않는 임베딩 백엔드입니다: {name}")
+    return _backends[name]
@@ -0,0 +1,311 @@
+"""
+임베딩 캐시 모듈
+- 질문(query) 임베딩 캐시: 메모리 LRU + SQLite 디스크 저장소
+- 청크 임베딩 저장소: 청크 텍스트 해시 기반 (내용이 같으면 재임베딩하지 않음)
+- 모델명을 키에 포함하여 서로 다른 임베딩 모델의 벡터가 섞이지 않도록 함
+"""
+
+import re
+import sqlite3
+import threading
+import time
+import hashlib
+from array import array
+from collections import OrderedDict
+from typing import List, Optional, Callable, Sequence
+
+# 임베딩 캐시 저장 경로 (벡터 DB 초기화와 무관하게 유지, .gitignore 대상)
+EMBEDDING_CACHE_DB = "./embedding_cache.sqlite3"
+
+# 질문 캐시 키 형식 버전 (정규화 방식이 바뀌면 증가시켜 이전 키의 항목을 사용하지 않음)
+QUERY_KEY_VERSION = 2
+
+
+def normalize_query(query: str) -> str:
+    """
+    캐시 키 생성과 임베딩에 함께 사용하는 질문 정규화 (공백 정리)
+
+    임베딩 모델은 대소문자를 구분하므로 소문자화하지 않습니다 (키와 임베딩한 텍스트가 항상 같도록).
+    """
+    return re.sub(r'\s+', ' ', query or '').strip()
+
+
+def _pack_vector(vector: Sequence[float]) -> bytes:
+    """벡터를 float32 바이트로 직렬화"""
+    return array('f', [float(x) for x in vector]).tobytes()
+
+
+def _unpack_vector(blob: bytes) -> List[float]:
+    """float32 바이트를 벡터로 역직렬화"""
+    values = array('f')
+    values.frombytes(blob)
+    return values.tolist()
+
+
+class QueryEmbeddingCache:
+    """
+    정규화된 질문 → 임베딩 벡터 캐시
+
+    - 1차: 프로세스 내 LRU (memory_size 개)
+    - 2차: SQLite 디스크 저장소 (disk_size 개, 오래 사용되지 않은 항목부터 제거)
+    """
+
+    def __init__(self, db_path: str = EMBEDDING_CACHE_DB, memory_size: int = 1024,
+                 disk_size: int = 20000):
+        self.db_path = db_path
+        self.memory_size = memory_size
+        self.disk_size = disk_size
+        self._memory = OrderedDict()
+        self._lock = threading.RLock()
+        self._conn = None
+        self.hits = 0
+        self.misses = 0
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            self._conn = sqlite3.connect(self.db_path, check_same_thread=False)
+            self._conn.execute('''
+            CREATE TABLE IF NOT EXISTS query_embeddings (
+                cache_key TEXT PRIMARY KEY,
+                model_name TEXT NOT NULL,
+                query_text TEXT NOT NULL,
+                embedding BLOB NOT NULL,
+                last_used REAL NOT NULL
+            )
+            ''')
+            self._conn.execute(
+                'CREATE INDEX IF NOT EXISTS idx_query_embeddings_last_used ON query_embeddings (last_used)'
+            )
+            self._conn.commit()
+        return self._conn
+
+    @staticmethod
+    def make_key(model_name: str, query: str) -> str:
+        normalized = normalize_query(query)
+        return hashlib.sha256(f"v{QUERY_KEY_VERSION}\x00{model_name}\x00{normalized}".encode('utf-8')).hexdigest()
+
+    def get(self, model_name: str, query: str) -> Optional[List[float]]:
+        """캐시된 임베딩 조회 (없으면 None)"""
+        key = self.make_key(model_name, query)
+        with self._lock:
+            vector = self._memory.get(key)
+            if vector is not None:
+                self._memory.move_to_end(key)
+                self.hits += 1
+                return vector
+
+            try:
+                conn = self._connect()
+                row = conn.execute(
+                    'SELECT embedding FROM query_embeddings WHERE cache_key = ?', (key,)
+                ).fetchone()
+                if row:
+                    conn.execute(
+                        'UPDATE query_embeddings SET last_used = ? WHERE cache_key = ?',
+                        (time.time(), key)
+                    )
+                    conn.commit()
+                    vector = _unpack_vector(row[0])
+                    self._remember(key, vector)
+                    self.hits += 1
+                    return vector
+            except sqlite3.Error as e:
+                print(f"질문 임베딩 캐시 조회 오류: {str(e)}")
+
+            self.misses += 1
+            return None
+
+    def put(self, model_name: str, query: str, vector: Sequence[float]):
+        """임베딩을 메모리와 디스크 캐시에 저장"""
+        key = self.make_key(model_name, query)
+        vector = [float(x) for x in vector]
+        with self._lock:
+            self._remember(key, vector)
+            try:
+                conn = self._connect()
+                conn.execute(
+                    '''
+                    INSERT OR REPLACE INTO query_embeddings
+                    (cache_key, model_name, query_text, embedding, last_used)
+                    VALUES (?, ?, ?, ?, ?)
+                    ''',
+                    (key, model_name, normalize_query(query), _pack_vector(vector), time.time())
+                )
+                self._evict_disk(conn)
+                conn.commit()
+            except sqlite3.Error as e:
+                print(f"질문 임베딩 캐시 저장 오류: {str(e)}")
+
+    def get_or_compute(self, model_name: str, query: str,
+                       compute: Callable[[List[str]], Sequence[Sequence[float]]]) -> List[float]:
+        """캐시에 없으면 정규화한 질문을 compute로 임베딩하고 저장"""
+        vector = self.get(model_name, query)
+        if vector is None:
+            vector = [float(x) for x in compute([normalize_query(query)])[0]]
+            self.put(model_name, query, vector)
+        return vector
+
+    def get_or_compute_many(self, model_name: str, queries: Sequence[str],
+                            compute: Callable[[List[str]], Sequence[Sequence[float]]]) -> List[List[float]]:
+        """여러 질문의 임베딩 반환 (캐시에 없는 질문만 정규화하여 모아 compute를 한 번 호출)"""
+        vectors = [self.get(model_name, query) for query in queries]
+        missing = {}
+        for query, vector in zip(queries, vectors):
+            if vector is None:
+                missing.setdefault(normalize_query(query), query)
+        if missing:
+            computed = compute(list(missing))
+            computed_by_key = {}
+            for (normalized, query), vector in zip(missing.items(), computed):
+                vector = [float(x) for x in vector]
+                self.put(model_name, query, vector)
+                computed_by_key[normalized] = vector
+            vectors = [vector if vector is not None else computed_by_key[normalize_query(query)]
+                       for query, vector in zip(queries, vectors)]
+        return vectors
+
+    def _remember(self, key: str, vector: List[float]):
+        self._memory[key] = vector
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_size:
+            self._memory.popitem(last=False)
+
+    def _evict_disk(self, conn: sqlite3.Connection):
+        count = conn.execute('SELECT COUNT(*) FROM query_embeddings').fetchone()[0]
+        overflow = count - self.disk_size
+        if overflow > 0:
+            conn.execute(
+                '''
+                DELETE FROM query_embeddings WHERE cache_key IN (
+                    SELECT cache_key FROM query_embeddings ORDER BY last_used ASC LIMIT ?
+                )
+                ''',
+                (overflow,)
+            )
+
+    def clear(self):
+        """메모리 및 디스크 캐시 전체 삭제"""
+        with self._lock:
+            self._memory.clear()
+            try:
+                conn = self._connect()
+                conn.execute('DELETE FROM query_embeddings')
+                conn.commit()
+            except sqlite3.Error as e:
+                print(f"질문 임베딩 캐시 초기화 오류: {str(e)}")
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "memory_entries": len(self._memory),
+                "hits": self.hits,
+                "misses": self.misses
+            }
+
+
+def content_hash(model_name: str, text: str) -> str:
+    """청크 텍스트 + 임베딩 모델 기반 콘텐츠 해시"""
+    return hashlib.sha256(f"{model_name}\x00{text}".encode('utf-8')).hexdigest()
+
+
+class ChunkEmbeddingStore:
+    """
+    콘텐츠 주소 기반 청크 임베딩 저장소
+
+    동일한 텍스트(동일 모델)는 한 번만 임베딩하고, 재업로드/재동기화 시에는
+    저장된 벡터를 재사용합니다.
+    """
+
+    def __init__(self, db_path: str = EMBEDDING_CACHE_DB):
+        self.db_path = db_path
+        self._lock = threading.RLock()
+        self._conn = None
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            self._conn = sqlite3.connect(self.db_path, check_same_thread=False)
+            self._conn.execute('''
+            CREATE TABLE IF NOT EXISTS chunk_embeddings (
+                content_hash TEXT PRIMARY KEY,
+                model_name TEXT NOT NULL,
+                embedding BLOB NOT NULL,
+                created_at REAL NOT NULL
+            )
+            ''')
+            self._conn.commit()
+        return self._conn
+
+    def get_many(self, hashes: Sequence[str]) -> dict:
+        """저장된 벡터 조회 (content_hash -> 벡터)"""
+        found = {}
+        unique_hashes = list(dict.fromkeys(hashes))
+        with self._lock:
+            conn = self._connect()
+            # SQLite 변수 개수 제한을 고려하여 나누어 조회
+            for i in range(0, len(unique_hashes), 500):
+                batch = unique_hashes[i:i + 500]
+                placeholders = ','.join('?' * len(batch))
+                rows = conn.execute(
+                    f'SELECT content_hash, embedding FROM chunk_embeddings WHERE content_hash IN ({placeholders})',
+                    batch
+                ).fetchall()
+                for key, blob in rows:
+                    found[key] = _unpack_vector(blob)
+        return found
+
+    def put_many(self, model_name: str, items: dict):
+        """벡터 저장 (content_hash -> 벡터)"""
+        if not items:
+            return
+        now = time.time()
+        with self._lock:
+            conn = self._connect()
+            conn.executemany(
+                '''
+                INSERT OR IGNORE INTO chunk_embeddings (content_hash, model_name, embedding, created_at)
+                VALUES (?, ?, ?, ?)
+                ''',
+                [(key, model_name, _pack_vector(vector), now) for key, vector in items.items()]
+            )
+            conn.commit()
+
+    def embed(self, model_name: str, texts: Sequence[str],
+              compute: Callable[[List[str]], Sequence[Sequence[float]]],
+              batch_size: int = 100) -> List[List[float]]:
+        """
+        텍스트 목록의 임베딩을 반환합니다 (저장되지 않은 텍스트만 compute 호출)
+
+        Args:
+            model_name: 임베딩 모델명
+            texts: 임베딩할 텍스트 목록
+            compute: 텍스트 목록 -> 벡터 목록 함수 (임베딩 API)
+            batch_size: 한 번에 compute에 전달할 텍스트 수
+
+        Returns:
+            texts와 같은 순서의 벡터 목록
+        """
+        hashes = [content_hash(model_name, text) for text in texts]
+        vectors = self.get_many(hashes)
+
+        # 처음 보는 텍스트만 임베딩 (같은 요청 내 중복 텍스트도 1회만)
+        missing = {}
+        for key, text in zip(hashes, texts):
+            if key not in vectors and key not in missing:
+                missing[key] = text
+
+        if missing:
+            missing_items = list(missing.items())
+            for i in range(0, len(missing_items), batch_size):
+                batch = missing_items[i:i + batch_size]
+                computed = compute([text for _, text in batch])
+                new_vectors = {key: [float(x) for x in vector] for (key, _), vector in zip(batch, computed)}
+                self.put_many(model_name, new_vectors)
+                vectors.update(new_vectors)
+
+        print(f"청크 임베딩: 총 {len(texts)}개 중 {len(missing)}개 신규 임베딩, {len(texts) - len(missing)}개 재사용")
+        return [vectors[key] for key in hashes]
+
+
+# 전역 인스턴스
+query_embedding_cache = QueryEmbeddingCache()
+chunk_embedding_store = ChunkEmbeddingStore()
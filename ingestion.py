@@ -0,0 +1,171 @@
+"""
+임베딩 수집(ingestion) 파이프라인 모듈
+- 배치 임베딩을 여러 스레드에서 동시에 요청 (분당 토큰/요청 수 한도 내에서)
+- 429 / 5xx / 연결 오류는 지수 백오프로 재시도 (Retry-After 헤더 우선)
+- 벡터 DB 쓰기는 호출 스레드 하나에서만 수행 (단일 writer)
+- 배치별 성공/실패 결과를 그대로 보고
+"""
+
+import time
+import random
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import List, Dict, Any, Callable, Optional, Sequence
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    임베딩 토큰 수 추정 (한도 계산용, 보수적으로 큰 값)
+
+    한글은 대략 글자당 1토큰, 영문은 3~4바이트당 1토큰이므로 UTF-8 바이트 수 / 3을 사용합니다.
+    """
+    return max(1, len((text or '').encode('utf-8')) // 3)
+
+
+class RateLimiter:
+    """
+    분당 토큰 수(TPM) / 요청 수(RPM) 토큰 버킷
+
+    acquire()는 두 버킷 모두에 여유가 생길 때까지 대기합니다.
+    """
+
+    def __init__(self, tokens_per_minute: int, requests_per_minute: int):
+        self.tokens_per_minute = tokens_per_minute
+        self.requests_per_minute = requests_per_minute
+        self._tokens = float(tokens_per_minute)
+        self._requests = float(requests_per_minute)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        elapsed = now - self._updated
+        self._updated = now
+        self._tokens = min(self.tokens_per_minute, self._tokens + elapsed * self.tokens_per_minute / 60.0)
+        self._requests = min(self.requests_per_minute, self._requests + elapsed * self.requests_per_minute / 60.0)
+
+    def acquire(self, tokens: int):
+        # 한 요청이 버킷 크기보다 크면 버킷 크기만큼만 기다림 (영원히 대기하지 않도록)
+        tokens = min(tokens, self.tokens_per_minute)
+        while True:
+            with self._lock:
+                self._refill()
+                if self._tokens >= tokens and self._requests >= 1:
+                    self._tokens -= tokens
+                    self._requests -= 1
+                    return
+                wait_tokens = (tokens - self._tokens) * 60.0 / self.tokens_per_minute
+                wait_requests = (1 - self._requests) * 60.0 / self.requests_per_minute
+                wait = max(wait_tokens, wait_requests, 0.01)
+            time.sleep(wait)
+
+
+def _status_code(error: Exception) -> Optional[int]:
+    status = getattr(error, 'status_code', None)
+    if status is None:
+        status = getattr(getattr(error, 'response', None), 'status_code', None)
+    return status
+
+
+def is_retryable_error(error: Exception) -> bool:
+    """재시도할 오류인지 확인 (429, 5xx, 연결/타임아웃 오류)"""
+    status = _status_code(error)
+    if status is not None:
+        return status == 429 or status >= 500
+    name = type(error).__name__
+    if name in ('RateLimitError', 'APIConnectionError', 'APITimeoutError', 'InternalServerError',
+                'ConnectionError', 'TimeoutError'):
+        return True
+    message = str(error).lower()
+    return '429' in message or 'rate limit' in message
+
+
+def _retry_after(error: Exception) -> Optional[float]:
+    headers = getattr(getattr(error, 'response', None), 'headers', None) or {}
+    try:
+        value = headers.get('retry-after')
+        return float(value) if value is not None else None
+    except (TypeError, ValueError):
+        return None
+
+
+def call_with_retry(function: Callable[[], Any], max_retries: int = 5,
+                    base_delay: float = 1.0, max_delay: float = 60.0) -> Any:
+    """
+    재시도 가능한 오류에 대해 지수 백오프(지터 포함)로 function을 다시 호출합니다
+
+    재시도할 수 없는 오류이거나 재시도 횟수를 넘으면 마지막 오류를 그대로 발생시킵니다.
+    """
+    attempt = 0
+    while True:
+        try:
+            return function()
+        except Exception as e:
+            if attempt >= max_retries or not is_retryable_error(e):
+                raise
+            delay = _retry_after(e)
+            if delay is None:
+                delay = min(max_delay, base_delay * (2 ** attempt)) * random.uniform(0.5, 1.0)
+            attempt += 1
+            print(f"임베딩 요청 재시도 {attempt}/{max_retries} ({delay:.1f}초 후): {str(e)}")
+            time.sleep(delay)
+
+
+def rate_limited_embedding(embed: Callable[[List[str]], Sequence[Sequence[float]]],
+                           limiter: Optional[RateLimiter], max_retries: int = 5,
+                           base_delay: float = 1.0, max_delay: float = 60.0):
+    """임베딩 함수를 한도 대기 + 재시도로 감싼 함수를 반환합니다"""
+    def wrapped(texts: List[str]) -> Sequence[Sequence[float]]:
+        def attempt():
+            if limiter is not None:
+                limiter.acquire(sum(estimate_tokens(text) for text in texts))
+            return embed(texts)
+        return call_with_retry(attempt, max_retries, base_delay, max_delay)
+    return wrapped
+
+
+def run_ingestion(chunks: List[Dict[str, Any]],
+                  embed_batch: Callable[[List[str]], List[List[float]]],
+                  write_batch: Callable[[List[Dict[str, Any]], List[List[float]]], None],
+                  batch_size: int = 100, workers: int = 4) -> Dict[str, Any]:
+    """
+    청크를 배치로 나누어 임베딩은 동시에, 쓰기는 호출 스레드에서 순차로 수행합니다
+
+    Args:
+        chunks: {"text", "chunk_id", "metadata", ...} 청크 목록
+        embed_batch: 텍스트 목록 -> 벡터 목록 (작업 스레드에서 호출)
+        write_batch: (배치 청크, 벡터 목록) -> None (호출 스레드에서만 호출)
+        batch_size: 배치당 청크 수
+        workers: 동시 임베딩 스레드 수
+
+    Returns:
+        {"total_chunks", "added_chunks", "batches": [{"index", "chunk_ids", "success", "error"}]}
+    """
+    batches = [chunks[i:i + batch_size] for i in range(0, len(chunks), batch_size)]
+    results = [
+        {"index": index, "chunk_ids": [chunk["chunk_id"] for chunk in batch], "success": False, "error": None}
+        for index, batch in enumerate(batches)
+    ]
+
+    if batches:
+        with ThreadPoolExecutor(max_workers=max(1, min(workers, len(batches)))) as executor:
+            futures = {
+                executor.submit(embed_batch, [chunk["text"] for chunk in batch]): index
+                for index, batch in enumerate(batches)
+            }
+            # 임베딩이 끝난 순서대로 쓰기 (쓰기는 이 스레드에서만)
+            for future in as_completed(futures):
+                index = futures[future]
+                try:
+                    write_batch(batches[index], future.result())
+                    results[index]["success"] = True
+                    print(f"배치 {index + 1}/{len(batches)} 추가 완료: {len(batches[index])}개 청크")
+                except Exception as e:
+                    results[index]["error"] = str(e)
+                    print(f"배치 {index + 1}/{len(batches)} 추가 중 오류 발생: {str(e)}")
+
+    return {
+        "total_chunks": len(chunks),
+        "added_chunks": sum(len(result["chunk_ids"]) for result in results if result["success"]),
+        "batches": results
+    }
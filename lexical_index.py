@@ -0,0 +1,164 @@
+"""
+어휘(BM25) 검색 인덱스 모듈
+- 한글 친화적 문자 바이그램 + 영숫자 토큰(IP 주소, 장비명 등) 기반 BM25
+- 벡터 DB 청크와 같은 ID로 관리되며 추가/삭제 시 증분 갱신
+"""
+
+import re
+import math
+import threading
+from typing import List, Dict, Any, Optional, Tuple
+
+# 정확히 일치해야 의미가 있는 토큰 (IP 주소, 영문/숫자 장비명 등)
+EXACT_TOKEN_PATTERN = re.compile(r'(?:\d{1,3}\.){3}\d{1,3}|[a-z0-9][a-z0-9._\-]*[a-z0-9]|[a-z0-9]')
+
+
+def tokenize(text: str) -> List[str]:
+    """
+    BM25용 토큰화
+
+    - 공백 단위 단어마다 문자 바이그램 (한 글자 단어는 그대로)
+    - IP 주소 / 영숫자 토큰은 전체 토큰으로 추가
+    """
+    text = (text or '').lower()
+    tokens = []
+    for word in text.split():
+        if len(word) == 1:
+            tokens.append(word)
+        else:
+            tokens.extend(word[i:i + 2] for i in range(len(word) - 1))
+    tokens.extend(f"#{token}" for token in EXACT_TOKEN_PATTERN.findall(text))
+    return tokens
+
+
+def metadata_matches(metadata: Dict[str, Any], conditions: Optional[Dict[str, Any]]) -> bool:
+    """단순 메타데이터 조건 확인 (값 일치 또는 {"$in": [...]})"""
+    if not conditions:
+        return True
+    metadata = metadata or {}
+    for key, expected in conditions.items():
+        value = metadata.get(key)
+        if isinstance(expected, dict):
+            if "$in" in expected and value not in expected["$in"]:
+                return False
+            if "$eq" in expected and value != expected["$eq"]:
+                return False
+            if "$ne" in expected and value == expected["$ne"]:
+                return False
+        elif value != expected:
+            return False
+    return True
+
+
+class LexicalIndex:
+    """청크 텍스트에 대한 메모리 BM25 인덱스"""
+
+    def __init__(self, k1: float = 1.5, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self._lock = threading.RLock()
+        self._postings = {}   # term -> {chunk_id: tf}
+        self._doc_terms = {}  # chunk_id -> {term: tf}
+        self._doc_lengths = {}
+        self._texts = {}
+        self._metadatas = {}
+        self._total_length = 0
+        # 인덱스가 반영한 코퍼스 세대 (다른 프로세스의 변경 감지용)
+        self.generation = None
+
+    def __len__(self) -> int:
+        return len(self._doc_terms)
+
+    def add(self, ids: List[str], texts: List[str], metadatas: List[Dict[str, Any]]):
+        """청크 추가 (같은 ID가 있으면 교체)"""
+        with self._lock:
+            for chunk_id, text, metadata in zip(ids, texts, metadatas):
+                if chunk_id in self._doc_terms:
+                    self._remove_one(chunk_id)
+                term_counts = {}
+                for term in tokenize(text):
+                    term_counts[term] = term_counts.get(term, 0) + 1
+                for term, tf in term_counts.items():
+                    self._postings.setdefault(term, {})[chunk_id] = tf
+                length = sum(term_counts.values())
+                self._doc_terms[chunk_id] = term_counts
+                self._doc_lengths[chunk_id] = length
+                self._texts[chunk_id] = text
+                self._metadatas[chunk_id] = metadata or {}
+                self._total_length += length
+
+    def remove(self, ids: List[str]):
+        """청크 삭제"""
+        with self._lock:
+            for chunk_id in ids:
+                if chunk_id in self._doc_terms:
+                    self._remove_one(chunk_id)
+
+    def _remove_one(self, chunk_id: str):
+        for term in self._doc_terms.pop(chunk_id):
+            postings = self._postings.get(term)
+            if postings is not None:
+                postings.pop(chunk_id, None)
+                if not postings:
+                    del self._postings[term]
+        self._total_length -= self._doc_lengths.pop(chunk_id, 0)
+        self._texts.pop(chunk_id, None)
+        self._metadatas.pop(chunk_id, None)
+
+    def clear(self):
+        with self._lock:
+            self._postings.clear()
+            self._doc_terms.clear()
+            self._doc_lengths.clear()
+            self._texts.clear()
+            self._metadatas.clear()
+            self._total_length = 0
+            self.generation = None
+
+    def document(self, chunk_id: str) -> Tuple[str, Dict[str, Any]]:
+        return self._texts.get(chunk_id, ''), self._metadatas.get(chunk_id, {})
+
+    def search(self, query: str, top_k: int = 10,
+               conditions: Optional[Dict[str, Any]] = None) -> List[Tuple[str, float, float]]:
+        """
+        BM25 검색
+
+        Args:
+            query: 질문
+            top_k: 반환할 결과 수
+            conditions: 메타데이터 조건 (값 일치 또는 {"$in": [...]})
+
+        Returns:
+            (청크 ID, BM25 점수, 질문 토큰 커버리지 0~1) 목록 (점수 내림차순)
+        """
+        query_terms = list(dict.fromkeys(tokenize(query)))
+        with self._lock:
+            n_docs = len(self._doc_terms)
+            if not n_docs or not query_terms:
+                return []
+            avg_length = self._total_length / n_docs
+
+            idf = {}
+            for term in query_terms:
+                df = len(self._postings.get(term, {}))
+                idf[term] = math.log(1 + (n_docs - df + 0.5) / (df + 0.5))
+            total_idf = sum(idf.values()) or 1.0
+
+            scores = {}
+            matched_idf = {}
+            for term in query_terms:
+                for chunk_id, tf in self._postings.get(term, {}).items():
+                    length_norm = 1 - self.b + self.b * self._doc_lengths[chunk_id] / avg_length
+                    score = idf[term] * tf * (self.k1 + 1) / (tf + self.k1 * length_norm)
+                    scores[chunk_id] = scores.get(chunk_id, 0.0) + score
+                    matched_idf[chunk_id] = matched_idf.get(chunk_id, 0.0) + idf[term]
+
+            ranked = sorted(scores.items(), key=lambda item: item[1], reverse=True)
+            results = []
+            for chunk_id, score in ranked:
+                if conditions and not metadata_matches(self._metadatas.get(chunk_id), conditions):
+                    continue
+                results.append((chunk_id, score, matched_idf[chunk_id] / total_idf))
+                if len(results) >= top_k:
+                    break
+            return results
@@ -0,0 +1,223 @@
+"""
+벡터 DB 유지보수 모듈
+- ChromaDB 디렉토리(chroma.sqlite3 + 세그먼트 디렉토리) 크기 측정
+- HNSW 인덱스의 삭제 항목 비율 계산 (header.bin의 저장 항목 수와 실제 청크 수 비교)
+- 청크 레지스트리 / 임베딩 캐시 등 이 앱이 관리하는 SQLite 파일 VACUUM
+
+ChromaDB 내부 저장소(chroma.sqlite3, 세그먼트 디렉토리)는 읽기 전용으로만 조회하며, 그 구조를 아는
+chromadb 버전(SUPPORTED_CHROMA_VERSIONS)에서만 조회합니다. 임베딩 로그 정리와 chroma.sqlite3 VACUUM은
+앱을 중지한 뒤 Chroma CLI(CHROMA_VACUUM_COMMAND)로 실행해야 합니다.
+쓰기 잠금, 컬렉션 재구축(공개 컬렉션 API로 복사), 레지스트리/메모리 매핑 인덱스 정리는 database.run_maintenance에서 수행합니다.
+
+사용법:
+    python maintenance.py run [--rebuild] [--dry-run]   # 유지보수 실행 후 전후 크기/지연 시간 보고
+    python maintenance.py report                        # 현재 크기/삭제 비율/지연 시간만 보고
+"""
+
+import os
+import json
+import sqlite3
+import struct
+import argparse
+from typing import List, Dict, Any, Optional, Tuple
+
+CHROMA_SQLITE_FILENAME = "chroma.sqlite3"
+
+# 내부 저장 구조(segments / embeddings_queue 테이블, hnswlib header.bin)를 조회할 수 있는 chromadb 버전 [이상, 미만)
+SUPPORTED_CHROMA_VERSIONS = ((0, 4), (0, 6))
+
+# chroma.sqlite3 임베딩 로그 정리 + VACUUM (chromadb 0.5.6 이상 CLI, 앱을 중지한 뒤 실행)
+CHROMA_VACUUM_COMMAND = "chroma utils vacuum --path {path}"
+
+# hnswlib saveIndex 헤더: offsetLevel0, max_elements, cur_element_count (size_t)
+_HNSW_HEADER = struct.Struct("<QQQ")
+
+
+def directory_size(path: str) -> int:
+    """디렉토리 전체 크기 (바이트, 없으면 0)"""
+    if os.path.isfile(path):
+        return os.path.getsize(path)
+    total = 0
+    for root, _, files in os.walk(path):
+        for filename in files:
+            try:
+                total += os.path.getsize(os.path.join(root, filename))
+            except OSError:
+                pass
+    return total
+
+
+def chroma_version() -> Optional[Tuple[int, ...]]:
+    """설치된 chromadb 버전 (설치되지 않았거나 알 수 없으면 None)"""
+    try:
+        import chromadb
+    except ImportError:
+        return None
+    numbers = []
+    for part in str(getattr(chromadb, "__version__", "")).split("."):
+        digits = "".join(ch for ch in part if ch.isdigit())
+        if not digits:
+            break
+        numbers.append(int(digits))
+    return tuple(numbers) or None
+
+
+def chroma_layout_supported() -> bool:
+    """설치된 chromadb의 내부 저장 구조를 조회할 수 있는지 여부"""
+    version = chroma_version()
+    low, high = SUPPORTED_CHROMA_VERSIONS
+    return version is not None and low <= version[:2] < high
+
+
+def _connect(persist_dir: str, timeout: float = 30.0) -> Optional[sqlite3.Connection]:
+    """chroma.sqlite3 읽기 전용 연결 (지원하지 않는 chromadb 버전이거나 파일이 없으면 None)"""
+    path = os.path.join(persist_dir, CHROMA_SQLITE_FILENAME)
+    if not chroma_layout_supported() or not os.path.exists(path):
+        return None
+    return sqlite3.connect(f"file:{path}?mode=ro", uri=True, timeout=timeout)
+
+
+def _tables(conn: sqlite3.Connection) -> set:
+    return {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+
+
+def hnsw_element_count(segment_dir: str) -> Optional[int]:
+    """HNSW 인덱스에 저장된 항목 수 (삭제 표시된 항목 포함, header.bin이 없으면 None)"""
+    try:
+        with open(os.path.join(segment_dir, "header.bin"), "rb") as f:
+            header = f.read(_HNSW_HEADER.size)
+    except OSError:
+        return None
+    if len(header) < _HNSW_HEADER.size:
+        return None
+    return _HNSW_HEADER.unpack(header)[2]
+
+
+def vector_segments(persist_dir: str) -> List[Dict[str, Any]]:
+    """
+    컬렉션별 벡터(HNSW) 세그먼트 정보 (지원하지 않는 chromadb 버전이면 빈 목록)
+
+    Returns:
+        [{"collection", "collection_id", "segment_id", "bytes", "count"(청크 수),
+          "elements"(HNSW 저장 항목 수), "deleted_ratio"}]
+    """
+    conn = _connect(persist_dir)
+    if conn is None:
+        return []
+    try:
+        if not {"segments", "collections", "embeddings"} <= _tables(conn):
+            return []
+        segments = conn.execute(
+            "SELECT s.id, s.collection, c.name FROM segments s JOIN collections c ON c.id = s.collection "
+            "WHERE s.scope = 'VECTOR'"
+        ).fetchall()
+        # 청크 수는 같은 컬렉션의 메타데이터 세그먼트에 저장된 임베딩 행 수
+        counts = dict(conn.execute(
+            "SELECT s.collection, COUNT(e.id) FROM segments s LEFT JOIN embeddings e ON e.segment_id = s.id "
+            "WHERE s.scope = 'METADATA' GROUP BY s.collection"
+        ).fetchall())
+    finally:
+        conn.close()
+
+    result = []
+    for segment_id, collection_id, name in segments:
+        segment_dir = os.path.join(persist_dir, segment_id)
+        count = counts.get(collection_id, 0)
+        elements = hnsw_element_count(segment_dir)
+        deleted_ratio = max(0, elements - count) / elements if elements else 0.0
+        result.append({
+            "collection": name,
+            "collection_id": collection_id,
+            "segment_id": segment_id,
+            "bytes": directory_size(segment_dir),
+            "count": count,
+            "elements": elements,
+            "deleted_ratio": round(deleted_ratio, 4)
+        })
+    return result
+
+
+def embeddings_log_size(persist_dir: str) -> int:
+    """임베딩 로그(embeddings_queue) 행 수 (조회할 수 없으면 0)"""
+    conn = _connect(persist_dir)
+    if conn is None:
+        return 0
+    try:
+        if "embeddings_queue" not in _tables(conn):
+            return 0
+        return conn.execute("SELECT COUNT(*) FROM embeddings_queue").fetchone()[0]
+    finally:
+        conn.close()
+
+
+def vacuum_sqlite(path: str, timeout: float = 30.0) -> Dict[str, int]:
+    """
+    SQLite 파일 VACUUM (삭제된 행이 차지하던 페이지 반환, 이 앱이 관리하는 파일 전용)
+
+    chroma.sqlite3는 ChromaDB 클라이언트가 열려 있는 동안 VACUUM하지 않습니다 (CHROMA_VACUUM_COMMAND 사용).
+
+    Returns:
+        {"before", "after"} 파일 크기 (바이트)
+    """
+    if not os.path.exists(path):
+        return {"before": 0, "after": 0}
+    before = os.path.getsize(path)
+    conn = sqlite3.connect(path, timeout=timeout, isolation_level=None)
+    try:
+        conn.execute("VACUUM")
+    finally:
+        conn.close()
+    return {"before": before, "after": os.path.getsize(path)}
+
+
+def _format_bytes(size: int) -> str:
+    return f"{size / 1048576:.1f}MB"
+
+
+def print_report(report: Dict[str, Any]):
+    """유지보수 보고서 출력"""
+    stages = [("before", "유지보수 전"), ("after", "유지보수 후")] if "after" in report else [("before", "현재")]
+    for key, label in stages:
+        storage = report[key]
+        latency = storage.get("query_latency_ms") or {}
+        log_entries = f"{storage['log_entries']}행" if storage.get("layout_supported") else "확인 불가"
+        print(f"[{label}] 전체 {_format_bytes(storage['total_bytes'])}, chroma.sqlite3 {_format_bytes(storage['sqlite_bytes'])}, "
+              f"임베딩 로그 {log_entries}, "
+              f"검색 지연 중앙값 {latency.get('median', '-')}ms / p95 {latency.get('p95', '-')}ms")
+        for segment in storage["segments"]:
+            print(f"    {segment['collection']}: 청크 {segment['count']}개, HNSW 항목 {segment['elements']}개, "
+                  f"삭제 비율 {segment['deleted_ratio']:.1%}, {_format_bytes(segment['bytes'])}")
+    for action in report.get("actions", []):
+        print(f"  - {action}")
+    if report.get("offline_vacuum"):
+        print(f"chroma.sqlite3 정리는 앱을 중지한 뒤 실행하세요: {report['offline_vacuum']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="벡터 DB 유지보수 (HNSW 재구축, 레지스트리/캐시 VACUUM)")
+    subparsers = parser.add_subparsers(dest='command')
+    run_parser = subparsers.add_parser('run', help='유지보수 실행')
+    run_parser.add_argument('--rebuild', action='store_true', help='삭제 비율과 관계없이 모든 컬렉션의 HNSW 인덱스 재구축')
+    run_parser.add_argument('--dry-run', action='store_true', help='변경 없이 수행할 작업만 보고')
+    run_parser.add_argument('--json', action='store_true', help='보고서를 JSON으로 출력')
+    report_parser = subparsers.add_parser('report', help='현재 크기 / 삭제 비율 / 검색 지연 시간 보고')
+    report_parser.add_argument('--json', action='store_true', help='보고서를 JSON으로 출력')
+
+    args = parser.parse_args()
+
+    import database
+    if args.command == 'run':
+        report = database.run_maintenance(force_rebuild=args.rebuild, dry_run=args.dry_run)
+    elif args.command == 'report':
+        report = {"before": database.storage_report()}
+    else:
+        parser.print_help()
+        return
+    if args.json:
+        print(json.dumps(report, ensure_ascii=False, indent=2))
+    else:
+        print_report(report)
+
+
+if __name__ == "__main__":
+    main()
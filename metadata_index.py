@@ -0,0 +1,116 @@
+"""
+메타데이터 사전 필터 인덱스 모듈
+- 값의 종류가 적은 청크 메타데이터 필드(content_type, guide_version, file_type, vendor)의 posting list
+- 필터 조건을 만족하는 청크 ID 집합을 메모리에서 바로 계산하여 벡터 검색에 허용 목록으로 전달
+- 벡터 DB 청크와 같은 ID로 관리되며 추가/삭제 시 증분 갱신
+"""
+
+import threading
+from typing import List, Dict, Any, Optional, Set, Tuple
+
+DEFAULT_FIELDS = ("content_type", "guide_version", "file_type", "vendor")
+
+
+def _condition_values(expected) -> Optional[list]:
+    """조건 값이 허용하는 값 목록 (값 일치, $eq, $in 이외의 연산자는 None)"""
+    if isinstance(expected, dict):
+        if set(expected) == {"$in"}:
+            return list(expected["$in"])
+        if set(expected) == {"$eq"}:
+            return [expected["$eq"]]
+        return None
+    return [expected]
+
+
+class MetadataIndex:
+    """필드 -> 값 -> 청크 ID 집합"""
+
+    def __init__(self, fields=DEFAULT_FIELDS):
+        self.fields = tuple(fields)
+        self._lock = threading.RLock()
+        self._postings = {field: {} for field in self.fields}
+        self._values = {}  # chunk_id -> {field: value}
+        # 인덱스가 반영한 코퍼스 세대 (다른 프로세스의 변경 감지용)
+        self.generation = None
+
+    def __len__(self) -> int:
+        return len(self._values)
+
+    def add(self, ids: List[str], metadatas: List[Dict[str, Any]]):
+        """청크 추가 (같은 ID가 있으면 교체)"""
+        with self._lock:
+            for chunk_id, metadata in zip(ids, metadatas):
+                if chunk_id in self._values:
+                    self._remove_one(chunk_id)
+                metadata = metadata or {}
+                values = {field: metadata.get(field) for field in self.fields if metadata.get(field) is not None}
+                for field, value in values.items():
+                    self._postings[field].setdefault(value, set()).add(chunk_id)
+                self._values[chunk_id] = values
+
+    def remove(self, ids: List[str]):
+        """청크 삭제"""
+        with self._lock:
+            for chunk_id in ids:
+                if chunk_id in self._values:
+                    self._remove_one(chunk_id)
+
+    def _remove_one(self, chunk_id: str):
+        for field, value in self._values.pop(chunk_id).items():
+            postings = self._postings[field].get(value)
+            if postings is not None:
+                postings.discard(chunk_id)
+                if not postings:
+                    del self._postings[field][value]
+
+    def clear(self):
+        with self._lock:
+            self._postings = {field: {} for field in self.fields}
+            self._values.clear()
+            self.generation = None
+
+    def split_conditions(self, conditions: Optional[Dict[str, Any]]) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+        """조건을 (인덱스로 처리할 조건, 벡터 검색 where로 남길 조건)으로 나눔"""
+        indexed, residual = {}, {}
+        for key, expected in (conditions or {}).items():
+            if key in self.fields and _condition_values(expected) is not None:
+                indexed[key] = expected
+            else:
+                residual[key] = expected
+        return indexed, residual
+
+    def candidates(self, conditions: Optional[Dict[str, Any]]) -> Optional[Set[str]]:
+        """
+        인덱스 필드 조건을 모두 만족하는 청크 ID 집합
+
+        Returns:
+            청크 ID 집합 (인덱스로 처리할 조건이 없으면 None)
+        """
+        indexed, _ = self.split_conditions(conditions)
+        if not indexed:
+            return None
+        with self._lock:
+            # 작은 집합부터 교집합
+            sets = []
+            for field, expected in indexed.items():
+                postings = self._postings[field]
+                values = _condition_values(expected)
+                if len(values) == 1:
+                    sets.append(postings.get(values[0], set()))
+                else:
+                    sets.append(set().union(*(postings.get(value, set()) for value in values)))
+            sets.sort(key=len)
+            result = set(sets[0])
+            for other in sets[1:]:
+                if not result:
+                    break
+                result &= other
+            return result
+
+    def stats(self) -> Dict[str, Dict[Any, int]]:
+        """필드별 값 분포"""
+        with self._lock:
+            return {
+                field: {value: len(ids) for value, ids in postings.items()}
+                for field, postings in self._postings.items()
+            }
@@ -0,0 +1,87 @@
+"""
+벡터 DB 마이그레이션 모듈
+- 번호가 매겨진 마이그레이션을 순서대로 한 번씩 실행
+- 적용된 버전과 진행 위치(cursor)는 컬렉션 메타데이터에 기록 (SQLite의 PRAGMA user_version과 같은 역할)
+- 마이그레이션은 페이지 단위로 처리하고 페이지마다 진행 위치를 저장하여 중단 후 이어서 실행
+
+마이그레이션 함수 형식:
+    @migration(1, "설명")
+    def migrate_something(client, collection, cursor, checkpoint):
+        # cursor부터 처리하고, 페이지를 마칠 때마다 checkpoint(다음 cursor) 호출
+        ...
+"""
+
+from typing import Callable, Dict, Any, List, Tuple
+
+# 컬렉션 메타데이터 키
+SCHEMA_VERSION_KEY = "schema_version"
+IN_PROGRESS_KEY = "migration_in_progress"
+CURSOR_KEY = "migration_cursor"
+
+# 버전 -> (설명, 함수)
+_migrations: Dict[int, Tuple[str, Callable]] = {}
+
+
+def migration(version: int, description: str):
+    """마이그레이션 함수 등록 데코레이터"""
+    def register(function: Callable) -> Callable:
+        if version in _migrations:
+            raise ValueError(f"마이그레이션 버전이 중복되었습니다: {version}")
+        _migrations[version] = (description, function)
+        return function
+    return register
+
+
+def latest_version() -> int:
+    return max(_migrations) if _migrations else 0
+
+
+def schema_version(collection) -> int:
+    """컬렉션에 적용된 마지막 마이그레이션 버전"""
+    return int((collection.metadata or {}).get(SCHEMA_VERSION_KEY, 0))
+
+
+def pending_migrations(collection) -> List[int]:
+    current = schema_version(collection)
+    return sorted(version for version in _migrations if version > current)
+
+
+def _save_state(collection, **values):
+    # 컬렉션 메타데이터는 통째로 교체되므로 기존 키(embedding_model 등)를 유지
+    collection.modify(metadata={**(collection.metadata or {}), **values})
+
+
+def run_migrations(client, collection) -> int:
+    """
+    아직 적용되지 않은 마이그레이션을 순서대로 실행합니다
+
+    중단된 마이그레이션이 있으면 저장된 진행 위치부터 이어서 실행하며,
+    마이그레이션이 실패하면 이후 마이그레이션은 실행하지 않고 다음 시작 시 다시 시도합니다.
+
+    Returns:
+        이번에 적용한 마이그레이션 수
+    """
+    applied = 0
+    for version in pending_migrations(collection):
+        description, function = _migrations[version]
+        metadata = collection.metadata or {}
+        cursor = int(metadata.get(CURSOR_KEY, 0)) if metadata.get(IN_PROGRESS_KEY) == version else 0
+        if cursor:
+            print(f"벡터 DB 마이그레이션 {version} 재개 ({description}): 위치 {cursor}부터")
+        else:
+            print(f"벡터 DB 마이그레이션 {version} 시작: {description}")
+            _save_state(collection, **{IN_PROGRESS_KEY: version, CURSOR_KEY: 0})
+
+        def checkpoint(next_cursor: int, version=version):
+            _save_state(collection, **{IN_PROGRESS_KEY: version, CURSOR_KEY: int(next_cursor)})
+
+        try:
+            function(client, collection, cursor, checkpoint)
+        except Exception as e:
+            print(f"벡터 DB 마이그레이션 {version} 실패 (다음 시작 시 이어서 실행): {str(e)}")
+            break
+
+        _save_state(collection, **{SCHEMA_VERSION_KEY: version, IN_PROGRESS_KEY: 0, CURSOR_KEY: 0})
+        print(f"벡터 DB 마이그레이션 {version} 완료")
+        applied += 1
+    return applied
@@ -0,0 +1,411 @@
+"""
+메모리 매핑 벡터 인덱스 모듈
+- 벡터 DB 컬렉션의 임베딩을 float32 행렬 파일로 내보내고 NumPy memmap으로 검색
+- 여러 워커 프로세스가 같은 파일을 읽기 전용으로 공유 (각자 ChromaDB를 열 필요 없음)
+- 추가는 파일 끝에 append, 삭제는 tombstone으로 기록하여 증분 갱신
+- 선택적으로 int8 스칼라 양자화: 전수 검색은 int8 행렬로 하고 최종 후보만 float32로 재채점
+  (검색 시 상주 메모리가 float32 행렬의 약 1/4)
+
+파일 구성 (index_dir):
+- vectors.f32: 행 단위 float32 임베딩 (append-only)
+- rows.jsonl: 행별 {"id", "document", "metadata"} (append-only)
+- deleted.jsonl: 삭제된 청크 ID와 삭제 시점의 행 수 (이후 같은 ID로 다시 추가된 행은 유효)
+- manifest.json: 커밋된 행 수, 차원, 모델명, 코퍼스 세대, 양자화 여부 (원자적 교체)
+- (양자화 시) vectors.i8: 행 단위 int8 코드, scales.f32: 행별 스케일, norms.f32: 행별 제곱 노름
+"""
+
+import os
+import json
+import threading
+from typing import List, Dict, Any, Optional, Set, Tuple
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+from lexical_index import metadata_matches
+
+INDEX_FORMAT_VERSION = 1
+
+# 양자화 검색 시 한 번에 float32로 변환할 행 수 (임시 메모리 상한)
+QUANTIZED_BLOCK_ROWS = 8192
+
+
+def quantize(matrix):
+    """
+    행별 대칭 int8 스칼라 양자화
+
+    Returns:
+        (int8 코드, 행별 스케일 float32, 원본 행별 제곱 노름 float32)
+    """
+    matrix = np.asarray(matrix, dtype=np.float32)
+    scales = np.abs(matrix).max(axis=1) / 127.0 if len(matrix) else np.zeros(0, dtype=np.float32)
+    scales = np.where(scales > 0, scales, 1.0).astype(np.float32)
+    codes = np.clip(np.rint(matrix / scales[:, None]), -127, 127).astype(np.int8)
+    norms = np.einsum('ij,ij->i', matrix, matrix).astype(np.float32)
+    return codes, scales, norms
+
+
+class _FileLock:
+    """쓰기 작업 간 프로세스 잠금 (fcntl 사용 가능 시)"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._handle = None
+
+    def __enter__(self):
+        self._handle = open(self.path, 'a')
+        if fcntl is not None:
+            fcntl.flock(self._handle, fcntl.LOCK_EX)
+        return self
+
+    def __exit__(self, *args):
+        if fcntl is not None:
+            fcntl.flock(self._handle, fcntl.LOCK_UN)
+        self._handle.close()
+
+
+class MmapVectorIndex:
+    """
+    float32 memmap 기반 전수(brute-force) 벡터 검색 인덱스
+
+    Args:
+        index_dir: 인덱스 파일 디렉토리
+        quantized: True이면 int8 양자화 파일을 함께 만들고 검색에 사용
+        rescore_multiplier: 양자화 검색 시 float32로 재채점할 후보 수 (n_results의 배수)
+    """
+
+    def __init__(self, index_dir: str, quantized: bool = False, rescore_multiplier: int = 4):
+        self.index_dir = index_dir
+        self.quantized = quantized
+        self.rescore_multiplier = rescore_multiplier
+        self.vectors_path = os.path.join(index_dir, "vectors.f32")
+        self.codes_path = os.path.join(index_dir, "vectors.i8")
+        self.scales_path = os.path.join(index_dir, "scales.f32")
+        self.norms_path = os.path.join(index_dir, "norms.f32")
+        self.rows_path = os.path.join(index_dir, "rows.jsonl")
+        self.deleted_path = os.path.join(index_dir, "deleted.jsonl")
+        self.manifest_path = os.path.join(index_dir, "manifest.json")
+        self.lock_path = os.path.join(index_dir, ".lock")
+        self._lock = threading.RLock()
+        self._loaded_manifest = None
+        self._vectors = None
+        self._codes = None
+        self._scales = None
+        self._norms = None
+        self._ids = []
+        self._documents = []
+        self._metadatas = []
+        self._deleted = set()
+        self._positions = {}
+        self._alive = None
+
+    @staticmethod
+    def available() -> bool:
+        return np is not None
+
+    # ---- 매니페스트 ----
+
+    def read_manifest(self) -> Optional[Dict[str, Any]]:
+        try:
+            with open(self.manifest_path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _write_manifest(self, manifest: Dict[str, Any]):
+        tmp_path = f"{self.manifest_path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(manifest, f)
+        os.replace(tmp_path, self.manifest_path)
+
+    # ---- 쓰기 ----
+
+    def export(self, collection, model_name: str, generation: int, page_size: int = 500) -> int:
+        """
+        컬렉션 전체를 새 인덱스 파일로 내보냅니다 (페이지 단위 스트리밍)
+
+        Returns:
+            내보낸 행 수
+        """
+        os.makedirs(self.index_dir, exist_ok=True)
+        with _FileLock(self.lock_path):
+            # 잠금을 기다리는 동안 다른 워커가 같은 세대를 이미 내보냈으면 생략
+            manifest = self.read_manifest()
+            if manifest and manifest.get("generation") == generation and manifest.get("model") == model_name \
+                    and not manifest.get("deleted") and manifest.get("quantized", False) == self.quantized:
+                return manifest["rows"]
+            tmp_vectors = f"{self.vectors_path}.tmp"
+            tmp_rows = f"{self.rows_path}.tmp"
+            quantized_paths = [self.codes_path, self.scales_path, self.norms_path]
+            quantized_files = [open(f"{path}.tmp", 'wb') for path in quantized_paths] if self.quantized else []
+            dimension = None
+            total = 0
+            offset = 0
+            with open(tmp_vectors, 'wb') as vectors_file, open(tmp_rows, 'w', encoding='utf-8') as rows_file:
+                while True:
+                    page = collection.get(
+                        include=["embeddings", "documents", "metadatas"], limit=page_size, offset=offset
+                    )
+                    ids = page.get('ids') or []
+                    if not ids:
+                        break
+                    embeddings = np.asarray(page['embeddings'], dtype=np.float32)
+                    dimension = dimension or embeddings.shape[1]
+                    vectors_file.write(embeddings.tobytes())
+                    for quantized_file, values in zip(quantized_files, quantize(embeddings)):
+                        quantized_file.write(values.tobytes())
+                    documents = page.get('documents') or [''] * len(ids)
+                    metadatas = page.get('metadatas') or [{}] * len(ids)
+                    for chunk_id, document, metadata in zip(ids, documents, metadatas):
+                        rows_file.write(json.dumps(
+                            {"id": chunk_id, "document": document, "metadata": metadata or {}},
+                            ensure_ascii=False
+                        ) + "\n")
+                    total += len(ids)
+                    offset += len(ids)
+            os.replace(tmp_vectors, self.vectors_path)
+            os.replace(tmp_rows, self.rows_path)
+            for quantized_file, path in zip(quantized_files, quantized_paths):
+                quantized_file.close()
+                os.replace(f"{path}.tmp", path)
+            if os.path.exists(self.deleted_path):
+                os.remove(self.deleted_path)
+            self._write_manifest({
+                "format_version": INDEX_FORMAT_VERSION,
+                "model": model_name,
+                "dimension": dimension or 0,
+                "rows": total,
+                "deleted": 0,
+                "generation": generation,
+                "quantized": self.quantized
+            })
+        print(f"메모리 매핑 벡터 인덱스 내보내기 완료: {total}개 청크{' (int8 양자화)' if self.quantized else ''}")
+        return total
+
+    def append(self, ids: List[str], documents: List[str], embeddings: List[List[float]],
+               metadatas: List[Dict[str, Any]], generation_before: int, generation_after: int) -> bool:
+        """
+        청크를 인덱스 끝에 추가합니다
+
+        인덱스가 generation_before 시점의 코퍼스를 반영하고 있을 때만 적용하며,
+        그렇지 않으면 False를 반환합니다 (다음 검색 전에 전체 내보내기 필요).
+        """
+        if not os.path.exists(self.manifest_path):
+            return False
+        with _FileLock(self.lock_path):
+            manifest = self.read_manifest()
+            if not manifest or manifest.get("generation") != generation_before:
+                return False
+            matrix = np.asarray(embeddings, dtype=np.float32)
+            if manifest["dimension"] and matrix.shape[1] != manifest["dimension"]:
+                return False
+            # 커밋되지 않은 꼬리(이전 쓰기 중단)를 잘라낸 뒤 추가
+            row_bytes = (manifest["dimension"] or matrix.shape[1]) * 4
+            with open(self.vectors_path, 'r+b') as vectors_file:
+                vectors_file.truncate(manifest["rows"] * row_bytes)
+                vectors_file.seek(0, os.SEEK_END)
+                vectors_file.write(matrix.tobytes())
+            if manifest.get("quantized"):
+                dimension = manifest["dimension"] or matrix.shape[1]
+                for path, values, width in zip([self.codes_path, self.scales_path, self.norms_path],
+                                               quantize(matrix), [dimension, 4, 4]):
+                    with open(path, 'r+b') as quantized_file:
+                        quantized_file.truncate(manifest["rows"] * width)
+                        quantized_file.seek(0, os.SEEK_END)
+                        quantized_file.write(values.tobytes())
+            self._truncate_lines(self.rows_path, manifest["rows"])
+            with open(self.rows_path, 'a', encoding='utf-8') as rows_file:
+                for chunk_id, document, metadata in zip(ids, documents, metadatas):
+                    rows_file.write(json.dumps(
+                        {"id": chunk_id, "document": document, "metadata": metadata or {}},
+                        ensure_ascii=False
+                    ) + "\n")
+            manifest["rows"] += len(ids)
+            manifest["dimension"] = manifest["dimension"] or int(matrix.shape[1])
+            manifest["generation"] = generation_after
+            self._write_manifest(manifest)
+        return True
+
+    def mark_deleted(self, ids: List[str], generation_before: int, generation_after: int) -> bool:
+        """삭제된 청크 ID를 tombstone으로 기록합니다 (append와 같은 세대 조건)"""
+        if not os.path.exists(self.manifest_path):
+            return False
+        with _FileLock(self.lock_path):
+            manifest = self.read_manifest()
+            if not manifest or manifest.get("generation") != generation_before:
+                return False
+            with open(self.deleted_path, 'a', encoding='utf-8') as deleted_file:
+                for chunk_id in ids:
+                    deleted_file.write(json.dumps([chunk_id, manifest["rows"]]) + "\n")
+            manifest["deleted"] = manifest.get("deleted", 0) + len(ids)
+            manifest["generation"] = generation_after
+            self._write_manifest(manifest)
+        return True
+
+    @staticmethod
+    def _truncate_lines(path: str, line_count: int):
+        with open(path, 'r+', encoding='utf-8') as f:
+            for _ in range(line_count):
+                if not f.readline():
+                    break
+            f.truncate(f.tell())
+
+    def deleted_ratio(self) -> float:
+        manifest = self.read_manifest() or {}
+        rows = manifest.get("rows", 0)
+        return manifest.get("deleted", 0) / rows if rows else 0.0
+
+    # ---- 읽기 ----
+
+    def _ensure_loaded(self) -> Optional[Dict[str, Any]]:
+        """매니페스트가 바뀌었으면 파일을 다시 매핑합니다"""
+        manifest = self.read_manifest()
+        if manifest is None:
+            return None
+        with self._lock:
+            if manifest == self._loaded_manifest:
+                return manifest
+            rows = manifest["rows"]
+            dimension = manifest["dimension"]
+            codes, scales = None, None
+            if rows and dimension:
+                vectors = np.memmap(self.vectors_path, dtype=np.float32, mode='r', shape=(rows, dimension))
+                if manifest.get("quantized"):
+                    # float32 행렬은 재채점할 행만 읽으므로 상주 메모리는 int8 코드 + 행별 값 2개
+                    codes = np.memmap(self.codes_path, dtype=np.int8, mode='r', shape=(rows, dimension))
+                    scales = np.fromfile(self.scales_path, dtype=np.float32, count=rows)
+                    norms = np.fromfile(self.norms_path, dtype=np.float32, count=rows)
+                else:
+                    norms = np.einsum('ij,ij->i', vectors, vectors)
+            else:
+                vectors = np.zeros((0, dimension or 1), dtype=np.float32)
+                norms = np.zeros(0, dtype=np.float32)
+
+            ids, documents, metadatas = [], [], []
+            with open(self.rows_path, 'r', encoding='utf-8') as rows_file:
+                for _, line in zip(range(rows), rows_file):
+                    row = json.loads(line)
+                    ids.append(row["id"])
+                    documents.append(row["document"])
+                    metadatas.append(row["metadata"])
+
+            # 청크 ID -> 마지막 삭제 시점의 행 수 (그 이전 행만 삭제된 것으로 봄)
+            deleted = {}
+            if os.path.exists(self.deleted_path):
+                with open(self.deleted_path, 'r', encoding='utf-8') as deleted_file:
+                    for line in deleted_file:
+                        if line.strip():
+                            chunk_id, deleted_at = json.loads(line)
+                            deleted[chunk_id] = max(deleted.get(chunk_id, 0), deleted_at)
+
+            # 같은 ID가 다시 추가된 경우 마지막 행만 유효
+            alive = np.ones(rows, dtype=bool)
+            last_position = {}
+            for position, chunk_id in enumerate(ids):
+                if chunk_id in last_position:
+                    alive[last_position[chunk_id]] = False
+                last_position[chunk_id] = position
+            for chunk_id, deleted_at in deleted.items():
+                position = last_position.get(chunk_id)
+                if position is not None and position < deleted_at:
+                    alive[position] = False
+
+            self._vectors = vectors
+            self._codes = codes
+            self._scales = scales
+            self._norms = norms
+            self._ids, self._documents, self._metadatas = ids, documents, metadatas
+            self._deleted = deleted
+            self._positions = last_position
+            self._alive = alive
+            self._loaded_manifest = manifest
+            return manifest
+
+    def query(self, query_embeddings: List[List[float]], n_results: int,
+              conditions: Optional[Dict[str, Any]] = None,
+              allowed_ids: Optional[Set[str]] = None) -> List[List[Tuple[str, str, Dict[str, Any], float]]]:
+        """
+        여러 질문 임베딩에 대한 최근접 이웃 검색 (제곱 L2 거리, ChromaDB 기본 거리와 동일)
+
+        Args:
+            conditions: 메타데이터 조건 (행마다 확인)
+            allowed_ids: 검색할 청크 ID 허용 목록 (메타데이터 사전 필터 결과)
+
+        Returns:
+            질문별 (청크 ID, 문서, 메타데이터, 거리) 목록
+        """
+        if self._ensure_loaded() is None:
+            raise RuntimeError("메모리 매핑 벡터 인덱스가 없습니다")
+        with self._lock:
+            vectors, norms, alive = self._vectors, self._norms, self._alive
+            codes, scales = self._codes, self._scales
+            ids, documents, metadatas = self._ids, self._documents, self._metadatas
+            positions = self._positions
+
+        mask = alive
+        if allowed_ids is not None:
+            allowed = np.zeros(len(ids), dtype=bool)
+            allowed[[positions[chunk_id] for chunk_id in allowed_ids if chunk_id in positions]] = True
+            mask = mask & allowed
+        if conditions:
+            mask = mask & np.fromiter(
+                (metadata_matches(metadata, conditions) for metadata in metadatas), dtype=bool, count=len(metadatas)
+            )
+        candidates = np.nonzero(mask)[0]
+
+        queries = np.asarray(query_embeddings, dtype=np.float32)
+        if codes is not None:
+            return self._query_quantized(queries, n_results, candidates, vectors, codes, scales, norms,
+                                         ids, documents, metadatas)
+
+        results = []
+        for query in queries:
+            if len(candidates) == 0:
+                results.append([])
+                continue
+            distances = norms[candidates] - 2.0 * (vectors[candidates] @ query) + float(query @ query)
+            k = min(n_results, len(candidates))
+            top = np.argpartition(distances, k - 1)[:k]
+            top = top[np.argsort(distances[top])]
+            results.append([
+                (ids[candidates[i]], documents[candidates[i]], metadatas[candidates[i]], float(distances[i]))
+                for i in top
+            ])
+        return results
+
+    def _query_quantized(self, queries, n_results: int, candidates, vectors, codes, scales, norms,
+                         ids, documents, metadatas) -> List[List[Tuple[str, str, Dict[str, Any], float]]]:
+        """int8 코드로 근사 거리를 계산해 후보를 고른 뒤 float32 행으로 정확한 거리를 다시 계산"""
+        if len(candidates) == 0:
+            return [[] for _ in queries]
+
+        # 근사 내적: 블록 단위로 int8 -> float32 변환 (모든 질문을 한 번에)
+        dots = np.empty((len(candidates), len(queries)), dtype=np.float32)
+        for start in range(0, len(candidates), QUANTIZED_BLOCK_ROWS):
+            block = candidates[start:start + QUANTIZED_BLOCK_ROWS]
+            dots[start:start + len(block)] = (codes[block].astype(np.float32) @ queries.T) * scales[block][:, None]
+        candidate_norms = norms[candidates]
+
+        results = []
+        for column, query in enumerate(queries):
+            query_norm = float(query @ query)
+            distances = candidate_norms - 2.0 * dots[:, column] + query_norm
+            shortlist_size = min(len(candidates), max(n_results, n_results * self.rescore_multiplier))
+            shortlist = np.argpartition(distances, shortlist_size - 1)[:shortlist_size]
+            # 재채점: 후보 행만 float32로 읽음 (행 순서대로 읽어 디스크 접근 지역성 유지)
+            rows = np.sort(candidates[shortlist])
+            exact = norms[rows] - 2.0 * (np.asarray(vectors[rows]) @ query) + query_norm
+            k = min(n_results, len(rows))
+            top = np.argsort(exact)[:k]
+            results.append([
+                (ids[rows[i]], documents[rows[i]], metadatas[rows[i]], float(exact[i]))
+                for i in top
+            ])
+        return results
@@ -0,0 +1,70 @@
+"""
+검색 후보 재순위화 모듈
+- 후보 청크를 로컬(CPU) 점수로 다시 평가: 질문 토큰 커버리지 + 로컬 n-gram 임베딩 유사도 + 기존 검색 순위
+- MMR(Maximal Marginal Relevance)로 관련도와 다양성을 함께 고려해 선택
+- 청크 오버랩이나 중복 업로드로 거의 같은 청크는 제거하여 프롬프트에 넣을 청크 수를 줄임
+"""
+
+from typing import List, Any, Sequence
+
+from lexical_index import tokenize
+from embedding_backends import get_backend
+
+
+def _cosine(a: Sequence[float], b: Sequence[float]) -> float:
+    # 로컬 임베딩은 L2 정규화되어 있으므로 내적이 코사인 유사도
+    return sum(x * y for x, y in zip(a, b))
+
+
+def rerank(query: str, docs: List[Any], top_k: int,
+           lexical_weight: float = 0.4, semantic_weight: float = 0.3, rank_weight: float = 0.3,
+           mmr_lambda: float = 0.7, duplicate_threshold: float = 0.9,
+           min_relevance_ratio: float = 0.0) -> List[Any]:
+    """
+    검색 후보를 재순위화하여 관련 있고 서로 겹치지 않는 문서를 최대 top_k개 선택합니다
+
+    Args:
+        query: 사용자 질문
+        docs: 검색 순위순 후보 문서 (page_content, metadata를 가진 객체)
+        top_k: 최대 선택 수
+        lexical_weight: 질문 토큰(BM25 토큰화) 커버리지 가중치
+        semantic_weight: 로컬 임베딩 코사인 유사도 가중치
+        rank_weight: 기존 검색 순위(1 / (순위 + 1)) 가중치
+        mmr_lambda: MMR 관련도 비중 (1이면 다양성 무시)
+        duplicate_threshold: 이미 선택한 문서와의 유사도가 이 값 이상이면 중복으로 제외
+        min_relevance_ratio: 1위 관련도 대비 이 비율보다 낮은 문서는 제외
+
+    Returns:
+        선택 순서대로의 문서 목록
+    """
+    if not docs or top_k <= 0:
+        return []
+
+    texts = [getattr(doc, 'page_content', '') or '' for doc in docs]
+    vectors = get_backend("local").embed([query] + texts)
+    query_vector, doc_vectors = vectors[0], vectors[1:]
+
+    query_tokens = set(tokenize(query))
+    relevance = []
+    for rank, (text, vector) in enumerate(zip(texts, doc_vectors)):
+        coverage = len(query_tokens & set(tokenize(text))) / len(query_tokens) if query_tokens else 0.0
+        semantic = max(0.0, _cosine(query_vector, vector))
+        relevance.append(lexical_weight * coverage + semantic_weight * semantic + rank_weight / (rank + 1))
+    best_relevance = max(relevance)
+
+    selected = []
+    # 선택된 문서와의 최대 유사도 (선택할 때마다 갱신)
+    max_similarity = [0.0] * len(docs)
+    remaining = set(range(len(docs)))
+    while remaining and len(selected) < top_k:
+        index = max(remaining, key=lambda i: (mmr_lambda * relevance[i] - (1 - mmr_lambda) * max_similarity[i], -i))
+        remaining.discard(index)
+        if max_similarity[index] >= duplicate_threshold:
+            continue
+        if relevance[index] < best_relevance * min_relevance_ratio:
+            continue
+        selected.append(index)
+        for i in remaining:
+            max_similarity[i] = max(max_similarity[i], _cosine(doc_vectors[index], doc_vectors[i]))
+
+    return [docs[i] for i in selected]
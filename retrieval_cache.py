@@ -0,0 +1,74 @@
+"""
+검색 결과 캐시 모듈
+- 정규화된 질문 + 필터 → (문서 목록, 컨텍스트 문자열)
+- 코퍼스 세대(업로드/삭제/편집/동기화 시 증가)가 바뀌면 전체 무효화
+- LRU로 항목 수 제한, 적중/미스 통계 제공
+"""
+
+import json
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+from embedding_store import normalize_query
+
+
+class RetrievalCache:
+    """코퍼스 세대 기반으로 무효화되는 메모리 LRU 캐시"""
+
+    def __init__(self, max_entries: int = 512):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._generation = None
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    @staticmethod
+    def make_key(query: str, filter: Optional[Dict[str, Any]] = None, **options) -> str:
+        return json.dumps([normalize_query(query), filter or {}, options], sort_keys=True, ensure_ascii=False)
+
+    def _check_generation(self, generation: int):
+        if generation != self._generation:
+            if self._entries:
+                self.invalidations += 1
+            self._entries.clear()
+            self._generation = generation
+
+    def get(self, key: str, generation: int) -> Optional[Any]:
+        with self._lock:
+            self._check_generation(generation)
+            value = self._entries.get(key)
+            if value is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key: str, generation: int, value: Any):
+        with self._lock:
+            self._check_generation(generation)
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._generation = None
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / total, 4) if total else 0.0,
+                "invalidations": self.invalidations,
+                "generation": self._generation
+            }
@@ -0,0 +1,214 @@
+"""
+벡터 DB 스냅샷 모듈
+- 컬렉션의 ID / 문서 / 메타데이터 / 임베딩을 하나의 NPZ 파일로 저장
+- 복원 시 저장된 임베딩을 그대로 적재하므로 임베딩 API를 호출하지 않음
+
+NPZ 구성:
+- manifest: JSON 문자열 (형식 버전, 임베딩 모델, 차원, 청크 수, 스키마 버전, 생성 시각)
+- embeddings: (청크 수, 차원) float32
+- ids / documents / metadatas: UTF-8 바이트 배열 + 오프셋 배열 (메타데이터는 JSON)
+- parent_ids / parent_texts: 부모-자식 청크의 부모 섹션 본문 (형식 버전 2부터, 같은 방식으로 저장)
+같은 이름의 .json 파일에 manifest를 함께 저장하여 목록 조회 시 NPZ를 열지 않습니다.
+
+사용법:
+    python snapshot.py export [--output 경로]
+    python snapshot.py restore 경로
+    python snapshot.py list
+"""
+
+import os
+import json
+import time
+import argparse
+from typing import List, Dict, Any, Iterator, Optional, Tuple
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+SNAPSHOT_FORMAT_VERSION = 2
+# 읽을 수 있는 형식 버전 (1: 부모 섹션 없음)
+SUPPORTED_FORMAT_VERSIONS = (1, 2)
+
+
+def _require_numpy():
+    if np is None:
+        raise RuntimeError("스냅샷 기능을 사용하려면 numpy가 필요합니다")
+
+
+def _pack_strings(values: List[str]) -> Tuple[Any, Any]:
+    """문자열 목록을 UTF-8 바이트 배열과 끝 오프셋 배열로 변환"""
+    encoded = [value.encode('utf-8') for value in values]
+    offsets = np.cumsum([len(value) for value in encoded], dtype=np.int64) if encoded \
+        else np.zeros(0, dtype=np.int64)
+    return np.frombuffer(b''.join(encoded), dtype=np.uint8), offsets
+
+
+def _unpack_strings(data, offsets) -> List[str]:
+    raw = data.tobytes()
+    values = []
+    start = 0
+    for end in offsets.tolist():
+        values.append(raw[start:end].decode('utf-8'))
+        start = end
+    return values
+
+
+def write_snapshot(path: str, pages: Iterator[Dict[str, Any]], total: int,
+                   model_name: str, schema_version: int,
+                   parents: Optional[Dict[str, str]] = None) -> Dict[str, Any]:
+    """
+    컬렉션 페이지를 읽어 스냅샷 파일을 만듭니다
+
+    Args:
+        path: 저장할 .npz 경로
+        pages: collection.get 결과 형식({"ids", "documents", "metadatas", "embeddings"})의 페이지
+        total: 예상 청크 수 (임베딩 배열 사전 할당용)
+        model_name: 컬렉션 임베딩 모델
+        schema_version: 컬렉션 마이그레이션 버전
+        parents: 부모 섹션 {부모 ID: 본문} (청크 레지스트리에 저장된 부모-자식 청크의 부모)
+
+    Returns:
+        manifest 딕셔너리
+    """
+    _require_numpy()
+    ids, documents, metadatas = [], [], []
+    embeddings = None
+    count = 0
+    for page in pages:
+        page_ids = page.get('ids') or []
+        if not page_ids:
+            continue
+        vectors = np.asarray(page['embeddings'], dtype=np.float32)
+        if embeddings is None:
+            embeddings = np.empty((max(total, len(page_ids)), vectors.shape[1]), dtype=np.float32)
+        elif count + len(page_ids) > embeddings.shape[0]:
+            # 내보내는 중 청크가 추가된 경우
+            embeddings = np.concatenate([embeddings, np.empty((count + len(page_ids) - embeddings.shape[0],
+                                                               embeddings.shape[1]), dtype=np.float32)])
+        embeddings[count:count + len(page_ids)] = vectors
+        ids.extend(page_ids)
+        documents.extend(document or '' for document in (page.get('documents') or [''] * len(page_ids)))
+        metadatas.extend(
+            json.dumps(metadata or {}, ensure_ascii=False)
+            for metadata in (page.get('metadatas') or [None] * len(page_ids))
+        )
+        count += len(page_ids)
+    embeddings = embeddings[:count] if embeddings is not None else np.zeros((0, 0), dtype=np.float32)
+
+    manifest = {
+        "format_version": SNAPSHOT_FORMAT_VERSION,
+        "model": model_name,
+        "dimension": int(embeddings.shape[1]),
+        "count": count,
+        "parent_count": len(parents or {}),
+        "schema_version": schema_version,
+        "created_at": time.strftime('%Y-%m-%dT%H:%M:%S')
+    }
+    ids_data, ids_offsets = _pack_strings(ids)
+    documents_data, documents_offsets = _pack_strings(documents)
+    metadatas_data, metadatas_offsets = _pack_strings(metadatas)
+    parent_ids_data, parent_ids_offsets = _pack_strings(list((parents or {}).keys()))
+    parent_texts_data, parent_texts_offsets = _pack_strings(list((parents or {}).values()))
+
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'wb') as f:
+        np.savez_compressed(
+            f,
+            manifest=np.frombuffer(json.dumps(manifest).encode('utf-8'), dtype=np.uint8),
+            embeddings=embeddings,
+            ids_data=ids_data, ids_offsets=ids_offsets,
+            documents_data=documents_data, documents_offsets=documents_offsets,
+            metadatas_data=metadatas_data, metadatas_offsets=metadatas_offsets,
+            parent_ids_data=parent_ids_data, parent_ids_offsets=parent_ids_offsets,
+            parent_texts_data=parent_texts_data, parent_texts_offsets=parent_texts_offsets
+        )
+    os.replace(tmp_path, path)
+    with open(_manifest_path(path), 'w', encoding='utf-8') as f:
+        json.dump({**manifest, "size": os.path.getsize(path)}, f, ensure_ascii=False, indent=2)
+    print(f"스냅샷 저장 완료: {path} ({count}개 청크)")
+    return manifest
+
+
+def _manifest_path(path: str) -> str:
+    return os.path.splitext(path)[0] + ".json"
+
+
+def read_snapshot(path: str) -> Dict[str, Any]:
+    """
+    스냅샷 파일을 읽습니다
+
+    Returns:
+        {"manifest", "ids", "documents", "metadatas", "embeddings"(float32 배열), "parents"({부모 ID: 본문})}
+    """
+    _require_numpy()
+    with np.load(path, allow_pickle=False) as data:
+        manifest = json.loads(data['manifest'].tobytes().decode('utf-8'))
+        if manifest.get("format_version") not in SUPPORTED_FORMAT_VERSIONS:
+            raise ValueError(f"지원하지 않는 스냅샷 형식 버전입니다: {manifest.get('format_version')}")
+        snapshot = {
+            "manifest": manifest,
+            "embeddings": data['embeddings'],
+            "ids": _unpack_strings(data['ids_data'], data['ids_offsets']),
+            "documents": _unpack_strings(data['documents_data'], data['documents_offsets']),
+            "metadatas": [json.loads(value) for value in
+                          _unpack_strings(data['metadatas_data'], data['metadatas_offsets'])],
+            "parents": {}
+        }
+        if 'parent_ids_data' in data.files:
+            snapshot["parents"] = dict(zip(_unpack_strings(data['parent_ids_data'], data['parent_ids_offsets']),
+                                           _unpack_strings(data['parent_texts_data'], data['parent_texts_offsets'])))
+    if len(snapshot["ids"]) != manifest["count"] or snapshot["embeddings"].shape[0] != manifest["count"]:
+        raise ValueError("스냅샷 파일이 손상되었습니다 (청크 수 불일치)")
+    return snapshot
+
+
+def list_snapshots(directory: str) -> List[Dict[str, Any]]:
+    """디렉토리의 스냅샷 manifest 목록 (최신순)"""
+    snapshots = []
+    if not os.path.isdir(directory):
+        return snapshots
+    for filename in os.listdir(directory):
+        if not filename.endswith('.npz'):
+            continue
+        path = os.path.join(directory, filename)
+        try:
+            with open(_manifest_path(path), 'r', encoding='utf-8') as f:
+                manifest = json.load(f)
+        except (OSError, ValueError):
+            manifest = {}
+        snapshots.append({"name": filename, **manifest})
+    snapshots.sort(key=lambda item: item.get("created_at", ""), reverse=True)
+    return snapshots
+
+
+def main():
+    parser = argparse.ArgumentParser(description="벡터 DB 스냅샷 내보내기/복원")
+    subparsers = parser.add_subparsers(dest='command')
+    export_parser = subparsers.add_parser('export', help='현재 벡터 DB를 스냅샷으로 저장')
+    export_parser.add_argument('--output', type=str, help='저장할 .npz 경로 (기본: 스냅샷 디렉토리)')
+    restore_parser = subparsers.add_parser('restore', help='스냅샷으로 벡터 DB를 교체')
+    restore_parser.add_argument('path', type=str, help='복원할 .npz 경로')
+    subparsers.add_parser('list', help='스냅샷 목록')
+
+    args = parser.parse_args()
+
+    import database
+    if args.command == 'export':
+        manifest = database.export_snapshot(args.output)
+        print(json.dumps(manifest, ensure_ascii=False, indent=2))
+    elif args.command == 'restore':
+        result = database.restore_snapshot(args.path)
+        print(json.dumps(result, ensure_ascii=False, indent=2))
+    elif args.command == 'list':
+        for snapshot in database.list_database_snapshots():
+            print(f"{snapshot['name']}\t{snapshot.get('count', '?')}개 청크\t{snapshot.get('model', '')}\t"
+                  f"{snapshot.get('created_at', '')}")
+    else:
+        parser.print_help()
+
+
+if __name__ == "__main__":
+    main()
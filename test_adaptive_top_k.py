@@ -0,0 +1,82 @@
+import pytest
+
+pytest.importorskip("chromadb")
+import database
+
+def _doc(chunk_id, distance=None):
+    return database._make_document(f"본문 {chunk_id}", {}, chunk_id, distance)
+
+# 거리 간격(elbow) 선택 테스트
+def test_elbow_selection():
+    print("\n=== 거리 간격(elbow) 선택 테스트 ===")
+    # 2번째와 3번째 사이에 뚜렷한 간격
+    assert database.adaptive_cutoff([0.10, 0.12, 0.45, 0.47, 0.50], min_k=1, max_k=5) == 2
+    # 정렬되지 않은 입력도 오름차순으로 판단
+    assert database.adaptive_cutoff([0.47, 0.10, 0.45, 0.12, 0.50], min_k=1, max_k=5) == 2
+    # 1위만 가까운 경우
+    assert database.adaptive_cutoff([0.05, 0.40, 0.42, 0.44], min_k=1, max_k=4) == 1
+    # min_k 이전의 간격은 무시
+    assert database.adaptive_cutoff([0.05, 0.40, 0.42, 0.44, 0.80], min_k=2, max_k=5) == 4
+
+# 뚜렷한 간격이 없는 경우 테스트
+def test_no_clear_gap():
+    print("\n=== 뚜렷한 간격이 없는 경우 테스트 ===")
+    # 거리가 고르게 늘어나면 max_k개 유지
+    assert database.adaptive_cutoff([0.10, 0.20, 0.30, 0.40, 0.50], min_k=1, max_k=5) == 5
+    # 모두 같은 거리
+    assert database.adaptive_cutoff([0.30, 0.30, 0.30], min_k=1, max_k=3) == 3
+    # 거리가 2개 미만이거나 min_k 이하
+    assert database.adaptive_cutoff([0.10], min_k=1, max_k=3) == 3
+    assert database.adaptive_cutoff([], min_k=1, max_k=3) == 3
+    assert database.adaptive_cutoff([0.10, 0.90], min_k=2, max_k=3) == 3
+
+# min_gap 임계값 테스트
+def test_min_gap_threshold():
+    print("\n=== min_gap 임계값 테스트 ===")
+    # 상대적으로는 뚜렷하지만 절대 간격이 min_gap보다 작으면 자르지 않음
+    distances = [0.100, 0.101, 0.120, 0.121]
+    assert database.adaptive_cutoff(distances, min_k=1, max_k=4, min_gap=0.0) == 2
+    assert database.adaptive_cutoff(distances, min_k=1, max_k=4, min_gap=0.05) == 4
+    # 간격이 min_gap 이상이면 자름
+    assert database.adaptive_cutoff([0.10, 0.11, 0.30, 0.31], min_k=1, max_k=4, min_gap=0.05) == 2
+
+# 문서 목록 적용 테스트
+def test_adaptive_top_k_documents():
+    print("\n=== 문서 목록 적용 테스트 ===")
+    docs = [_doc("a", 0.10), _doc("b", 0.12), _doc("c", 0.60), _doc("lexical")]
+    # 거리가 없는 문서(어휘 검색 결과)는 계산에서 제외
+    k = database.adaptive_top_k(docs, 3)
+    assert k == 2
+    # 결합 순위를 유지한 채 가장 가까운 k개 벡터 문서만 남김
+    fused = [docs[2], docs[0], docs[3], docs[1]]
+    assert [doc.chunk_id for doc in database.nearest_documents(fused, k)] == ["a", "lexical", "b"]
+    assert [doc.chunk_id for doc in database.nearest_documents(fused, 3)] == ["c", "a", "lexical", "b"]
+
+# 어휘 검색 전용 문서 유지 테스트
+def test_lexical_only_documents_survive():
+    print("\n=== 어휘 검색 전용 문서 유지 테스트 ===")
+    # 정확한 키워드로 1위가 된 어휘 검색 전용 문서는 거리 간격 컷 뒤에도 남아야 함
+    fused = [_doc("exact"), _doc("a", 0.10), _doc("b", 0.11), _doc("c", 0.55), _doc("d", 0.58)]
+    k = database.adaptive_top_k(fused, 4)
+    assert k == 2
+    kept = [doc.chunk_id for doc in database.nearest_documents(fused, k)]
+    print(kept)
+    assert kept == ["exact", "a", "b"]
+    # 벡터 후보가 없으면 모두 유지
+    assert [doc.chunk_id for doc in database.nearest_documents([_doc("x"), _doc("y")], 1)] == ["x", "y"]
+
+if __name__ == "__main__":
+    # 거리 간격(elbow) 선택 테스트
+    test_elbow_selection()
+
+    # 뚜렷한 간격이 없는 경우 테스트
+    test_no_clear_gap()
+
+    # min_gap 임계값 테스트
+    test_min_gap_threshold()
+
+    # 문서 목록 적용 테스트
+    test_adaptive_top_k_documents()
+
+    # 어휘 검색 전용 문서 유지 테스트
+    test_lexical_only_documents_survive()
@@ -0,0 +1,73 @@
+from context_builder import (
+    MIN_OVERLAP, MIN_PARTIAL_TOKENS, build_context, overlap_length, stitch_adjacent_chunks
+)
+
+MODEL = "gpt-3.5-turbo"
+
+def _doc(text, **metadata):
+    return type('Document', (), {'page_content': text, 'metadata': metadata})
+
+# 인접 청크 오버랩 이어 붙이기 테스트
+def test_overlap_stitching():
+    print("\n=== 인접 청크 이어 붙이기 테스트 ===")
+    shared = "네트워크 장비 재부팅 후 포트 상태를 확인합니다. "  # MIN_OVERLAP 이상
+    assert len(shared) >= MIN_OVERLAP
+    first = "장애 접수 시 먼저 단말 연결을 점검합니다. " + shared
+    second = shared + "이상이 있으면 네트워크팀에 연락합니다."
+
+    assert overlap_length(first, second) == len(shared)
+    # 최소 길이보다 짧은 겹침은 오버랩으로 보지 않음
+    assert overlap_length("가나다라", "다라마바") == 0
+
+    docs = [
+        _doc(second, doc_id="manual", chunk_index=1),
+        _doc("다른 문서 내용", doc_id="other", chunk_index=0),
+        _doc(first, doc_id="manual", chunk_index=0),
+        _doc("떨어진 청크", doc_id="manual", chunk_index=5)
+    ]
+    blocks = stitch_adjacent_chunks(docs)
+    print([(block["text"], block["chunks"]) for block in blocks])
+    # 연속 청크는 겹친 부분을 한 번만 남기고 가장 높은 순위 위치에
+    assert blocks[0]["text"] == first + "이상이 있으면 네트워크팀에 연락합니다."
+    assert blocks[0]["text"].count(shared) == 1
+    assert blocks[0]["chunks"] == 2
+    assert [block["text"] for block in blocks[1:]] == ["다른 문서 내용", "떨어진 청크"]
+
+    # 겹침이 없으면 공백으로 연결, 업무 안내 가이드 행은 이어 붙이지 않음
+    blocks = stitch_adjacent_chunks([_doc("앞 청크", doc_id="d", chunk_index=0), _doc("뒤 청크", doc_id="d", chunk_index=1)])
+    assert [block["text"] for block in blocks] == ["앞 청크 뒤 청크"]
+    guide = [_doc("행 1", doc_id="g", chunk_index=0, content_type="procedure_guide"),
+             _doc("행 2", doc_id="g", chunk_index=1, content_type="procedure_guide")]
+    assert len(stitch_adjacent_chunks(guide)) == 2
+
+# 토큰 예산 절단 테스트
+def test_token_budget_truncation():
+    print("\n=== 토큰 예산 절단 테스트 ===")
+    docs = [_doc(f"문서 {i} " + "IP 주소 신청 절차 안내 " * 40, doc_id=f"d{i}") for i in range(5)]
+
+    # 예산이 충분하면 모든 문서 포함
+    result = build_context(docs, MODEL, 100000)
+    assert result["documents"] == 5 and not result["truncated"]
+
+    # 예산을 넘지 않고, 다 들어가지 않는 문서는 잘라서 넣은 뒤 중단
+    two_blocks = build_context(docs[:2], MODEL, 100000)["tokens"]
+    budget = two_blocks + MIN_PARTIAL_TOKENS * 2
+    result = build_context(docs, MODEL, budget)
+    print(result["tokens"], budget, result["documents"])
+    assert result["truncated"]
+    assert result["tokens"] <= budget
+    assert result["documents"] == 3
+    assert result["context"].rstrip().endswith("…\"")
+
+    # 남은 예산이 너무 작으면 잘라 넣지 않음
+    one_block = build_context(docs[:1], MODEL, 100000)["tokens"]
+    result = build_context(docs, MODEL, one_block + MIN_PARTIAL_TOKENS - 1)
+    assert result["documents"] == 1 and result["truncated"]
+    assert "…" not in result["context"]
+
+if __name__ == "__main__":
+    # 인접 청크 이어 붙이기 테스트
+    test_overlap_stitching()
+
+    # 토큰 예산 절단 테스트
+    test_token_budget_truncation()
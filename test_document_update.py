@@ -0,0 +1,55 @@
+import pytest
+
+pytest.importorskip("chromadb")
+import database
+
+def _existing(doc_id, texts):
+    return {
+        "ids": [f"{doc_id}-{database._text_hash(text)[:16]}" for text in texts],
+        "documents": list(texts),
+        "metadatas": [{"doc_id": doc_id, "chunk_index": i} for i in range(len(texts))]
+    }
+
+def _chunks(doc_id, texts):
+    return [{"text": text, "doc_id": doc_id, "chunk_id": "", "metadata": {"doc_id": doc_id, "chunk_index": i}}
+            for i, text in enumerate(texts)]
+
+# 편집으로 문단을 복제한 경우 테스트
+def test_duplicate_paragraph_in_edit():
+    print("\n=== 편집으로 문단을 복제한 경우 테스트 ===")
+    existing = _existing("doc", ["IP 주소 신청 절차", "LAN 공사 신청 절차"])
+    # 첫 문단을 복제해 끝에 추가
+    chunks = _chunks("doc", ["IP 주소 신청 절차", "LAN 공사 신청 절차", "IP 주소 신청 절차"])
+    plan = database._plan_document_update(existing, "doc", chunks)
+
+    chunk_ids = [chunk["chunk_id"] for chunk in chunks]
+    print(chunk_ids)
+    # 유지된 청크와 복제된 청크의 ID가 겹치지 않아야 upsert가 유지된 청크를 덮어쓰지 않음
+    assert len(set(chunk_ids)) == 3
+    assert plan["kept_ids"] == set(existing["ids"])
+    assert [chunk["chunk_id"] for chunk in plan["new_chunks"]] == [f"{existing['ids'][0]}-1"]
+    assert plan["removed_ids"] == []
+
+    # 같은 문단을 한 번 더 복제해도 다음 순번 사용
+    chunks = _chunks("doc", ["IP 주소 신청 절차"] * 3 + ["LAN 공사 신청 절차"])
+    plan = database._plan_document_update(existing, "doc", chunks)
+    assert [chunk["chunk_id"] for chunk in plan["new_chunks"]] == [f"{existing['ids'][0]}-1", f"{existing['ids'][0]}-2"]
+
+# 문단 삭제 및 변경 테스트
+def test_removed_and_changed_paragraphs():
+    print("\n=== 문단 삭제 및 변경 테스트 ===")
+    existing = _existing("doc", ["IP 주소 신청 절차", "LAN 공사 신청 절차", "전화기 설정"])
+    chunks = _chunks("doc", ["LAN 공사 신청 절차", "전화기 설정 변경"])
+    plan = database._plan_document_update(existing, "doc", chunks)
+
+    # 순서가 바뀐 문단은 메타데이터만 갱신, 바뀐 문단은 신규, 사라진 문단은 삭제
+    assert [chunk["chunk_id"] for chunk in plan["changed_chunks"]] == [existing["ids"][1]]
+    assert len(plan["new_chunks"]) == 1 and plan["new_chunks"][0]["text"] == "전화기 설정 변경"
+    assert sorted(plan["removed_ids"]) == sorted([existing["ids"][0], existing["ids"][2]])
+
+if __name__ == "__main__":
+    # 편집으로 문단을 복제한 경우 테스트
+    test_duplicate_paragraph_in_edit()
+
+    # 문단 삭제 및 변경 테스트
+    test_removed_and_changed_paragraphs()
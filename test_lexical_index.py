@@ -0,0 +1,76 @@
+import pytest
+
+from lexical_index import LexicalIndex, tokenize
+
+def _index():
+    index = LexicalIndex()
+    index.add(
+        ["ip-guide", "lan-guide", "phone-guide", "ip-mention"],
+        [
+            "IP 주소 신청 방법: 10.10.1.1 대역은 네트워크팀에 IP 주소 신청",
+            "LAN 공사 신청 절차와 자리 이동 시 LAN 포트 확인",
+            "전화기 설정 방법과 내선 번호 변경",
+            "자리 이동 후 IP 확인"
+        ],
+        [
+            {"content_type": "procedure_guide"},
+            {"content_type": "procedure_guide"},
+            {"content_type": "manual"},
+            {"content_type": "manual"}
+        ]
+    )
+    return index
+
+# BM25 순위 테스트
+def test_bm25_ranking():
+    print("\n=== BM25 순위 테스트 ===")
+    index = _index()
+
+    hits = index.search("IP 주소 신청", top_k=3)
+    print(hits)
+    assert [chunk_id for chunk_id, _, _ in hits][:2] == ["ip-guide", "ip-mention"]
+    # 점수 내림차순, 질문 토큰을 모두 포함한 문서의 커버리지는 1
+    assert hits[0][1] > hits[1][1]
+    assert abs(hits[0][2] - 1.0) < 1e-9
+    assert hits[1][2] < 1.0
+
+    # IP 주소는 전체 토큰으로 정확히 일치
+    assert "#10.10.1.1" in tokenize("10.10.1.1 대역")
+    assert [chunk_id for chunk_id, _, _ in index.search("10.10.1.1", top_k=1)] == ["ip-guide"]
+
+    # 메타데이터 조건과 삭제 반영
+    assert [chunk_id for chunk_id, _, _ in index.search("IP 주소 신청", conditions={"content_type": "manual"})] == ["ip-mention"]
+    index.remove(["ip-guide"])
+    assert "ip-guide" not in [chunk_id for chunk_id, _, _ in index.search("IP 주소 신청")]
+    assert index.search("존재하지않는질문어") == []
+
+def _doc(chunk_id):
+    return type('Document', (), {'page_content': f"본문 {chunk_id}", 'metadata': {}, 'chunk_id': chunk_id})
+
+# Reciprocal Rank Fusion 테스트
+def test_rrf_fusion():
+    print("\n=== Reciprocal Rank Fusion 테스트 ===")
+    pytest.importorskip("chromadb")
+    import database
+
+    vector_docs = [_doc("a"), _doc("b"), _doc("c")]
+    lexical_docs = [_doc("c"), _doc("d"), _doc("a")]
+
+    fused = database.reciprocal_rank_fusion([vector_docs, lexical_docs], k=60)
+    print([doc.chunk_id for doc in fused])
+    # 두 목록에 모두 있는 문서가 앞으로, 한 번만 포함
+    assert [doc.chunk_id for doc in fused] == ["a", "c", "b", "d"]
+    # 처음 나온 문서 객체 유지
+    assert fused[0] is vector_docs[0]
+
+    # k가 작을수록 상위 순위의 비중이 커짐
+    fused = database.reciprocal_rank_fusion([[_doc("x"), _doc("y")], [_doc("y")]], k=0)
+    assert [doc.chunk_id for doc in fused] == ["y", "x"]
+    assert database.reciprocal_rank_fusion([[], []]) == []
+
+if __name__ == "__main__":
+    # BM25 순위 테스트
+    test_bm25_ranking()
+
+    # Reciprocal Rank Fusion 테스트
+    test_rrf_fusion()
@@ -0,0 +1,109 @@
+import tempfile
+
+import pytest
+
+from metadata_index import MetadataIndex
+
+def _index():
+    index = MetadataIndex()
+    index.add(
+        ["g1", "g2", "g3", "m1", "m2"],
+        [
+            {"content_type": "procedure_guide", "guide_version": "2025.05.19", "vendor": "cisco"},
+            {"content_type": "procedure_guide", "guide_version": "2025.05.19", "vendor": "juniper"},
+            {"content_type": "procedure_guide", "guide_version": "2024.12.01", "vendor": "cisco"},
+            {"content_type": "manual", "file_type": "pdf", "vendor": "cisco"},
+            {"content_type": "manual", "file_type": "docx"}
+        ]
+    )
+    return index
+
+# posting list 교집합 테스트
+def test_posting_list_intersection():
+    print("\n=== posting list 교집합 테스트 ===")
+    index = _index()
+
+    assert index.candidates({"content_type": "procedure_guide"}) == {"g1", "g2", "g3"}
+    assert index.candidates({"content_type": "procedure_guide", "vendor": "cisco"}) == {"g1", "g3"}
+    assert index.candidates({"content_type": {"$eq": "manual"}, "vendor": "cisco"}) == {"m1"}
+    # 일치하는 청크가 없으면 빈 집합
+    assert index.candidates({"content_type": "manual", "guide_version": "2025.05.19"}) == set()
+    assert index.candidates({"vendor": "unknown"}) == set()
+
+# $in 조건 테스트
+def test_in_conditions():
+    print("\n=== $in 조건 테스트 ===")
+    index = _index()
+
+    # $in은 값별 posting list의 합집합
+    assert index.candidates({"guide_version": {"$in": ["2025.05.19", "2024.12.01"]}}) == {"g1", "g2", "g3"}
+    # 다른 필드 조건과는 교집합
+    result = index.candidates({"guide_version": {"$in": ["2025.05.19", "2024.12.01"]}, "vendor": {"$in": ["juniper"]}})
+    print(result)
+    assert result == {"g2"}
+    assert index.candidates({"vendor": {"$in": ["cisco", "juniper"]}, "file_type": {"$in": ["pdf", "docx"]}}) == {"m1"}
+    assert index.candidates({"vendor": {"$in": []}}) == set()
+
+    # 인덱스 필드가 아니거나 지원하지 않는 연산자는 벡터 검색 where 조건으로 남김
+    conditions = {"vendor": {"$in": ["cisco"]}, "source": "a.pdf", "file_type": {"$ne": "pdf"}}
+    indexed, residual = index.split_conditions(conditions)
+    assert indexed == {"vendor": {"$in": ["cisco"]}}
+    assert residual == {"source": "a.pdf", "file_type": {"$ne": "pdf"}}
+    assert index.candidates({"source": "a.pdf"}) is None
+
+    # 삭제/교체 반영
+    index.remove(["g1"])
+    index.add(["g2"], [{"content_type": "manual", "vendor": "juniper"}])
+    assert index.candidates({"guide_version": {"$in": ["2025.05.19", "2024.12.01"]}}) == {"g3"}
+    assert index.candidates({"content_type": "manual", "vendor": {"$in": ["juniper"]}}) == {"g2"}
+
+class _PagedCollection:
+    """MmapVectorIndex.export가 읽는 collection.get(limit, offset)만 흉내 낸 컬렉션"""
+
+    def __init__(self, ids, embeddings, metadatas):
+        self.ids, self.embeddings, self.metadatas = ids, embeddings, metadatas
+
+    def get(self, include=None, limit=None, offset=0):
+        end = offset + limit
+        return {"ids": self.ids[offset:end], "embeddings": self.embeddings[offset:end],
+                "documents": [f"본문 {chunk_id}" for chunk_id in self.ids[offset:end]],
+                "metadatas": self.metadatas[offset:end]}
+
+# 사전 필터 허용 목록 + 나머지 조건 테스트
+def test_prefilter_with_residual_condition():
+    print("\n=== 사전 필터 허용 목록 + 나머지 조건 테스트 ===")
+    pytest.importorskip("numpy")
+    from mmap_index import MmapVectorIndex
+
+    ids = ["g1", "g2", "g3", "m1", "m2"]
+    metadatas = [
+        {"content_type": "procedure_guide", "source": "a.xlsx"},
+        {"content_type": "procedure_guide", "source": "b.xlsx"},
+        {"content_type": "procedure_guide", "source": "a.xlsx"},
+        {"content_type": "manual", "source": "a.xlsx"},
+        {"content_type": "manual", "source": "b.xlsx"}
+    ]
+    embeddings = [[1.0, 0.0], [0.9, 0.1], [0.8, 0.2], [1.0, 0.0], [0.7, 0.3]]
+    index = MmapVectorIndex(tempfile.mkdtemp())
+    index.export(_PagedCollection(ids, embeddings, metadatas), "test-model", generation=1)
+
+    metadata_index = MetadataIndex()
+    metadata_index.add(ids, metadatas)
+    conditions = {"content_type": "procedure_guide", "source": "a.xlsx"}
+    indexed, residual = metadata_index.split_conditions(conditions)
+    allowed = metadata_index.candidates(indexed)
+
+    # 허용 목록(content_type)과 나머지 조건(source)을 모두 만족하는 청크만 검색
+    hits = index.query([[1.0, 0.0]], 10, residual, allowed)[0]
+    print([chunk_id for chunk_id, _, _, _ in hits])
+    assert [chunk_id for chunk_id, _, _, _ in hits] == ["g1", "g3"]
+
+if __name__ == "__main__":
+    # posting list 교집합 테스트
+    test_posting_list_intersection()
+
+    # $in 조건 테스트
+    test_in_conditions()
+
+    # 사전 필터 허용 목록 + 나머지 조건 테스트
+    test_prefilter_with_residual_condition()
@@ -0,0 +1,50 @@
+from reranker import rerank
+
+def _doc(text):
+    return type('Document', (), {'page_content': text, 'metadata': {}})
+
+def _texts(docs):
+    return [doc.page_content for doc in docs]
+
+# MMR 중복 제거 테스트
+def test_mmr_duplicate_removal():
+    print("\n=== MMR 중복 제거 테스트 ===")
+    docs = [
+        _doc("IP 주소 신청 방법 안내"),
+        _doc("IP 주소 신청 방법 안내"),  # 중복 업로드된 같은 청크
+        _doc("LAN 공사 신청 절차"),
+        _doc("전화기 설정")
+    ]
+
+    selected = rerank("IP 주소 신청", docs, top_k=4)
+    print(_texts(selected))
+    assert _texts(selected) == ["IP 주소 신청 방법 안내", "LAN 공사 신청 절차", "전화기 설정"]
+    # 먼저 나온 문서가 남음
+    assert selected[0] is docs[0]
+
+    # 임계값이 1보다 크면 중복도 유지
+    assert len(rerank("IP 주소 신청", docs, top_k=4, duplicate_threshold=1.01)) == 4
+    # top_k 제한
+    assert _texts(rerank("IP 주소 신청", docs, top_k=1)) == ["IP 주소 신청 방법 안내"]
+    assert rerank("IP 주소 신청", [], top_k=3) == []
+
+# 최소 관련도 컷오프 테스트
+def test_min_relevance_cutoff():
+    print("\n=== 최소 관련도 컷오프 테스트 ===")
+    docs = [_doc("IP 주소 신청 방법 안내"), _doc("LAN 공사 신청 절차"), _doc("전화기 설정")]
+
+    # 컷오프 없이는 모든 후보 선택
+    assert len(rerank("IP 주소 신청", docs, top_k=3)) == 3
+
+    # 1위 관련도 대비 비율이 낮은 문서 제외 (1위는 항상 유지)
+    selected = rerank("IP 주소 신청", docs, top_k=3, min_relevance_ratio=0.6)
+    print(_texts(selected))
+    assert _texts(selected) == ["IP 주소 신청 방법 안내"]
+    assert _texts(rerank("IP 주소 신청", docs, top_k=3, min_relevance_ratio=1.0)) == ["IP 주소 신청 방법 안내"]
+
+if __name__ == "__main__":
+    # MMR 중복 제거 테스트
+    test_mmr_duplicate_removal()
+
+    # 최소 관련도 컷오프 테스트
+    test_min_relevance_cutoff()